@@ -9,7 +9,7 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from vibraille.vibraille_services.asgi_handler import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vibraille.settings')
 
@@ -0,0 +1,77 @@
+import json
+import platform
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from vibraille.vibraille_services.benchmarks import suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the micro-benchmark suite (braille encoding, serializers, note views) and writes its timings as JSON, "
+        "optionally comparing them with an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="File to write the results to as JSON; printed when not given.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed calls of each case, after one to warm up.")
+        parser.add_argument(
+            '--filter', action='append', default=[],
+            help="Only run cases whose name contains this; may be given more than once."
+        )
+        parser.add_argument('--list', action='store_true', help="List the cases without running them.")
+        parser.add_argument('--compare', help="JSON results of an earlier run to compare the best times against.")
+        parser.add_argument(
+            '--max-slowdown', type=float,
+            help="With --compare, fail if any case's best time grew by more than this fraction (e.g. 0.2)."
+        )
+
+    def handle(self, *args, **options):
+        cases = [
+            case for case in suite.all_cases()
+            if not options['filter'] or any(part in case.name for part in options['filter'])
+        ]
+        if options['list']:
+            for case in cases:
+                self.stdout.write(case.name)
+            return
+        if not cases:
+            raise CommandError("No benchmark matches the filters given.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+
+        results = suite.run(cases, repeat=options['repeat'], on_result=self._report)
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.stderr.write(f"Wrote {len(results)} result(s) to {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if baseline is not None:
+            slowdowns = []
+            for name, before, after, change in suite.compare(baseline, results):
+                self.stderr.write(f"{name:<60} {before * 1000:10.3f}ms -> {after * 1000:10.3f}ms  {change:+7.1%}")
+                if options['max_slowdown'] is not None and change > options['max_slowdown']:
+                    slowdowns.append(name)
+            if slowdowns:
+                raise CommandError(
+                    f"{len(slowdowns)} benchmark(s) slowed by more than {options['max_slowdown']:.0%}: "
+                    + ", ".join(slowdowns)
+                )
+
+    def _report(self, name, result):
+        # Progress goes to stderr, so stdout stays valid JSON.
+        self.stderr.write(f"{name:<60} {result['seconds']['best'] * 1000:10.3f}ms best")
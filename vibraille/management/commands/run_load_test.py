@@ -0,0 +1,69 @@
+import json
+from django.core.management.base import BaseCommand
+from vibraille.vibraille_services.benchmarks import load_test
+from vibraille.vibraille_services.benchmarks.fake_aws_services import add_service_arguments, services_from_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests registration, login, translation and note reads with virtual users, reporting throughput and "
+        "p50/p95/p99 latency per endpoint. Unless --url is given, the application is served from this process with "
+        "a throwaway database and local fake S3 and Textract services, so nothing leaves the machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Load test the server already running here instead, e.g. http://127.0.0.1:8000.")
+        parser.add_argument('--users', type=int, default=10, help="Virtual users sending requests at the same time.")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to send requests for.")
+        parser.add_argument('--mix', choices=sorted(load_test.MIXES), default='default', help="Weights of the actions.")
+        parser.add_argument(
+            '--session-actions', type=int, default=20, help="Actions each virtual user takes before registering again."
+        )
+        parser.add_argument('--output', help="File to write the results to as JSON.")
+        add_service_arguments(parser)
+        parser.add_argument(
+            '--async-textract', action='store_true',
+            help="Read every image through S3 and a Textract job, rather than the synchronous API."
+        )
+
+    def handle(self, *args, **options):
+        run = lambda url: load_test.run_load(
+            url, users=options['users'], duration=options['duration'], mix=options['mix'],
+            session_actions=options['session_actions']
+        )
+        if options['url']:
+            results = run(options['url'])
+        else:
+            s3, textract = services_from_options(options)
+            with load_test.hermetic_server(s3, textract, async_textract=options['async_textract']) as url:
+                results = run(url)
+            results['aws'] = {
+                service: {'requests': fake.requests, 'failures': fake.failures}
+                for service, fake in (('s3', s3), ('textract', textract))
+            }
+
+        self.stdout.write(
+            f"{'endpoint':<12} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for action, endpoint in results['endpoints'].items():
+            self.stdout.write(
+                f"{action:<12} {endpoint['requests']:>8} {endpoint['errors']:>6} {endpoint['per_second']:>8.1f} "
+                f"{endpoint['p50_ms']:>9.1f} {endpoint['p95_ms']:>9.1f} {endpoint['p99_ms']:>9.1f}"
+            )
+        self.stdout.write(
+            f"{results['requests']} requests ({results['errors']} errors) in {results['seconds']:.1f}s: "
+            f"{results['per_second']:.1f}/s"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'options': _recorded(options), 'results': results}, output_file, indent=2)
+
+
+def _recorded(options):
+    """The options that shaped the run, leaving out Django's own."""
+    return {
+        name: options[name] for name in (
+            'url', 'users', 'duration', 'mix', 'session_actions', 'latency', 'jitter', 'failure_rate', 'job_seconds',
+            'async_textract'
+        )
+    }
@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import signal
+import socket
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from vibraille.vibraille_services.translation_jobs import DATABASE_QUEUE, run_translation_worker
+
+
+class Command(BaseCommand):
+    help = "Runs worker processes that take queued translation jobs from the database and write their Notes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Number of worker processes; 0 works through jobs in this process."
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once there are no jobs due.")
+
+    def handle(self, *args, **options):
+        if settings.TRANSLATION_JOB_QUEUE != DATABASE_QUEUE:
+            self.stderr.write("TRANSLATION_JOB_QUEUE is not 'database', so web processes will not queue jobs here.")
+        if not options['workers']:
+            processed = run_translation_worker(
+                _worker_id(0), poll_interval=options['poll_interval'], burst=options['burst']
+            )
+            self.stdout.write(f"Processed {processed} translation job(s).")
+            return
+
+        stop = multiprocessing.Event()
+        # Connections must not be shared with the forked workers.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_work, args=(number, options['poll_interval'], options['burst'], stop),
+                name=f"translation-worker-{number}"
+            )
+            for number in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} translation worker(s).")
+
+        def _shutdown(signum, frame):
+            # Workers finish the job they are on before exiting.
+            stop.set()
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+        for process in processes:
+            process.join()
+
+
+def _work(number, poll_interval, burst, stop):
+    # Ctrl-C reaches the whole process group; let the parent decide, and finish the current job on SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        run_translation_worker(_worker_id(number), poll_interval=poll_interval, burst=burst, should_stop=stop.is_set)
+    finally:
+        connections.close_all()
+
+
+def _worker_id(number):
+    return f"{socket.gethostname()}:{os.getpid()}:{number}"
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+def pack_existing_notes(apps, schema_editor):
+    """Fills braille_packed from each Note's braille_binary, one byte per six bit cell."""
+    Note = apps.get_model('vibraille', 'Note')
+    db_alias = schema_editor.connection.alias
+    for note in Note.objects.using(db_alias).only('id', 'braille_binary').iterator(chunk_size=500):
+        binary = note.braille_binary
+        packed = bytes(int(binary[i:i + 6], 2) for i in range(0, len(binary) - len(binary) % 6, 6))
+        Note.objects.using(db_alias).filter(id=note.id).update(braille_packed=packed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0002_translationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='braille_packed',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_existing_notes, migrations.RunPython.noop),
+    ]
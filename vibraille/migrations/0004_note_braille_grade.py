@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0003_note_braille_packed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='braille_grade',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
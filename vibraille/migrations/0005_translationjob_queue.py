@@ -0,0 +1,48 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0004_note_braille_grade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='grade',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='locked_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='locked_by',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='translationjob',
+            name='payload',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddIndex(
+            model_name='translationjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='vibraille_t_status_f737c0_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0005_translationjob_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='complete',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='page_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='NotePage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('ascii_text', models.TextField(default='')),
+                ('braille_format', models.TextField(default='')),
+                ('braille_binary', models.TextField(default='')),
+                ('braille_packed', models.BinaryField(default=b'')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='vibraille.note')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notepage',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='unique_note_page_number'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0006_note_pages'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'created'], name='note_user_created_idx'),
+        ),
+    ]
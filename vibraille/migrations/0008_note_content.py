@@ -0,0 +1,69 @@
+# Generated by Django 4.0.6 on 2026-10-18 06:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CONTENT_FIELDS = ('ascii_text', 'braille_format', 'braille_binary', 'braille_packed')
+
+
+def move_content_out_of_notes(apps, schema_editor):
+    """Copies each Note's text and braille into its own NoteContent row."""
+    Note = apps.get_model('vibraille', 'Note')
+    NoteContent = apps.get_model('vibraille', 'NoteContent')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for note in Note.objects.using(db_alias).only('id', *CONTENT_FIELDS).iterator(chunk_size=500):
+        batch.append(NoteContent(note_id=note.id, **{field: getattr(note, field) for field in CONTENT_FIELDS}))
+        if len(batch) == 500:
+            NoteContent.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    NoteContent.objects.using(db_alias).bulk_create(batch)
+
+
+def move_content_back_into_notes(apps, schema_editor):
+    """Copies each NoteContent back onto its Note, for unapplying this migration."""
+    Note = apps.get_model('vibraille', 'Note')
+    NoteContent = apps.get_model('vibraille', 'NoteContent')
+    db_alias = schema_editor.connection.alias
+    for content in NoteContent.objects.using(db_alias).iterator(chunk_size=500):
+        Note.objects.using(db_alias).filter(id=content.note_id).update(
+            **{field: getattr(content, field) for field in CONTENT_FIELDS}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0007_note_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteContent',
+            fields=[
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='vibraille.note')),
+                ('ascii_text', models.TextField(default='')),
+                ('braille_format', models.TextField(default='')),
+                ('braille_binary', models.TextField(default='')),
+                ('braille_packed', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.RunPython(move_content_out_of_notes, move_content_back_into_notes),
+        migrations.RemoveField(
+            model_name='note',
+            name='ascii_text',
+        ),
+        migrations.RemoveField(
+            model_name='note',
+            name='braille_binary',
+        ),
+        migrations.RemoveField(
+            model_name='note',
+            name='braille_format',
+        ),
+        migrations.RemoveField(
+            model_name='note',
+            name='braille_packed',
+        ),
+    ]
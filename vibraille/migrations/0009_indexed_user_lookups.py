@@ -0,0 +1,68 @@
+# Generated by Django 4.0.6 on 2026-10-18 07:03
+
+from django.conf import settings
+from django.db import migrations, models
+import re
+
+
+# Logins and verification look users up by email, and auth's User has no index on it, so this app owns an index on
+# auth_user. It is created in SQL, by name, as migration state can only hold indexes of this app's own models.
+CREATE_USER_EMAIL_INDEX = 'CREATE INDEX auth_user_email_idx ON auth_user (email)'
+DROP_USER_EMAIL_INDEX = {
+    'mysql': 'DROP INDEX auth_user_email_idx ON auth_user',
+    None: 'DROP INDEX auth_user_email_idx',
+}
+
+
+class RunVendorSQL(migrations.RunSQL):
+    """RunSQL whose statements may be given as ``{vendor: sql}``, with None for every other vendor."""
+
+    def _run_sql(self, schema_editor, sqls):
+        if isinstance(sqls, dict):
+            sqls = sqls.get(schema_editor.connection.vendor, sqls[None])
+        super()._run_sql(schema_editor, sqls)
+
+
+def normalize_existing_phone_numbers(apps, schema_editor):
+    """Fills phone_normalized for existing users, as normalize_phone_number did when this was written.
+
+    Phone logins used to pick the first matching user, so where several users share a number only the
+    first of them (by id) keeps it for logging in.
+    """
+    VibrailleUser = apps.get_model('vibraille', 'VibrailleUser')
+    db_alias = schema_editor.connection.alias
+    taken = set()
+    vb_users = VibrailleUser.objects.using(db_alias).only('id', 'phone_number').order_by('id')
+    for vb_user in vb_users.iterator(chunk_size=500):
+        digits = re.sub(r'[^0-9]', '', vb_user.phone_number or '')
+        normalized = (('+' if vb_user.phone_number.strip().startswith('+') else '') + digits) if digits else None
+        if normalized in taken:
+            normalized = None
+        if normalized:
+            taken.add(normalized)
+            VibrailleUser.objects.using(db_alias).filter(id=vb_user.id).update(phone_normalized=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vibraille', '0008_note_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vibrailleuser',
+            name='phone_normalized',
+            field=models.CharField(editable=False, max_length=17, null=True),
+        ),
+        migrations.RunPython(normalize_existing_phone_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vibrailleuser',
+            name='phone_normalized',
+            field=models.CharField(editable=False, max_length=17, null=True, unique=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[RunVendorSQL(CREATE_USER_EMAIL_INDEX, reverse_sql=DROP_USER_EMAIL_INDEX)],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-18 07:20
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def date_existing_notes(apps, schema_editor):
+    """Existing Notes are taken to be unchanged since they were created."""
+    Note = apps.get_model('vibraille', 'Note')
+    Note.objects.using(schema_editor.connection.alias).update(updated=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0009_indexed_user_lookups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(date_existing_notes, migrations.RunPython.noop),
+    ]
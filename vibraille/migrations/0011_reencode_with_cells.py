@@ -0,0 +1,50 @@
+# Generated by Django 4.0.6 on 2026-10-18 08:40
+
+from django.db import migrations
+from django.db.models import F
+
+# The cell ')' and the Grade 2 'with' contraction use; its binary form was written with the bits of '(' (⠷).
+WITH_CELL = '⠾'
+
+
+def _binary(braille_format):
+    """Dots 1 to 6 of each unicode braille cell, as six '0'/'1' characters per cell."""
+    return ''.join(
+        ''.join(str((ord(cell) - 0x2800) >> dot & 1) for dot in range(6)) for cell in braille_format
+    )
+
+
+def _packed(braille_binary):
+    return bytes(int(braille_binary[i:i + 6], 2) for i in range(0, len(braille_binary), 6))
+
+
+def reencode_with_cells(apps, schema_editor):
+    """Rewrites the binary and packed braille of every Note and NotePage holding the ')' cell from its unicode braille.
+
+    Notes changed get a new version, so their ETags and cached copies are not served any more.
+    """
+    Note = apps.get_model('vibraille', 'Note')
+    db_alias = schema_editor.connection.alias
+    changed = set()
+    for model in (apps.get_model('vibraille', 'NoteContent'), apps.get_model('vibraille', 'NotePage')):
+        rows = model.objects.using(db_alias).filter(braille_format__contains=WITH_CELL)
+        for row in rows.only('pk', 'note_id', 'braille_format').iterator(chunk_size=500):
+            braille_binary = _binary(row.braille_format)
+            model.objects.using(db_alias).filter(pk=row.pk).update(
+                braille_binary=braille_binary, braille_packed=_packed(braille_binary)
+            )
+            changed.add(row.note_id)
+    changed = sorted(changed)
+    for start in range(0, len(changed), 500):
+        Note.objects.using(db_alias).filter(id__in=changed[start:start + 500]).update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibraille', '0010_note_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(reencode_with_cells, migrations.RunPython.noop),
+    ]
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'vibraille.vibraille_services.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,6 +77,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'vibraille.wsgi.application'
 
+# Serve the async versions of the translation views; turn on when running under ASGI (vibraille.asgi)
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+# Database connections one process may hold open at once; keep the sum over all processes under the server's limit
+DB_CONNECTION_BUDGET = env.int('DB_CONNECTION_BUDGET', default=64)
+# Threads an ASGI process runs translations on: how many it can have in flight, mostly waiting on S3 and Textract.
+# Each holds a database connection, so at most DB_CONNECTION_BUDGET - 1 are started.
+ASYNC_TRANSLATION_THREADS = env.int('ASYNC_TRANSLATION_THREADS', default=DB_CONNECTION_BUDGET - 1)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
@@ -90,6 +99,15 @@ DATABASES = {
     }
 }
 
+# Hosts of read replicas of the database above, sharing its name and credentials; read-only note views read from them
+DATABASE_REPLICAS = []
+for _number, _endpoint in enumerate(env.list('DB_REPLICA_ENDPOINTS', default=[]), start=1):
+    DATABASES[f'replica_{_number}'] = {**DATABASES['default'], 'HOST': _endpoint, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_number}')
+DATABASE_ROUTERS = ['vibraille.vibraille_services.db_routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write, so they see their own changes while replicas catch up
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,8 +130,14 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'vibraille.vibraille_services.renderers.MessagePackRenderer',
+        'vibraille.vibraille_services.renderers.CBORRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'vibraille.vibraille_services.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAdminUser'
@@ -126,6 +150,41 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # OCR results keyed by image hash. Point this at a shared backend (e.g. Redis or memcached) in production.
+    'translations': {
+        'BACKEND': env('TRANSLATION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('TRANSLATION_CACHE_LOCATION', default='vibraille-translations'),
+        'TIMEOUT': env.int('TRANSLATION_CACHE_TTL', default=60 * 60 * 24 * 7),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('TRANSLATION_CACHE_MAX_ENTRIES', default=1000),
+        },
+    },
+    # Serialized note lists and details per user. Share it between processes in production, so all see invalidations.
+    'notes': {
+        'BACKEND': env('NOTES_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('NOTES_CACHE_LOCATION', default='vibraille-notes'),
+        'TIMEOUT': env.int('NOTES_CACHE_TTL', default=60 * 5),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('NOTES_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+}
+TRANSLATION_CACHE_ALIAS = 'translations'
+NOTES_CACHE_ALIAS = 'notes'
+
+# Responses of at least this many bytes are compressed (brotli where accepted, else gzip); streams never are
+RESPONSE_COMPRESSION_MIN_BYTES = env.int('RESPONSE_COMPRESSION_MIN_BYTES', default=1024)
+# Brotli quality from 0 to 11: higher is smaller but takes longer to compress
+RESPONSE_BROTLI_QUALITY = env.int('RESPONSE_BROTLI_QUALITY', default=6)
+
+# Seconds a user named by a JWT is cached for, saving each request a database read (0 reads it every time)
+USER_CACHE_TTL = env.int('USER_CACHE_TTL', default=60)
+USER_CACHE_ALIAS = 'default'
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
@@ -163,3 +222,59 @@ AWS_S3_FILE_OVERWRITE = env('AWS_S3_FILE_OVERWRITE')
 AWS_DEFAULT_ACL = env('AWS_DEFAULT_ACL')
 AWS_S3_VERIFY = env('AWS_S3_VERIFY')
 
+# Shared AWS clients: connections kept open per process, retries for throttling and transient errors
+AWS_MAX_POOL_CONNECTIONS = env.int('AWS_MAX_POOL_CONNECTIONS', default=50)
+AWS_MAX_ATTEMPTS = env.int('AWS_MAX_ATTEMPTS', default=5)
+AWS_RETRY_MODE = env('AWS_RETRY_MODE', default='standard')
+AWS_CONNECT_TIMEOUT = env.float('AWS_CONNECT_TIMEOUT', default=5.0)
+AWS_READ_TIMEOUT = env.float('AWS_READ_TIMEOUT', default=60.0)
+# Alternative endpoints, e.g. a local S3 or Textract stand-in
+AWS_ENDPOINT_URLS = {
+    's3': env('AWS_S3_ENDPOINT_URL', default=None),
+    'textract': env('AWS_TEXTRACT_ENDPOINT_URL', default=None),
+}
+
+# Engine used to read text out of uploaded images: TextractBackend, or TesseractBackend to OCR locally
+OCR_BACKEND = env('OCR_BACKEND', default='vibraille.vibraille_services.ocr_backends.TextractBackend')
+# Worker processes for local OCR; 0 runs it in the request's own process
+OCR_PROCESS_POOL_SIZE = env.int('OCR_PROCESS_POOL_SIZE', default=os.cpu_count() or 1)
+TESSERACT_LANG = env('TESSERACT_LANG', default='eng')
+TESSERACT_CONFIG = env('TESSERACT_CONFIG', default='--psm 3')
+
+# Image cleanup ahead of upload and OCR. Mode is 'grayscale' (JPEG) or 'binarize' (PNG).
+IMAGE_PREPROCESSING_ENABLED = env.bool('IMAGE_PREPROCESSING_ENABLED', default=True)
+IMAGE_PREPROCESSING_MAX_DIMENSION = env.int('IMAGE_PREPROCESSING_MAX_DIMENSION', default=2200)
+IMAGE_PREPROCESSING_MODE = env('IMAGE_PREPROCESSING_MODE', default='grayscale')
+IMAGE_PREPROCESSING_MAX_SKEW = env.float('IMAGE_PREPROCESSING_MAX_SKEW', default=10.0)
+
+# Bytes of each uploaded image kept in memory before its copy spills over to a temporary file
+IMAGE_SPOOL_MAX_MEMORY = env.int('IMAGE_SPOOL_MAX_MEMORY', default=2621440)
+FILE_UPLOAD_TEMP_DIR = env('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Single images up to this size go straight to Textract's synchronous API, with the S3 copy
+# uploaded by a pool of background threads (0 uploads it before OCR starts)
+TEXTRACT_SYNC_ENABLED = env.bool('TEXTRACT_SYNC_ENABLED', default=True)
+TEXTRACT_SYNC_MAX_BYTES = env.int('TEXTRACT_SYNC_MAX_BYTES', default=10 * 1024 * 1024)
+S3_ARCHIVE_WORKERS = env.int('S3_ARCHIVE_WORKERS', default=2)
+
+# Threads reading the pages of one PDF or TIFF upload at the same time
+DOCUMENT_PAGE_WORKERS = env.int('DOCUMENT_PAGE_WORKERS', default=4)
+
+# Textract job polling, in seconds. Polls back off exponentially up to the max delay.
+TEXTRACT_POLL_INITIAL_DELAY = env.float('TEXTRACT_POLL_INITIAL_DELAY', default=0.5)
+TEXTRACT_POLL_MAX_DELAY = env.float('TEXTRACT_POLL_MAX_DELAY', default=5.0)
+TEXTRACT_POLL_TIMEOUT = env.float('TEXTRACT_POLL_TIMEOUT', default=120.0)
+
+# Number of background threads per process running asynchronous translation jobs
+TRANSLATION_JOB_WORKERS = env.int('TRANSLATION_JOB_WORKERS', default=4)
+# Threads per process translating the pages of batch uploads, and the most pages one batch may hold
+TRANSLATION_BATCH_WORKERS = env.int('TRANSLATION_BATCH_WORKERS', default=8)
+TRANSLATION_BATCH_MAX_IMAGES = env.int('TRANSLATION_BATCH_MAX_IMAGES', default=50)
+# 'thread' runs asynchronous jobs in the web process; 'database' leaves them for `manage.py run_translation_workers`
+TRANSLATION_JOB_QUEUE = env('TRANSLATION_JOB_QUEUE', default='thread')
+TRANSLATION_JOB_MAX_ATTEMPTS = env.int('TRANSLATION_JOB_MAX_ATTEMPTS', default=3)
+# Seconds before a failed job is retried, doubling with each attempt up to the max
+TRANSLATION_JOB_RETRY_DELAY = env.float('TRANSLATION_JOB_RETRY_DELAY', default=10.0)
+TRANSLATION_JOB_RETRY_MAX_DELAY = env.float('TRANSLATION_JOB_RETRY_MAX_DELAY', default=300.0)
+# Seconds a worker may hold a job before it is presumed dead and the job is claimed again
+TRANSLATION_JOB_LOCK_TIMEOUT = env.int('TRANSLATION_JOB_LOCK_TIMEOUT', default=600)
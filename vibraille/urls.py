@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework import routers
+from vibraille.vibraille_services.async_views import async_urlpatterns
 from vibraille.vibraille_services.views import (
     TranslatorBrailleViews,
     VBObtainTokenPairView,
@@ -10,8 +11,14 @@ from vibraille.vibraille_services.views import (
     api_root,
     get_all_notes,
     get_note_details,
+    get_note_braille_bin,
+    get_note_pages,
+    get_notes_cache_stats,
+    stream_note_braille,
     edit_note_details,
     remove_note,
+    get_translation_job,
+    translate_batch,
     verify_phone,
     verify_email,
     verify_refresh
@@ -29,12 +36,22 @@ urlpatterns = [
     path('login/refresh/', TokenRefreshView.as_view(), name='login_token_refresh'),
     path('register/', RegisterView.as_view(), name='register'),
     path('notes/translate/', TranslatorBrailleViews.as_view(), name='translate_img'),
+    path('notes/translate/batch/', translate_batch, name='translate_batch'),
     path('notes/', get_all_notes, name='view_all_notes'),
     path('notes/<int:note_id>/', get_note_details, name='view_note_detail'),
+    path('notes/<int:note_id>/braille.bin', get_note_braille_bin, name='view_note_braille_bin'),
+    path('notes/<int:note_id>/pages/', get_note_pages, name='view_note_pages'),
+    path('notes/<int:note_id>/braille/stream', stream_note_braille, name='stream_note_braille'),
     path('notes/<int:note_id>/edit', edit_note_details, name='view_note_detail'),
     path('notes/<int:note_id>/delete', remove_note, name='remove_note'),
+    path('notes/jobs/<uuid:job_id>/', get_translation_job, name='view_translation_job'),
+    path('stats/notes-cache/', get_notes_cache_stats, name='notes_cache_stats'),
     path('verify/phone/', verify_phone, name='verify_phone'),
     path('verify/email/', verify_email, name='verify_email'),
     path('verify/refresh/', verify_refresh, name='verify_refresh'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework'))
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# Under ASGI, the translation views can be served by their async versions instead
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns(urlpatterns)
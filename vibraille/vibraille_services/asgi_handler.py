@@ -0,0 +1,43 @@
+"""The ASGI handler the project is served with: Django's, with streaming responses read off the event loop.
+
+Django 4.0's handler reads a StreamingHttpResponse's iterator on the event loop, so an iterator that queries the
+database as it goes, as the braille stream does, raises SynchronousOnlyOperation. This one fetches each part through
+sync_to_async, on the thread the view ran on, and sends it from the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+import django
+
+# What next() returns once a streaming response has no parts left
+_FINISHED = object()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler, reading streaming responses as synchronous code."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else bytes(header),
+             value.encode('latin1') if isinstance(value, str) else bytes(value))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip()) for cookie in response.cookies.values()
+        ]
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        # Access __iter__ rather than streaming_content, as Django does, in case a subclass overrides it.
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while (part := await next_part(parts, _FINISHED)) is not _FINISHED:
+            for chunk, _last in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Sets Django up and returns the handler, as django.core.asgi.get_asgi_application() does for Django's own."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
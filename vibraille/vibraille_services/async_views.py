@@ -0,0 +1,85 @@
+"""Async versions of the translation views, served instead of the synchronous ones when ASYNC_VIEWS is on.
+
+Django 4.0 has no async ORM and DRF no async views, so each async view awaits its synchronous version run off the
+event loop. Translations, which spend seconds waiting on S3 and Textract, run on a pool of threads shared by the whole
+process, so one ASGI process holds that many translations in flight. Every other view, the note views included, is
+left synchronous: Django's ASGI handler already runs those through sync_to_async, so an async wrapper would add nothing.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+import asyncio
+import contextvars
+import functools
+import threading
+from . import views
+
+_translation_pool = None
+_translation_pool_lock = threading.Lock()
+
+
+def translation_threads():
+    """Threads translations run on: ASYNC_TRANSLATION_THREADS, capped by the database connections the process may hold.
+
+    Each thread keeps a connection open while its translation runs, and one more is left for the thread Django runs
+    the synchronous views on.
+    """
+    return max(min(settings.ASYNC_TRANSLATION_THREADS, settings.DB_CONNECTION_BUDGET - 1), 1)
+
+
+def _get_translation_pool():
+    """The threads translations run on, started on first use."""
+    global _translation_pool
+    with _translation_pool_lock:
+        if _translation_pool is None:
+            _translation_pool = ThreadPoolExecutor(
+                max_workers=translation_threads(), thread_name_prefix='async-translation'
+            )
+    return _translation_pool
+
+
+def _run_closing_connections(view, request, *args, **kwargs):
+    """Runs a view on a pool thread, then closes the thread's database connections as the end of a request would."""
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def on_translation_pool(view):
+    """Wraps a synchronous view as an async one run on the translation pool."""
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_translation_pool(),
+            functools.partial(context.run, _run_closing_connections, view, request, *args, **kwargs)
+        )
+    return async_view
+
+
+translate_img = on_translation_pool(views.TranslatorBrailleViews.as_view())
+translate_batch = on_translation_pool(views.translate_batch)
+
+# The async version of each view above, by the name of the synchronous view's class or function
+ASYNC_VERSIONS = {
+    'TranslatorBrailleViews': translate_img,
+    'translate_batch': translate_batch,
+}
+
+
+def _view_name(pattern):
+    """The name of the class or function of the DRF view ``pattern`` serves, if it serves one."""
+    view_class = getattr(pattern, 'callback', None) and getattr(pattern.callback, 'cls', None)
+    return view_class.__name__ if view_class else None
+
+
+def async_urlpatterns(urlpatterns):
+    """Returns ``urlpatterns`` with each view that has an async version here swapped for it."""
+    return [
+        URLPattern(pattern.pattern, ASYNC_VERSIONS[_view_name(pattern)], pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and _view_name(pattern) in ASYNC_VERSIONS
+        else pattern
+        for pattern in urlpatterns
+    ]
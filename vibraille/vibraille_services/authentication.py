@@ -0,0 +1,33 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .db_routers import replica_reads
+from .user_cache import cache_user, get_cached_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the token's signed claims to name the user.
+
+    The token is verified as usual, but the User it names comes from a short-lived cache
+    (USER_CACHE_TTL seconds), so most requests authenticate without touching the database.
+    Users are dropped from the cache when saved or deleted. Cache misses are read from a replica, unless the
+    user wrote recently.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        user = get_cached_user(user_id)
+        if user is None:
+            # Raises for unknown and inactive users, which are never cached.
+            with replica_reads(user_id):
+                user = super().get_user(validated_token)
+            cache_user(user)
+        elif not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        # Tokens carry the username from when they were issued; once it changes they no longer name this user.
+        if validated_token.get('username', user.username) != user.username:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        return user
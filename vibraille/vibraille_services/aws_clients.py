@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+from botocore.config import Config
+from django.conf import settings
+import os
+import threading
+import boto3
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+_overrides = {}
+
+
+def get_client(service_name):
+    """Returns this process's shared boto3 client for an AWS service, creating it on first use.
+
+    boto3 clients are safe to share between threads, and sharing one keeps its connection pool
+    (and the TLS sessions in it) alive across requests. Clients are not carried across a fork:
+    a child process builds its own the first time it asks.
+    """
+    global _clients_pid
+    if service_name in _overrides:
+        return _overrides[service_name]
+    pid = os.getpid()
+    client = _clients.get(service_name) if _clients_pid == pid else None
+    if client is not None:
+        return client
+    with _clients_lock:
+        if _clients_pid != pid:
+            _clients.clear()
+            _clients_pid = pid
+        if service_name not in _clients:
+            _clients[service_name] = _create_client(service_name)
+        return _clients[service_name]
+
+
+def _create_client(service_name):
+    config = Config(
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={'total_max_attempts': settings.AWS_MAX_ATTEMPTS, 'mode': settings.AWS_RETRY_MODE},
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+        read_timeout=settings.AWS_READ_TIMEOUT,
+        tcp_keepalive=True
+    )
+    return boto3.client(
+        service_name,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        endpoint_url=settings.AWS_ENDPOINT_URLS.get(service_name),
+        config=config
+    )
+
+
+def reset_clients():
+    """Drops the shared clients, e.g. after the AWS settings change."""
+    with _clients_lock:
+        _clients.clear()
+
+
+@contextmanager
+def override_clients(**clients):
+    """Hands out the given clients (by service name) instead of real ones, for tests."""
+    previous = dict(_overrides)
+    _overrides.update(clients)
+    try:
+        yield
+    finally:
+        _overrides.clear()
+        _overrides.update(previous)
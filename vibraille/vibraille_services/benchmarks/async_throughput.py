@@ -0,0 +1,149 @@
+"""Translations per second through the WSGI application, as sync workers serve it, against one ASGI process serving
+the async views (ASYNC_VIEWS).
+
+Textract is replaced by a fake that answers after ``latency`` seconds, standing in for the network, and the requests
+are handed straight to each application, so no server or AWS account is needed. The WSGI application is called from
+``workers`` threads at a time, one per sync worker; the ASGI application from a single event loop with every request
+in flight at once.
+
+Needs Django settings (``DJANGO_SETTINGS_MODULE``, defaulting to ``vibraille.settings``). The notes are written to a
+throwaway test database, so nothing is left behind. Run from the project root with:
+``python -m vibraille.vibraille_services.benchmarks.async_throughput``
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+IMAGE_PATH = "./vibraille/vibraille_services/tests/image_test.jpg"
+BOUNDARY = 'BenchmarkBoundary'
+
+
+def _translation_body(image, number):
+    from django.test.client import encode_multipart
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    # A different image each time, so none is answered from the translation cache.
+    upload = SimpleUploadedFile(f'page_{number}.jpg', image + number.to_bytes(4, 'big'), content_type='image/jpeg')
+    return encode_multipart(BOUNDARY, {'img': upload})
+
+
+def _wsgi_translate(application, token, body):
+    environ = {
+        'REQUEST_METHOD': 'POST', 'PATH_INFO': '/notes/translate/', 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO(),
+        'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}', 'CONTENT_LENGTH': str(len(body)),
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+    }
+    statuses = []
+    b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return int(statuses[0].split()[0])
+
+
+async def _asgi_translate(application, token, body):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+        'path': '/notes/translate/', 'raw_path': b'/notes/translate/', 'query_string': b'', 'root_path': '',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        'headers': [
+            (b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode()),
+            (b'content-type', f'multipart/form-data; boundary={BOUNDARY}'.encode()),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Nothing more to read; the client stays connected until the response is sent.
+        await asyncio.Future()
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return next(message['status'] for message in sent if message['type'] == 'http.response.start')
+
+
+def _run_wsgi(token, bodies, workers):
+    from django.core.handlers.wsgi import WSGIHandler
+    application = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda body: _wsgi_translate(application, token, body), bodies))
+
+
+def _run_asgi(token, bodies):
+    from django.test import override_settings
+    from vibraille.vibraille_services.asgi_handler import ASGIHandler
+    application = ASGIHandler()
+
+    async def translate_all():
+        return await asyncio.gather(*(_asgi_translate(application, token, body) for body in bodies))
+
+    with override_settings(ROOT_URLCONF='vibraille.vibraille_services.benchmarks.async_throughput'):
+        return asyncio.run(translate_all())
+
+
+def run(translations=100, latency=1.0, wsgi_workers=(4, 32)):
+    """Returns the translations per second each deployment managed, and how many of its responses were 201s."""
+    from django.core.cache import caches
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from vibraille.vibraille_services.models import User
+    from vibraille.vibraille_services.tests.fakes import FakeAWS, FakeTextract
+
+    class SlowTextract(FakeTextract):
+        def detect_document_text(self, Document, **kwargs):
+            time.sleep(latency)
+            return super().detect_document_text(Document, **kwargs)
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as database_dir:
+        if connection.vendor == 'sqlite':
+            # An in-memory SQLite database fails writes from several threads at once, where a file makes them wait.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(database_dir, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            token = str(RefreshToken.for_user(User.objects.create(username='benchmark_user')).access_token)
+            with open(IMAGE_PATH, 'rb') as image_file:
+                image = image_file.read()
+            runs = {
+                f'wsgi_{workers}_workers': lambda bodies, workers=workers: _run_wsgi(token, bodies, workers)
+                for workers in wsgi_workers
+            }
+            runs['asgi_async_views'] = lambda bodies: _run_asgi(token, bodies)
+            results = {}
+            with FakeAWS(textract=SlowTextract()).install():
+                for number, (name, deployment) in enumerate(runs.items()):
+                    caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+                    bodies = [_translation_body(image, number * translations + i) for i in range(translations)]
+                    started = time.perf_counter()
+                    statuses = deployment(bodies)
+                    seconds = time.perf_counter() - started
+                    results[name] = {'per_second': translations / seconds, 'created': statuses.count(201)}
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def __getattr__(name):
+    # Read by Django as the URLconf of the ASGI run, once settings are loaded.
+    if name == 'urlpatterns':
+        from vibraille import urls
+        from vibraille.vibraille_services.async_views import async_urlpatterns
+        return async_urlpatterns(urls.urlpatterns)
+    raise AttributeError(name)
+
+
+if __name__ == '__main__':
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vibraille.settings')
+    django.setup()
+    for name, result in run().items():
+        print(f"{name:>18}: {result['per_second']:8.1f} translations/s  ({result['created']} created)")
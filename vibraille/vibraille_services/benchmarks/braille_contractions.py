@@ -0,0 +1,70 @@
+"""Throughput and size of Grade 2 (contracted) braille against Grade 1 on English text.
+
+Run from the project root with: ``python -m vibraille.vibraille_services.benchmarks.braille_contractions``
+"""
+import random
+from vibraille.vibraille_services.braille_utils import braille_encoder, grade2_encoder
+from vibraille.vibraille_services.benchmarks.braille_encoder import _best_of
+
+
+WORDS = (
+    'the of and to in is was he for it with as his on be at by had are but from or have an they which one you were '
+    'her all she there would their we him been has when who will more no if out so said what up its about into than '
+    'them can only other new some could time these two may then do first any my now such like our over man me even '
+    'most made after also did many before must through back years where much your way well down should because each '
+    'just those people how too little state good very make world still own see men work long get here between both '
+    'life being under never day same another know while last might us great old year off come since against go came '
+    'right used take three reading station children question character knowledge together themselves braille'
+).split()
+
+
+def sample_english_text(size, seed=0):
+    """Builds ``size`` characters of English words with the odd capital, number and punctuation mark."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.05:
+            word = word.capitalize()
+        if rng.random() < 0.08:
+            word += rng.choice(',.;?!')
+        elif rng.random() < 0.02:
+            word = str(rng.randint(1, 2022))
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+
+def _cold_grade2(text):
+    grade2_encoder._token_patterns.cache_clear()
+    return grade2_encoder.encode(text)
+
+
+def run(size=1024 * 1024, repeat=5):
+    """Returns each encoder's throughput in MB of input per second and the cells it produced."""
+    text = sample_english_text(size)
+    megabytes = size / (1024 * 1024)
+    results = {
+        'grade1': (_best_of(repeat, braille_encoder.encode, text), len(braille_encoder.to_unicode(text))),
+        'grade2_cold': (_best_of(repeat, _cold_grade2, text), len(grade2_encoder.to_unicode(text))),
+        'grade2': (_best_of(repeat, grade2_encoder.encode, text), len(grade2_encoder.to_unicode(text))),
+    }
+    grade1_cells = results['grade1'][1]
+    return {
+        name: {
+            'seconds': seconds,
+            'mb_per_second': megabytes / seconds,
+            'cells': cells,
+            'cell_reduction': 1 - cells / grade1_cells,
+        }
+        for name, (seconds, cells) in results.items()
+    }
+
+
+if __name__ == '__main__':
+    for name, result in run().items():
+        print(
+            f"{name:>12}: {result['seconds'] * 1000:8.2f}ms per MB  ({result['mb_per_second']:7.1f} MB/s)"
+            f"  {result['cells']:>8} cells ({result['cell_reduction']:6.1%} fewer than grade 1)"
+        )
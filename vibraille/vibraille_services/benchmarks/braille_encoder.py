@@ -0,0 +1,57 @@
+"""Throughput of the compiled braille encoder against the original per-character encoder.
+
+Run from the project root with: ``python -m vibraille.vibraille_services.benchmarks.braille_encoder``
+"""
+import random
+import string
+import time
+from vibraille.vibraille_services.braille_utils import (
+    ascii_braille_map,
+    binary_braille_map,
+    braille_encoder
+)
+
+
+def legacy_encode(text):
+    """The list comprehension encoder BrailleTranslator used before the compiled tables."""
+    _lowered_str = text.lower()
+    braille_format = ''.join([ascii_braille_map[val] for val in _lowered_str if ascii_braille_map.get(val)])
+    braille_binary = ''.join([binary_braille_map[val] for val in _lowered_str if binary_braille_map.get(val)])
+    return braille_format, braille_binary
+
+
+def sample_text(size, seed=0):
+    """Builds OCR-like text of ``size`` characters: mostly words, some punctuation and a few unmapped characters."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters * 6 + string.digits + string.punctuation + ' ' * 12 + 'éü—“”'
+    return ''.join(rng.choice(alphabet) for _ in range(size))
+
+
+def _best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(size=1024 * 1024, repeat=5, batch_size=100):
+    """Returns the throughput of each encoder in MB of input text per second."""
+    text = sample_text(size)
+    ascii_text = text.encode('ascii', errors='ignore').decode('ascii')
+    assert braille_encoder.encode(text) == legacy_encode(text)
+    batch = [sample_text(size // batch_size, seed=seed) for seed in range(batch_size)]
+    megabytes = size / (1024 * 1024)
+    results = {
+        'legacy': _best_of(repeat, legacy_encode, text),
+        'compiled': _best_of(repeat, braille_encoder.encode, text),
+        'compiled_ascii': _best_of(repeat, braille_encoder.encode, ascii_text),
+        'compiled_batch': _best_of(repeat, braille_encoder.encode_batch, batch),
+    }
+    return {name: {'seconds': seconds, 'mb_per_second': megabytes / seconds} for name, seconds in results.items()}
+
+
+if __name__ == '__main__':
+    for name, result in run().items():
+        print(f"{name:>15}: {result['seconds'] * 1000:8.2f}ms per MB  ({result['mb_per_second']:7.1f} MB/s)")
@@ -0,0 +1,246 @@
+"""Local HTTP stand-ins for S3 and Textract, spoken to by the real boto3 clients through AWS_S3_ENDPOINT_URL and
+AWS_TEXTRACT_ENDPOINT_URL, so load tests neither pay for nor get throttled by AWS.
+
+Each service answers after ``latency`` seconds plus up to ``jitter`` more, and answers ``failure_rate`` of requests
+with the throttling error the real service would send, which boto3 retries as it would against AWS. Textract's text
+detection jobs stay IN_PROGRESS for ``job_seconds`` after they are started. Nothing is checked: not the credentials,
+not the signature, nor whether the bucket exists.
+
+To serve both for a server started separately, run from the project root:
+``python -m vibraille.vibraille_services.benchmarks.fake_aws_services --latency 0.5 --failure-rate 0.01``
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+
+# Text each image is read as, one line per entry
+DEFAULT_LINES = ('V 11 March 3s gd law how about people bei cartoonized? see page 31',)
+
+
+class FakeService(ThreadingHTTPServer):
+    """A fake AWS service on a local port, served from a background thread once started."""
+
+    daemon_threads = True
+
+    def __init__(self, handler_class, port=0, latency=0.0, jitter=0.0, failure_rate=0.0):
+        super().__init__(('127.0.0.1', port), handler_class)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def should_fail(self):
+        """Counts a request, and decides whether it is answered with an error."""
+        with self.lock:
+            self.requests += 1
+            failed = random.random() < self.failure_rate
+            self.failures += failed
+        return failed
+
+    def wait(self):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _respond(self, status, body=b'', content_type='application/xml', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class _S3Handler(_Handler):
+    """Path-style object uploads, multipart included, and downloads."""
+
+    def _answer(self, method):
+        body = self._body()
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        self.server.wait()
+        if self.server.should_fail():
+            return self._respond(503, b'<Error><Code>SlowDown</Code><Message>Reduce your request rate.</Message></Error>')
+        objects, uploads = self.server.objects, self.server.uploads
+        if method == 'PUT' and 'uploadId' in query:
+            uploads[query['uploadId'][0]][int(query['partNumber'][0])] = body
+            return self._respond(200, headers=[('ETag', f'"{hashlib.md5(body).hexdigest()}"')])
+        if method == 'PUT':
+            objects[(bucket, key)] = body
+            return self._respond(200, headers=[('ETag', f'"{hashlib.md5(body).hexdigest()}"')])
+        if method == 'POST' and 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = {}
+            return self._respond(200, (
+                f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'
+            ).encode())
+        if method == 'POST' and 'uploadId' in query:
+            parts = uploads.pop(query['uploadId'][0])
+            objects[(bucket, key)] = b''.join(parts[number] for number in sorted(parts))
+            return self._respond(200, (
+                f'<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                f'<ETag>"{hashlib.md5(objects[(bucket, key)]).hexdigest()}"</ETag></CompleteMultipartUploadResult>'
+            ).encode())
+        if method == 'DELETE':
+            uploads.pop(query.get('uploadId', [None])[0], None)
+            objects.pop((bucket, key), None)
+            return self._respond(204)
+        if (bucket, key) not in objects:
+            return self._respond(404, b'<Error><Code>NoSuchKey</Code><Message>Not found.</Message></Error>')
+        return self._respond(200, objects[(bucket, key)], content_type='binary/octet-stream')
+
+    def do_PUT(self):
+        self._answer('PUT')
+
+    def do_POST(self):
+        self._answer('POST')
+
+    def do_DELETE(self):
+        self._answer('DELETE')
+
+    def do_GET(self):
+        self._answer('GET')
+
+    def do_HEAD(self):
+        self._answer('HEAD')
+
+
+class _TextractHandler(_Handler):
+    """The text detection calls of Textract's JSON API."""
+
+    def do_POST(self):
+        request = json.loads(self._body() or b'{}')
+        operation = self.headers.get('X-Amz-Target', '').rpartition('.')[2]
+        self.server.wait()
+        if self.server.should_fail():
+            return self._error(400, 'ProvisionedThroughputExceededException', 'Rate exceeded.')
+        if operation == 'DetectDocumentText':
+            if not base64.b64decode(request.get('Document', {}).get('Bytes', '')):
+                return self._error(400, 'InvalidParameterException', 'No document given.')
+            return self._json({'DocumentMetadata': {'Pages': 1}, 'Blocks': self.server.blocks(page=None)})
+        if operation == 'StartDocumentTextDetection':
+            job_id = uuid.uuid4().hex
+            self.server.jobs[job_id] = time.monotonic() + self.server.job_seconds
+            return self._json({'JobId': job_id})
+        if operation == 'GetDocumentTextDetection':
+            finishes = self.server.jobs.get(request.get('JobId'))
+            if finishes is None:
+                return self._error(400, 'InvalidJobIdException', 'No such job.')
+            if time.monotonic() < finishes:
+                return self._json({'JobStatus': 'IN_PROGRESS'})
+            return self._json({
+                'JobStatus': 'SUCCEEDED', 'DocumentMetadata': {'Pages': 1}, 'Blocks': self.server.blocks(page=1),
+                'Warnings': []
+            })
+        return self._error(400, 'UnknownOperationException', f'{operation} is not faked.')
+
+    def _json(self, data):
+        self._respond(200, json.dumps(data).encode(), content_type='application/x-amz-json-1.1')
+
+    def _error(self, status, code, message):
+        body = json.dumps({'__type': code, 'Message': message}).encode()
+        self._respond(status, body, content_type='application/x-amz-json-1.1')
+
+
+class FakeS3Service(FakeService):
+    """Keeps uploaded objects in memory."""
+
+    def __init__(self, **kwargs):
+        super().__init__(_S3Handler, **kwargs)
+        self.objects = {}
+        self.uploads = {}
+
+
+class FakeTextractService(FakeService):
+    """Reads every image as ``lines``."""
+
+    def __init__(self, lines=DEFAULT_LINES, job_seconds=0.0, **kwargs):
+        super().__init__(_TextractHandler, **kwargs)
+        self.lines = list(lines)
+        self.job_seconds = job_seconds
+        self.jobs = {}
+
+    def blocks(self, page):
+        """The blocks of one page of text, numbered as the asynchronous API numbers them if ``page`` is given."""
+        numbered = {'Page': page} if page else {}
+        return [{'BlockType': 'PAGE', **numbered}] + [
+            {'BlockType': 'LINE', 'Text': line, **numbered} for line in self.lines
+        ]
+
+
+def add_service_arguments(parser):
+    """Adds the options the fake services are configured with to an argparse parser."""
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each AWS request takes at the least.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many more seconds, at random.")
+    parser.add_argument(
+        '--failure-rate', type=float, default=0.0, help="Fraction of AWS requests answered with a throttling error."
+    )
+    parser.add_argument(
+        '--job-seconds', type=float, default=0.0, help="Seconds a Textract text detection job runs for."
+    )
+
+
+def services_from_options(options, s3_port=0, textract_port=0):
+    """The fake S3 and Textract services configured by the options add_service_arguments() added."""
+    common = {'latency': options['latency'], 'jitter': options['jitter'], 'failure_rate': options['failure_rate']}
+    return (
+        FakeS3Service(port=s3_port, **common),
+        FakeTextractService(port=textract_port, job_seconds=options['job_seconds'], **common)
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--s3-port', type=int, default=9000)
+    parser.add_argument('--textract-port', type=int, default=9001)
+    add_service_arguments(parser)
+    arguments = vars(parser.parse_args())
+    s3, textract = services_from_options(arguments, arguments['s3_port'], arguments['textract_port'])
+    with s3, textract:
+        print(f"AWS_S3_ENDPOINT_URL={s3.url} AWS_TEXTRACT_ENDPOINT_URL={textract.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,215 @@
+"""The load test behind ``python manage.py run_load_test``: virtual users registering, logging in, translating images
+and reading their notes over HTTP, with the latency of each endpoint reported as percentiles.
+
+Each virtual user registers a new account, logs in, then takes ``session_actions`` actions drawn from a mix of
+weights before starting over as a new user. Every image uploaded is different, so none is answered from the
+translation cache. By default the server is hermetic: the application is served from this process against a
+throwaway test database, with S3 and Textract replaced by the local services of fake_aws_services.
+"""
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+IMAGE_PATH = "./vibraille/vibraille_services/tests/image_test.jpg"
+BOUNDARY = 'LoadTestBoundary'
+# Bucket the hermetic server uploads to, whatever AWS_STORAGE_BUCKET_NAME is
+BUCKET = 'vibraille-load-test'
+
+# Relative weights of the actions a logged-in virtual user takes
+MIXES = {
+    # Mostly reading notes, with the occasional new page translated or session renewed
+    'default': {'notes_list': 10, 'note_detail': 7, 'translate': 2, 'login': 1},
+    'reads': {'notes_list': 12, 'note_detail': 8},
+    'translations': {'translate': 8, 'notes_list': 2},
+}
+
+
+def _percentile(ordered, fraction):
+    """The nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(fraction * len(ordered)), 1) - 1]
+
+
+class VirtualUser:
+    """One simulated client, keeping its token and the notes it knows of between requests."""
+
+    def __init__(self, base_url, image, record, prefix):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.image = image
+        self.record = record
+        self.prefix = prefix
+        self.token = None
+        self.note_ids = []
+        self.sessions = 0
+
+    def _request(self, action, method, path, body=None, headers=None):
+        """Sends one request on a new connection, recording how long the whole response took."""
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        connection = HTTPConnection(self.host, self.port, timeout=120)
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+            status = response.status
+        except OSError:
+            content, status = b'', None
+        finally:
+            connection.close()
+        self.record((action, status, time.perf_counter() - started))
+        if status is None or status >= 300 or not content:
+            return None
+        return json.loads(content)
+
+    def _post_json(self, action, path, data):
+        return self._request(action, 'POST', path, json.dumps(data), {'Content-Type': 'application/json'})
+
+    def start_session(self):
+        """Registers a new account and logs into it."""
+        self.sessions += 1
+        self.username = f'{self.prefix}_{self.sessions}'
+        self.token, self.note_ids = None, []
+        digits = f'{uuid.uuid4().int % 10 ** 10:010d}'
+        self._post_json('register', '/register/', {
+            'username': self.username, 'password': 'load_Test_Pass', 'email': f'{self.username}@loadtest.invalid',
+            'phone_number': f'+1({digits[:3]}){digits[3:6]}-{digits[6:]}',
+        })
+        self.login()
+
+    def login(self):
+        self.token = None
+        tokens = self._post_json('login', '/login/', {'username': self.username, 'password': 'load_Test_Pass'})
+        self.token = tokens and tokens['access']
+
+    def translate(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test.client import encode_multipart
+        # Different bytes each time, so none is answered from the translation cache.
+        upload = SimpleUploadedFile('page.jpg', self.image + uuid.uuid4().bytes, content_type='image/jpeg')
+        note = self._request(
+            'translate', 'POST', '/notes/translate/', encode_multipart(BOUNDARY, {'img': upload}),
+            {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'}
+        )
+        if note:
+            self.note_ids.append(note['id'])
+
+    def notes_list(self):
+        page = self._request('notes_list', 'GET', '/notes/')
+        if page:
+            self.note_ids = sorted({*self.note_ids, *(note['id'] for note in page['results'])})
+
+    def note_detail(self):
+        if not self.note_ids:
+            return self.translate()
+        self._request('note_detail', 'GET', f'/notes/{random.choice(self.note_ids)}/')
+
+    def run(self, mix, session_actions, until):
+        actions, weights = zip(*mix.items())
+        while time.monotonic() < until:
+            self.start_session()
+            for action in random.choices(actions, weights, k=session_actions):
+                if time.monotonic() >= until:
+                    return
+                getattr(self, action)()
+
+
+def summarize(samples, seconds):
+    """Throughput and latency percentiles (in milliseconds) per action, from (action, status, seconds) samples."""
+    by_action = {}
+    for action, status, latency in samples:
+        by_action.setdefault(action, []).append((status, latency))
+    endpoints = {}
+    for action, results in sorted(by_action.items()):
+        latencies = sorted(latency * 1000 for _status, latency in results)
+        endpoints[action] = {
+            'requests': len(results),
+            'errors': sum(1 for status, _latency in results if status is None or status >= 400),
+            'per_second': len(results) / seconds,
+            'p50_ms': _percentile(latencies, 0.50),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99),
+            'mean_ms': sum(latencies) / len(latencies),
+            'max_ms': latencies[-1],
+        }
+    return {
+        'seconds': seconds,
+        'requests': len(samples),
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'per_second': len(samples) / seconds,
+        'endpoints': endpoints,
+    }
+
+
+def run_load(base_url, users=10, duration=30.0, mix='default', session_actions=20, image_path=IMAGE_PATH):
+    """Runs ``users`` virtual users against the server at ``base_url`` for ``duration`` seconds and summarizes them."""
+    with open(image_path, 'rb') as image_file:
+        image = image_file.read()
+    samples = []
+    record = samples.append
+    run_id = uuid.uuid4().hex[:8]
+    virtual_users = [VirtualUser(base_url, image, record, f'load_{run_id}_{number}') for number in range(users)]
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=user.run, args=(MIXES[mix], session_actions, started + duration), daemon=True)
+        for user in virtual_users
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.monotonic() - started)
+
+
+@contextmanager
+def hermetic_server(s3_service, textract_service, async_textract=False):
+    """Serves the application from this process, on a local port, against a throwaway test database and the fake
+    AWS services given, yielding its URL.
+
+    ``async_textract`` sends every image through S3 and a text detection job, so the job's duration is felt.
+    """
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.testcases import LiveServerThread
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from vibraille.vibraille_services.aws_clients import reset_clients
+    aws_settings = override_settings(
+        AWS_ENDPOINT_URLS={'s3': s3_service.url, 'textract': textract_service.url},
+        AWS_STORAGE_BUCKET_NAME=BUCKET,
+        TEXTRACT_SYNC_ENABLED=not async_textract,
+    )
+    setup_test_environment(debug=False)
+    try:
+        with tempfile.TemporaryDirectory() as database_dir, s3_service, textract_service, aws_settings:
+            reset_clients()
+            test_name = connection.settings_dict['TEST']['NAME']
+            if connection.vendor == 'sqlite':
+                # An in-memory SQLite database fails writes from several threads at once, where a file makes them wait.
+                connection.settings_dict['TEST']['NAME'] = os.path.join(database_dir, 'load_test.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            server = LiveServerThread('127.0.0.1', static_handler=lambda handler: handler)
+            server.daemon = True
+            try:
+                server.start()
+                server.is_ready.wait()
+                if server.error:
+                    raise server.error
+                yield f'http://127.0.0.1:{server.port}'
+            finally:
+                server.terminate()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                connection.settings_dict['TEST']['NAME'] = test_name
+    finally:
+        reset_clients()
+        teardown_test_environment()
@@ -0,0 +1,83 @@
+"""Time to find the user logging in, by phone number, email and username, as the number of users grows.
+
+Password hashing is left out: it costs the same whatever the number of users, and would hide the lookup.
+The phone lookup logins used before phone_normalized (a Python scan of every user) is timed at the smaller sizes.
+
+Needs Django settings (``DJANGO_SETTINGS_MODULE``, defaulting to ``vibraille.settings``). The users are written to a
+throwaway test database, so nothing is left behind. Run from the project root with:
+``python -m vibraille.vibraille_services.benchmarks.login_lookup``
+"""
+import os
+from vibraille.vibraille_services.benchmarks.braille_encoder import _best_of
+
+
+def _phone_number(number):
+    return f'+1({number // 10000000 % 1000:03d}){number // 10000 % 1000:03d}-{number % 10000:04d}'
+
+
+def _add_users(start, stop, batch_size=5000):
+    from vibraille.vibraille_services.models import User, VibrailleUser, normalize_phone_number
+    for batch_start in range(start, stop, batch_size):
+        numbers = range(batch_start, min(batch_start + batch_size, stop))
+        users = User.objects.bulk_create(
+            User(username=f'user_{number}', email=f'user_{number}@test.com', password='!') for number in numbers
+        )
+        # bulk_create skips save(), so the normalized number is filled in here.
+        VibrailleUser.objects.bulk_create(
+            VibrailleUser(
+                user=user, phone_number=_phone_number(number),
+                phone_normalized=normalize_phone_number(_phone_number(number))
+            )
+            for number, user in zip(numbers, users)
+        )
+
+
+def _legacy_phone_lookup(phone_number):
+    """How logins found a user by phone number before phone_normalized."""
+    from vibraille.vibraille_services.models import User
+    _target_users = [users for users in User.objects.all() if users.vibrailleuser.phone_number == phone_number]
+    return _target_users[0] if _target_users else None
+
+
+def run(sizes=(1000, 10000, 100000, 1000000), legacy_max_users=10000, repeat=20):
+    """Returns the seconds each lookup takes for the last user added, at each number of users."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from vibraille.vibraille_services.serializers import VBTokenObtainPairSerializer
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        results = {}
+        users = 0
+        for size in sizes:
+            _add_users(users, size)
+            users = size
+            last = size - 1
+            # Written differently to how it was registered, as users do.
+            phone_number = _phone_number(last).replace('(', ' ').replace(')', ' ')
+            cases = {
+                'phone': lambda: VBTokenObtainPairSerializer.find_user({'phone_number': phone_number}),
+                'email': lambda: VBTokenObtainPairSerializer.find_user({'email': f'user_{last}@test.com'}),
+                'username': lambda: VBTokenObtainPairSerializer.find_user({'username': f'user_{last}'}),
+            }
+            if size <= legacy_max_users:
+                cases['legacy_phone'] = lambda: _legacy_phone_lookup(_phone_number(last))
+            assert all(case() is not None for case in cases.values())
+            results[size] = {
+                name: _best_of(1 if name == 'legacy_phone' else repeat, case) for name, case in cases.items()
+            }
+        return results
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vibraille.settings')
+    django.setup()
+    for size, timings in run().items():
+        print(f"{size:>9,} users: " + "  ".join(
+            f"{name} {seconds * 1000:9.3f}ms" for name, seconds in timings.items()
+        ))
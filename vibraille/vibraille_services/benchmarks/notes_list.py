@@ -0,0 +1,96 @@
+"""Payload size and time of listing a user's notes: the old all-notes dump against the paginated endpoint.
+
+Needs Django settings (``DJANGO_SETTINGS_MODULE``, defaulting to ``vibraille.settings``). The notes are written to a
+throwaway test database, so nothing is left behind. Run from the project root with:
+``python -m vibraille.vibraille_services.benchmarks.notes_list``
+"""
+import os
+import time
+from vibraille.vibraille_services.benchmarks.braille_contractions import sample_english_text
+from vibraille.vibraille_services.benchmarks.braille_encoder import _best_of
+
+
+def _create_notes(user, count, text_size):
+    from vibraille.vibraille_services.braille_utils import braille_encoder, pack_binary
+    from vibraille.vibraille_services.models import Note, NoteContent
+    text = sample_english_text(text_size)
+    braille_format, braille_binary = braille_encoder.encode(text)
+    notes = Note.objects.bulk_create(
+        (
+            Note(user=user, title=f'Note {number}', img=f'note_{number}.jpg', img_name=f'note_{number}.jpg')
+            for number in range(count)
+        ),
+        batch_size=500
+    )
+    NoteContent.objects.bulk_create(
+        (
+            NoteContent(
+                note=note, ascii_text=text, braille_format=braille_format, braille_binary=braille_binary,
+                braille_packed=pack_binary(braille_binary)
+            )
+            for note in notes
+        ),
+        batch_size=500
+    )
+
+
+def _legacy_list(user):
+    """How get_all_notes answered before pagination: every note, serialized to a JSON string."""
+    from vibraille.vibraille_services.models import Note
+    from vibraille.vibraille_services.views import _serialize_notes
+    return _serialize_notes(Note.objects.filter(user=user).select_related('content').defer('content__braille_packed'))
+
+
+def run(notes=10000, text_size=2000, repeat=5):
+    """Returns the seconds and response bytes of listing ``notes`` notes each way."""
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from rest_framework.test import APIClient
+    from vibraille.vibraille_services.models import User
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = User.objects.create(username='benchmark_user')
+        _create_notes(user, notes, text_size)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def fetch(url, cached=False):
+            if not cached:
+                caches[settings.NOTES_CACHE_ALIAS].clear()
+            return client.get(url).content
+
+        cases = {
+            'legacy_all_notes': lambda: _legacy_list(user).encode('utf-8'),
+            'first_page': lambda: fetch('/notes/'),
+            'first_page_cached': lambda: fetch('/notes/', cached=True),
+            'first_page_all_fields': lambda: fetch(
+                '/notes/?fields=id,created,title,img,img_name,ascii_text,braille_format,braille_binary,grade'
+            ),
+        }
+        # A page deep into the list, reached by following cursors from the start.
+        url = '/notes/?page_size=100'
+        for _ in range(notes // 200):
+            url = client.get(url).data['next']
+        cases['page_half_way'] = lambda: fetch(url)
+
+        results = {}
+        for name, case in cases.items():
+            results[name] = {'seconds': _best_of(repeat, case), 'bytes': len(case())}
+        return results
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vibraille.settings')
+    django.setup()
+    started = time.perf_counter()
+    for name, result in run().items():
+        print(f"{name:>22}: {result['seconds'] * 1000:10.2f}ms  {result['bytes']:>12,} bytes")
+    print(f"(set up and ran in {time.perf_counter() - started:.1f}s)")
@@ -0,0 +1,65 @@
+"""Bytes on the wire and serialization CPU of note responses as JSON, MessagePack and CBOR, plain, gzipped and brotli.
+
+Timings are the renderer (and compressor, at the settings CompressionMiddleware uses) alone; no database is used.
+Needs Django settings (``DJANGO_SETTINGS_MODULE``, defaulting to ``vibraille.settings``). Run from the project root with:
+``python -m vibraille.vibraille_services.benchmarks.response_formats``
+"""
+import os
+from vibraille.vibraille_services.benchmarks.braille_contractions import sample_english_text
+from vibraille.vibraille_services.benchmarks.braille_encoder import _best_of
+
+
+def _notes_page(notes, text_size):
+    """A page of notes with every field, as /notes/?fields=... returns it. Each note has different text."""
+    from vibraille.vibraille_services.braille_utils import braille_encoder
+    texts = [sample_english_text(text_size, seed=number) for number in range(notes)]
+    return {
+        'next': 'http://localhost:8000/notes/?cursor=cD0yMDIyLTA3LTE4KzEyJTNBMDAlM0EwMA%3D%3D',
+        'previous': None,
+        'results': [
+            {
+                'id': number, 'created': '2022-07-18T12:00:00.000000Z', 'title': f'Note {number}',
+                'img': f'note_{number}.jpg', 'img_name': f'note_{number}.jpg', 'ascii_text': text,
+                'braille_format': braille_format, 'braille_binary': braille_binary, 'grade': 1,
+            }
+            for number, text in enumerate(texts)
+            for braille_format, braille_binary in [braille_encoder.encode(text)]
+        ],
+    }
+
+
+def run(notes=10, text_size=2000, repeat=50):
+    """Returns the bytes, and render and compression seconds, of a page of ``notes`` notes in each format."""
+    import brotli
+    from django.conf import settings
+    from django.utils.text import compress_string
+    from rest_framework.renderers import JSONRenderer
+    from vibraille.vibraille_services.renderers import CBORRenderer, MessagePackRenderer
+
+    page = _notes_page(notes, text_size)
+    results = {}
+    for renderer in (JSONRenderer(), MessagePackRenderer(), CBORRenderer()):
+        body = renderer.render(page, renderer.media_type)
+        results[renderer.format] = {
+            'bytes': len(body),
+            'render_seconds': _best_of(repeat, renderer.render, page, renderer.media_type),
+            'gzip_bytes': len(compress_string(body)),
+            'gzip_seconds': _best_of(repeat, compress_string, body),
+            'brotli_bytes': len(brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)),
+            'brotli_seconds': _best_of(
+                repeat, lambda: brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+            ),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vibraille.settings')
+    django.setup()
+    for name, result in run().items():
+        print(
+            f"{name:>8}: {result['bytes']:>8,} bytes in {result['render_seconds'] * 1000:6.3f}ms"
+            f"  gzip {result['gzip_bytes']:>7,} bytes (+{result['gzip_seconds'] * 1000:6.3f}ms)"
+            f"  brotli {result['brotli_bytes']:>7,} bytes (+{result['brotli_seconds'] * 1000:6.3f}ms)"
+        )
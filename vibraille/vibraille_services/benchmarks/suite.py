@@ -0,0 +1,233 @@
+"""The micro-benchmark suite behind ``python manage.py run_benchmarks``, timing the hot paths a regression would show in.
+
+Cases are grouped by what they exercise: the braille encoding of BrailleTranslator, TranslationSerializer.create with
+the AWS clients faked, the notes list and detail views at several numbers of notes, and the login serializer. Cases
+that need rows are run against a throwaway test database, and only set it up if one of them is selected.
+"""
+from contextlib import contextmanager
+import statistics
+import tempfile
+import time
+from vibraille.vibraille_services.benchmarks.braille_contractions import sample_english_text
+
+IMAGE_PATH = "./vibraille/vibraille_services/tests/image_test.jpg"
+
+# Characters of OCR text the encoding cases convert
+TEXT_SIZES = (1000, 100000)
+# Notes the user owns in the notes view cases
+NOTE_COUNTS = (10, 100, 1000)
+
+
+class Case:
+    """A named, timed call; ``setup`` (given the database, if needed) returns the function that is timed."""
+
+    def __init__(self, name, setup, params=None, needs_database=False):
+        self.name = name
+        self.setup = setup
+        self.params = params or {}
+        self.needs_database = needs_database
+
+
+def _timings(func, repeat):
+    """Calls ``func`` once to warm up, then ``repeat`` times, returning the seconds each call took in summary."""
+    func()
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - started)
+    return {
+        'best': min(seconds),
+        'median': statistics.median(seconds),
+        'mean': statistics.fmean(seconds),
+        'stdev': statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        'repeat': repeat,
+    }
+
+
+def _translator(text, grade):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from vibraille.vibraille_services.braille_utils import BrailleTranslator
+    b_process = BrailleTranslator(SimpleUploadedFile('text.jpg', b'', content_type='image/jpeg'), grade=grade)
+    b_process.conv_str = text
+    return b_process
+
+
+def _braille_cases():
+    for grade in (1, 2):
+        for size in TEXT_SIZES:
+            params = {'grade': grade, 'characters': size}
+            for method in ('convert_str_to_braille', 'convert_to_binary'):
+                yield Case(
+                    f'braille.{method}[grade={grade},chars={size}]',
+                    lambda method=method, grade=grade, size=size: getattr(
+                        _translator(sample_english_text(size), grade), method
+                    ),
+                    params
+                )
+
+
+def _translation_create(user):
+    from django.core.cache import caches
+    from django.conf import settings
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from vibraille.vibraille_services.serializers import TranslationSerializer
+    with open(IMAGE_PATH, 'rb') as image_file:
+        image = image_file.read()
+    request = Request(APIRequestFactory().post('/notes/translate/'))
+    request.user = user
+    uploads = 0
+
+    def create():
+        nonlocal uploads
+        uploads += 1
+        # A different image each call, so none is answered from the translation cache.
+        upload = SimpleUploadedFile(f'page_{uploads}.jpg', image + uploads.to_bytes(4, 'big'), content_type='image/jpeg')
+        serializer = TranslationSerializer(data={'img': upload}, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+    return create
+
+
+def _notes_view(database, notes, url):
+    from django.conf import settings
+    from django.core.cache import caches
+    from rest_framework.test import APIClient
+    from vibraille.vibraille_services.models import Note
+    user = database.user_with_notes(notes)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = url.format(note_id=Note.objects.filter(user=user).order_by('id').values_list('id', flat=True).first())
+
+    def get():
+        # Timed without the notes cache, which would otherwise answer every call after the first.
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        return response.content
+
+    return get
+
+
+def _login(database, field):
+    from vibraille.vibraille_services.serializers import VBTokenObtainPairSerializer
+    credentials = {
+        'username': {'username': 'benchmark_login'},
+        'email': {'email': 'benchmark_login@test.com'},
+        'phone_number': {'phone_number': '+1 (555) 010-0000'},
+    }[field]
+    database.login_user()
+
+    def login():
+        serializer = VBTokenObtainPairSerializer(data={**credentials, 'password': 'benchmark_Pass'})
+        serializer.is_valid(raise_exception=True)
+
+    return login
+
+
+def _database_cases():
+    yield Case(
+        'serializers.TranslationSerializer.create', lambda database: _translation_create(database.user_with_notes(0)),
+        needs_database=True
+    )
+    for notes in NOTE_COUNTS:
+        for name, url in (
+            ('notes_list', '/notes/'),
+            ('notes_list_full_page', '/notes/?fields=id,title,ascii_text,braille_format,braille_binary&page_size=100'),
+            ('note_detail', '/notes/{note_id}/'),
+        ):
+            yield Case(
+                f'views.{name}[notes={notes}]',
+                lambda database, notes=notes, url=url: _notes_view(database, notes, url),
+                {'notes': notes}, needs_database=True
+            )
+    for field in ('username', 'email', 'phone_number'):
+        yield Case(
+            f'serializers.VBTokenObtainPairSerializer[{field}]',
+            lambda database, field=field: _login(database, field), {'field': field}, needs_database=True
+        )
+
+
+def all_cases():
+    return [*_braille_cases(), *_database_cases()]
+
+
+class _Database:
+    """Rows shared by the database cases, created once each."""
+
+    def __init__(self):
+        self._users = {}
+        self._login_user = None
+
+    def user_with_notes(self, notes):
+        from vibraille.vibraille_services.benchmarks.notes_list import _create_notes
+        from vibraille.vibraille_services.models import User
+        if notes not in self._users:
+            self._users[notes] = User.objects.create(username=f'benchmark_{notes}_notes')
+            _create_notes(self._users[notes], notes, text_size=2000)
+        return self._users[notes]
+
+    def login_user(self):
+        from vibraille.vibraille_services.models import User
+        if self._login_user is None:
+            self._login_user = User.objects.create_user(
+                username='benchmark_login', email='benchmark_login@test.com', password='benchmark_Pass'
+            )
+            self._login_user.vibrailleuser.phone_number = '+1(555)010-0000'
+            self._login_user.vibrailleuser.verified_email = True
+            self._login_user.vibrailleuser.save()
+        return self._login_user
+
+
+@contextmanager
+def _throwaway_database():
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from vibraille.vibraille_services.tests.fakes import FakeAWS
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        # The images TranslationSerializer.create saves go to a directory removed afterwards, not the real MEDIA_ROOT.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root), FakeAWS().install():
+            yield _Database()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def run(cases, repeat=5, on_result=None):
+    """Times each case, returning its timings (in seconds) and parameters by name.
+
+    ``on_result(name, result)`` is called as each case finishes, for reporting progress.
+    """
+    results = {}
+
+    def measure(case, func):
+        results[case.name] = {'params': case.params, 'seconds': _timings(func, repeat)}
+        if on_result:
+            on_result(case.name, results[case.name])
+
+    for case in cases:
+        if not case.needs_database:
+            measure(case, case.setup())
+    database_cases = [case for case in cases if case.needs_database]
+    if database_cases:
+        with _throwaway_database() as database:
+            for case in database_cases:
+                measure(case, case.setup(database))
+    return results
+
+
+def compare(baseline, results):
+    """Returns (name, baseline best, best, relative change) for each case timed in both runs, slowest change first."""
+    changes = [
+        (name, baseline[name]['seconds']['best'], result['seconds']['best'],
+         result['seconds']['best'] / baseline[name]['seconds']['best'] - 1)
+        for name, result in results.items() if name in baseline
+    ]
+    return sorted(changes, key=lambda change: change[3], reverse=True)
@@ -0,0 +1,74 @@
+from django.db.models.functions import Substr
+import json
+import re
+import numpy as np
+from .braille_utils import get_braille_encoder
+from .models import Note, NoteContent
+
+
+DEFAULT_FRAME_CELLS = 64
+MAX_FRAME_CELLS = 4096
+
+# The token at the end of a window that may continue into the next one, tokenised as the Grade 2 encoder does: a word,
+# or a number (with the '.' and ',' inside it) and any letters straight after it, which take a grade 1 indicator.
+_trailing_token = re.compile(r'(?:[0-9]+(?:[.,][0-9]+)*[.,]?)?[A-Za-z]*$')
+
+def iter_text_windows(note_id, first_window, max_window, using=None):
+    """Reads a Note's ascii_text out of the database (``using``, or wherever reads are routed) a window at a time.
+
+    The first read is small so the first cells go out right away; each read after that doubles
+    in size up to ``max_window`` characters, keeping the number of queries down on long notes.
+    """
+    start, window = 1, first_window
+    while True:
+        chunk = NoteContent.objects.using(using).filter(note_id=note_id).annotate(
+            text_window=Substr('ascii_text', start, window)
+        ).values_list('text_window', flat=True).first()
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < window:
+            return
+        start += window
+        window = min(window * 2, max_window)
+
+
+def iter_braille_frames(note_id, frame_size, max_window=65536, using=None):
+    """Yields (unicode, binary) frames of exactly ``frame_size`` cells; only the last may be shorter."""
+    grade = Note.objects.using(using).filter(id=note_id).values_list('braille_grade', flat=True).first() or 1
+    encoder = get_braille_encoder(grade)
+    pending = np.empty(0, dtype=np.uint8)
+    carry = ''
+    windows = iter_text_windows(note_id, first_window=frame_size, max_window=max(frame_size, max_window), using=using)
+    for chunk in windows:
+        chunk = carry + chunk
+        carry = ''
+        if grade != 1:
+            # Contractions and number signs depend on the whole token, so one cut by the window waits for the rest.
+            match = _trailing_token.search(chunk)
+            chunk, carry = chunk[:match.start()], match.group()
+        pending = np.concatenate((pending, encoder.cell_patterns(chunk)))
+        while len(pending) >= frame_size:
+            yield encoder.formats_from_patterns(pending[:frame_size])
+            pending = pending[frame_size:]
+    if carry:
+        pending = np.concatenate((pending, encoder.cell_patterns(carry)))
+    if len(pending):
+        yield encoder.formats_from_patterns(pending)
+
+
+def stream_braille_frames(note_id, frame_size, event_stream=False, using=None):
+    """Yields a Note's braille as encoded frames: server-sent events, or newline delimited JSON, read from ``using``."""
+    seq = -1
+    cells = 0
+    for seq, (braille_format, braille_binary) in enumerate(iter_braille_frames(note_id, frame_size, using=using)):
+        cells += len(braille_format)
+        yield _frame('cells', {'seq': seq, 'cells': braille_format, 'binary': braille_binary}, event_stream)
+    yield _frame('done', {'done': True, 'frames': seq + 1, 'cells': cells}, event_stream)
+
+
+def _frame(event, data, event_stream):
+    payload = json.dumps(data, ensure_ascii=False)
+    if event_stream:
+        return f"event: {event}\ndata: {payload}\n\n".encode('utf-8')
+    return f"{payload}\n".encode('utf-8')
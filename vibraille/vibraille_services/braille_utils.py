@@ -1,7 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from django.conf import settings
-import random
+import codecs
+import functools
+import hashlib
+import logging
 import os
-import boto3
+import re
+import tempfile
+import threading
+import time
+import uuid
+import numpy as np
+from .aws_clients import get_client
+from .documents import DOCUMENT_FORMATS, detect_format
+from .image_preprocessing import preprocess_image
+from .ocr_backends import get_ocr_backend
+from .translation_cache import get_cached_translation
+
+
+logger = logging.getLogger(__name__)
+
+_archive_pool = None
+_archive_pool_lock = threading.Lock()
 
 
 ascii_braille_map = {' ': '⠀', '!': '⠮', '"': '⠐', '#': '⠼', '$': '⠫', '%': '⠩',
@@ -17,7 +38,7 @@ ascii_braille_map = {' ': '⠀', '!': '⠮', '"': '⠐', '#': '⠼', '$': '⠫',
                      '\\': '⠳', ']': '⠻', '^': '⠘', '_': '⠸'}
 
 binary_braille_map = {' ': '000000', '!': '011101', '"': '000010', '#': '001111', '$': '110101', '%': '100101',
-                      '&': '111101', '\'': '001000', '(': '111011', ')': '111011', '*': '100001', '+': '001101',
+                      '&': '111101', '\'': '001000', '(': '111011', ')': '011111', '*': '100001', '+': '001101',
                       ',': '000001', '-': '001001', '.': '000101', '/': '001100', '0': '001011', '1': '010000',
                       '2': '011000', '3': '010010', '4': '010011', '5': '010001', '6': '011010', '7': '011011',
                       '8': '011001', '9': '001010', ':': '100011', ';': '000011', '<': '110001', '=': '111111',
@@ -29,91 +50,577 @@ binary_braille_map = {' ': '000000', '!': '011101', '"': '000010', '#': '001111'
                       '\\': '110011', ']': '110111', '^': '000110', '_': '000111'}
 
 
+PACKED_BIT_WEIGHTS = np.array([32, 16, 8, 4, 2, 1], dtype=np.uint8)
+
+
+class BrailleEncoder:
+    """Encoder compiled once from a unicode braille map.
+
+    Each mapped character is boiled down to its 6-dot cell pattern with a single ``bytes.translate``
+    over the text, and both output formats are read off those patterns with numpy lookups. The
+    binary form of a cell is its dots 1 to 6, taken from the bits of the unicode cell itself, so
+    every distinct cell has a distinct binary form.
+
+    Unmapped character policy: text is matched case-insensitively, exactly as if it had been run
+    through ``str.lower`` first, and any character with no braille cell (after lowering) is dropped
+    from the output. Non-ASCII characters are folded this way the first time they are seen and the
+    result is remembered, so ASCII text never leaves the C fast path.
+    """
+
+    def __init__(self, unicode_map):
+        self.unicode_map = unicode_map
+        pattern_table = bytearray(range(256))
+        mapped = set()
+        # Bit n of a unicode cell's offset from U+2800 is dot n + 1.
+        self.binary_rows = ((np.arange(64)[:, None] >> np.arange(6)) & 1).astype(np.uint8) + ord('0')
+        for char, cell in unicode_map.items():
+            pattern = ord(cell) - 0x2800
+            if not 0 <= pattern < 64:
+                raise ValueError(f"{cell!r} is not a 6-dot braille cell.")
+            for variant in {char, char.upper()}:
+                if variant.isascii() and variant.lower() == char:
+                    pattern_table[ord(variant)] = pattern
+                    mapped.add(ord(variant))
+        # Packed cells hold the binary form's six bits in one byte, dot 1 in the highest of them.
+        self.packed_values = (self.binary_rows - ord('0')) @ PACKED_BIT_WEIGHTS
+        self.pattern_table = bytes(pattern_table)
+        self.unmapped = bytes(byte for byte in range(256) if byte not in mapped)
+        self.folded = {}
+        self.fold_errors = f"braille_fold_{id(self):x}"
+        codecs.register_error(self.fold_errors, self._fold_non_ascii)
+
+    def _fold_non_ascii(self, error):
+        folded = []
+        for char in error.object[error.start:error.end]:
+            if char not in self.folded:
+                self.folded[char] = ''.join(low for low in char.lower() if low in self.unicode_map)
+            folded.append(self.folded[char])
+        return ''.join(folded), error.end
+
+    def cell_patterns(self, text):
+        """Returns the dot pattern (0-63) of every braille cell the text encodes to."""
+        ascii_text = text.encode('ascii', errors=self.fold_errors)
+        return np.frombuffer(ascii_text.translate(self.pattern_table, self.unmapped), dtype=np.uint8)
+
+    def to_unicode(self, text):
+        """Encodes text to unicode braille."""
+        return self._patterns_to_unicode(self.cell_patterns(text))
+
+    def to_binary(self, text):
+        """Encodes text to its binary form, six '0'/'1' characters per cell."""
+        return self._patterns_to_binary(self.cell_patterns(text))
+
+    def to_packed(self, text):
+        """Encodes text to packed binary, one byte per cell."""
+        return self._patterns_to_packed(self.cell_patterns(text))
+
+    def encode(self, text):
+        """Encodes text to both unicode braille and its binary form, making a single pass over the text."""
+        patterns = self.cell_patterns(text)
+        return self._patterns_to_unicode(patterns), self._patterns_to_binary(patterns)
+
+    def encode_all(self, text):
+        """Encodes text to unicode braille, binary and packed binary, making a single pass over the text."""
+        patterns = self.cell_patterns(text)
+        return self._patterns_to_unicode(patterns), self._patterns_to_binary(patterns), self._patterns_to_packed(patterns)
+
+    def encode_batch(self, texts):
+        """Encodes many texts at once, returning a (unicode, binary) pair for each in order."""
+        patterns = [self.cell_patterns(text) for text in texts]
+        if not patterns:
+            return []
+        # Build both outputs for the whole batch in one go, then slice each text's share back out.
+        all_unicode = self._patterns_to_unicode(np.concatenate(patterns))
+        all_binary = self._patterns_to_binary(np.concatenate(patterns))
+        encoded = []
+        start = 0
+        for text_patterns in patterns:
+            end = start + len(text_patterns)
+            encoded.append((all_unicode[start:end], all_binary[start * 6:end * 6]))
+            start = end
+        return encoded
+
+    def formats_from_patterns(self, patterns):
+        """Returns the unicode braille and binary form of cell patterns from cell_patterns()."""
+        return self._patterns_to_unicode(patterns), self._patterns_to_binary(patterns)
+
+    @staticmethod
+    def _patterns_to_unicode(patterns):
+        return (patterns.astype('<u2') + 0x2800).tobytes().decode('utf-16-le')
+
+    def _patterns_to_binary(self, patterns):
+        return self.binary_rows[patterns].tobytes().decode('ascii')
+
+    def _patterns_to_packed(self, patterns):
+        return self.packed_values[patterns].tobytes()
+
+
+def pack_binary(braille_binary):
+    """Packs a binary braille string, six '0'/'1' characters per cell, into one byte per cell."""
+    bits = np.frombuffer(braille_binary.encode('ascii'), dtype=np.uint8) - ord('0')
+    return (bits.reshape(-1, 6) @ PACKED_BIT_WEIGHTS).tobytes()
+
+
+def unpack_binary(braille_packed):
+    """Turns packed braille, one byte per cell, back into six '0'/'1' characters per cell."""
+    cells = np.frombuffer(bytes(braille_packed), dtype=np.uint8)
+    bits = (cells[:, None] >> np.arange(5, -1, -1, dtype=np.uint8)) & 1
+    return (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+
+
+braille_encoder = BrailleEncoder(ascii_braille_map)
+
+
+# Where in a word a contraction may be used
+WHOLE_WORD = 'word'
+ANYWHERE = 'anywhere'
+WORD_START = 'initial'
+MID_WORD = 'medial'
+NOT_WORD_START = 'not_initial'
+
+
+def _cells(spelling):
+    """Spells out contraction cells: letters use their own cell, braille characters are kept as they are."""
+    return ''.join(ascii_braille_map.get(char, char) for char in spelling)
+
+
+# A subset of Unified English Braille (Grade 2) contractions: (text, cells, where it may be used).
+grade2_contractions = [
+    # Alphabetic wordsigns
+    ('but', _cells('b'), WHOLE_WORD), ('can', _cells('c'), WHOLE_WORD), ('do', _cells('d'), WHOLE_WORD),
+    ('every', _cells('e'), WHOLE_WORD), ('from', _cells('f'), WHOLE_WORD), ('go', _cells('g'), WHOLE_WORD),
+    ('have', _cells('h'), WHOLE_WORD), ('just', _cells('j'), WHOLE_WORD), ('knowledge', _cells('k'), WHOLE_WORD),
+    ('like', _cells('l'), WHOLE_WORD), ('more', _cells('m'), WHOLE_WORD), ('not', _cells('n'), WHOLE_WORD),
+    ('people', _cells('p'), WHOLE_WORD), ('quite', _cells('q'), WHOLE_WORD), ('rather', _cells('r'), WHOLE_WORD),
+    ('so', _cells('s'), WHOLE_WORD), ('that', _cells('t'), WHOLE_WORD), ('us', _cells('u'), WHOLE_WORD),
+    ('very', _cells('v'), WHOLE_WORD), ('will', _cells('w'), WHOLE_WORD), ('it', _cells('x'), WHOLE_WORD),
+    ('you', _cells('y'), WHOLE_WORD), ('as', _cells('z'), WHOLE_WORD),
+    # Strong contractions
+    ('and', '⠯', ANYWHERE), ('for', '⠿', ANYWHERE), ('of', '⠷', ANYWHERE), ('the', '⠮', ANYWHERE),
+    ('with', '⠾', ANYWHERE),
+    # Strong wordsigns
+    ('child', '⠡', WHOLE_WORD), ('shall', '⠩', WHOLE_WORD), ('this', '⠹', WHOLE_WORD), ('which', '⠱', WHOLE_WORD),
+    ('out', '⠳', WHOLE_WORD), ('still', '⠌', WHOLE_WORD),
+    # Strong groupsigns
+    ('ch', '⠡', ANYWHERE), ('gh', '⠣', ANYWHERE), ('sh', '⠩', ANYWHERE), ('th', '⠹', ANYWHERE),
+    ('wh', '⠱', ANYWHERE), ('ed', '⠫', ANYWHERE), ('er', '⠻', ANYWHERE), ('ou', '⠳', ANYWHERE),
+    ('ow', '⠪', ANYWHERE), ('st', '⠌', ANYWHERE), ('ing', '⠬', ANYWHERE), ('ar', '⠜', ANYWHERE),
+    # Lower wordsigns
+    ('be', '⠆', WHOLE_WORD), ('enough', '⠢', WHOLE_WORD), ('were', '⠶', WHOLE_WORD), ('his', '⠦', WHOLE_WORD),
+    ('in', '⠔', WHOLE_WORD), ('was', '⠴', WHOLE_WORD),
+    # Lower groupsigns
+    ('ea', '⠂', MID_WORD), ('bb', '⠆', MID_WORD), ('cc', '⠒', MID_WORD), ('ff', '⠖', MID_WORD),
+    ('gg', '⠶', MID_WORD), ('en', '⠢', ANYWHERE), ('in', '⠔', ANYWHERE), ('be', '⠆', WORD_START),
+    ('con', '⠒', WORD_START), ('dis', '⠲', WORD_START),
+    # Initial-letter contractions
+    ('day', '⠐⠙', ANYWHERE), ('ever', '⠐⠑', ANYWHERE), ('father', '⠐⠋', ANYWHERE), ('here', '⠐⠓', ANYWHERE),
+    ('know', '⠐⠅', ANYWHERE), ('lord', '⠐⠇', ANYWHERE), ('mother', '⠐⠍', ANYWHERE), ('name', '⠐⠝', ANYWHERE),
+    ('one', '⠐⠕', ANYWHERE), ('part', '⠐⠏', ANYWHERE), ('question', '⠐⠟', ANYWHERE), ('right', '⠐⠗', ANYWHERE),
+    ('some', '⠐⠎', ANYWHERE), ('time', '⠐⠞', ANYWHERE), ('under', '⠐⠥', ANYWHERE), ('work', '⠐⠺', ANYWHERE),
+    ('young', '⠐⠽', ANYWHERE), ('there', '⠐⠮', ANYWHERE), ('character', '⠐⠡', ANYWHERE),
+    ('through', '⠐⠹', ANYWHERE), ('where', '⠐⠱', ANYWHERE), ('ought', '⠐⠳', ANYWHERE),
+    ('upon', '⠘⠥', ANYWHERE), ('word', '⠘⠺', ANYWHERE), ('these', '⠘⠮', ANYWHERE), ('those', '⠘⠹', ANYWHERE),
+    ('whose', '⠘⠱', ANYWHERE), ('cannot', '⠸⠉', ANYWHERE), ('had', '⠸⠓', ANYWHERE), ('many', '⠸⠍', ANYWHERE),
+    ('spirit', '⠸⠎', ANYWHERE), ('world', '⠸⠺', ANYWHERE), ('their', '⠸⠮', ANYWHERE),
+    # Final-letter groupsigns
+    ('ound', '⠨⠙', NOT_WORD_START), ('ance', '⠨⠑', NOT_WORD_START), ('sion', '⠨⠝', NOT_WORD_START),
+    ('less', '⠨⠎', NOT_WORD_START), ('ount', '⠨⠞', NOT_WORD_START), ('ence', '⠰⠑', NOT_WORD_START),
+    ('ong', '⠰⠛', NOT_WORD_START), ('ful', '⠰⠇', NOT_WORD_START), ('tion', '⠰⠝', NOT_WORD_START),
+    ('ness', '⠰⠎', NOT_WORD_START), ('ment', '⠰⠞', NOT_WORD_START), ('ity', '⠰⠽', NOT_WORD_START),
+    # Shortforms
+    ('about', _cells('ab'), WHOLE_WORD), ('above', _cells('abv'), WHOLE_WORD), ('according', _cells('ac'), WHOLE_WORD),
+    ('across', _cells('acr'), WHOLE_WORD), ('after', _cells('af'), WHOLE_WORD), ('afternoon', _cells('afn'), WHOLE_WORD),
+    ('again', _cells('ag'), WHOLE_WORD), ('against', _cells('ag⠌'), WHOLE_WORD), ('almost', _cells('alm'), WHOLE_WORD),
+    ('already', _cells('alr'), WHOLE_WORD), ('also', _cells('al'), WHOLE_WORD), ('although', _cells('al⠹'), WHOLE_WORD),
+    ('altogether', _cells('alt'), WHOLE_WORD), ('always', _cells('alw'), WHOLE_WORD), ('because', _cells('⠆c'), WHOLE_WORD),
+    ('before', _cells('⠆f'), WHOLE_WORD), ('behind', _cells('⠆h'), WHOLE_WORD), ('below', _cells('⠆l'), WHOLE_WORD),
+    ('beneath', _cells('⠆n'), WHOLE_WORD), ('beside', _cells('⠆s'), WHOLE_WORD), ('between', _cells('⠆t'), WHOLE_WORD),
+    ('beyond', _cells('⠆y'), WHOLE_WORD), ('blind', _cells('bl'), WHOLE_WORD), ('braille', _cells('brl'), WHOLE_WORD),
+    ('children', _cells('⠡n'), WHOLE_WORD), ('could', _cells('cd'), WHOLE_WORD), ('either', _cells('ei'), WHOLE_WORD),
+    ('first', _cells('f⠌'), WHOLE_WORD), ('friend', _cells('fr'), WHOLE_WORD), ('good', _cells('gd'), WHOLE_WORD),
+    ('great', _cells('grt'), WHOLE_WORD), ('herself', _cells('h⠻f'), WHOLE_WORD), ('him', _cells('hm'), WHOLE_WORD),
+    ('himself', _cells('hmf'), WHOLE_WORD), ('immediate', _cells('imm'), WHOLE_WORD), ('its', _cells('xs'), WHOLE_WORD),
+    ('itself', _cells('xf'), WHOLE_WORD), ('letter', _cells('lr'), WHOLE_WORD), ('little', _cells('ll'), WHOLE_WORD),
+    ('much', _cells('m⠡'), WHOLE_WORD), ('must', _cells('m⠌'), WHOLE_WORD), ('myself', _cells('myf'), WHOLE_WORD),
+    ('necessary', _cells('nec'), WHOLE_WORD), ('neither', _cells('nei'), WHOLE_WORD), ('paid', _cells('pd'), WHOLE_WORD),
+    ('perhaps', _cells('p⠻h'), WHOLE_WORD), ('quick', _cells('qk'), WHOLE_WORD), ('said', _cells('sd'), WHOLE_WORD),
+    ('should', _cells('⠩d'), WHOLE_WORD), ('such', _cells('s⠡'), WHOLE_WORD), ('themselves', _cells('⠮mvs'), WHOLE_WORD),
+    ('today', _cells('td'), WHOLE_WORD), ('together', _cells('tgr'), WHOLE_WORD), ('tomorrow', _cells('tm'), WHOLE_WORD),
+    ('tonight', _cells('tn'), WHOLE_WORD), ('would', _cells('wd'), WHOLE_WORD), ('your', _cells('yr'), WHOLE_WORD),
+    ('yourself', _cells('yrf'), WHOLE_WORD), ('yourselves', _cells('yrvs'), WHOLE_WORD),
+]
+
+
+# UEB numbers: a number sign, then the letters a-j as the digits 1-0, with '.' and ',' kept inside the number.
+ueb_number_sign = '⠼'
+# Grade 1 indicator, put before a letter a-j straight after a number so it does not read as a digit
+ueb_letter_sign = '⠰'
+# UEB cells for digits, punctuation and symbols, used by the Grade 2 encoder in place of Grade 1's computer braille
+ueb_symbol_map = {
+    ' ': '⠀', '1': '⠁', '2': '⠃', '3': '⠉', '4': '⠙', '5': '⠑', '6': '⠋', '7': '⠛', '8': '⠓', '9': '⠊', '0': '⠚',
+    ',': '⠂', ';': '⠆', ':': '⠒', '.': '⠲', '!': '⠖', '?': '⠦', '\'': '⠄', '"': '⠠⠶', '-': '⠤', '(': '⠐⠣',
+    ')': '⠐⠜', '[': '⠨⠣', ']': '⠨⠜', '/': '⠸⠌', '\\': '⠸⠡', '&': '⠈⠯', '@': '⠈⠁', '#': '⠸⠹', '$': '⠈⠎',
+    '%': '⠨⠴', '*': '⠐⠔', '+': '⠐⠖', '=': '⠐⠶', '<': '⠈⠣', '>': '⠈⠜', '^': '⠈⠢', '_': '⠨⠤',
+}
+
+
+class ContractionTrie:
+    """Trie over contraction texts, compiled once, for finding the longest usable contraction."""
+
+    def __init__(self, contractions):
+        self.root = {}
+        for text, cells, where in contractions:
+            node = self.root
+            for char in text:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append((where, bytes(ord(cell) - 0x2800 for cell in cells)))
+
+    def longest_match(self, word, start):
+        """Returns (end, cell patterns) of the longest contraction usable at ``word[start:]``, or None."""
+        node = self.root
+        found = None
+        for end in range(start + 1, len(word) + 1):
+            node = node.get(word[end - 1])
+            if node is None:
+                break
+            for where, patterns in node.get(None, ()):
+                if self._usable(where, start, end, len(word)):
+                    found = (end, patterns)
+                    break
+        return found
+
+    @staticmethod
+    def _usable(where, start, end, length):
+        if where == ANYWHERE:
+            return True
+        if where == WHOLE_WORD:
+            return start == 0 and end == length
+        if where == WORD_START:
+            return start == 0 and end < length
+        if where == MID_WORD:
+            return start > 0 and end < length
+        return start > 0
+
+
+class ContractedBrailleEncoder(BrailleEncoder):
+    """Grade 2 encoder: words use the longest contraction that fits at each point, left to right.
+
+    Numbers start with the UEB number sign and punctuation uses UEB's cells (``symbol_map``), not
+    Grade 1's computer braille, whose digits and punctuation share cells with contractions. The
+    unmapped character policy is the same as Grade 1's. This covers the common UEB contractions
+    but not every rule, e.g. grade 1 indicators are only put after numbers, and there are no
+    syllable-boundary exceptions. Words are memoised, as real text repeats the same few thousand
+    words over and over.
+    """
+
+    word_pattern = re.compile(r'[a-z]+|[0-9]+(?:[.,][0-9]+)*|[^a-z0-9]+')
+
+    def __init__(self, unicode_map, contractions, symbol_map, memo_size=65536):
+        super().__init__(unicode_map)
+        self.trie = ContractionTrie(contractions)
+        self.symbol_patterns = {
+            char: bytes(ord(cell) - 0x2800 for cell in cells) for char, cells in symbol_map.items()
+        }
+        self.number_sign = ord(ueb_number_sign) - 0x2800
+        self.letter_sign = bytes([ord(ueb_letter_sign) - 0x2800])
+        self._token_patterns = functools.lru_cache(maxsize=memo_size)(self._encode_token)
+
+    def _encode_token(self, token):
+        if '0' <= token[0] <= '9':
+            return bytes([self.number_sign]) + b''.join(self.symbol_patterns[char] for char in token)
+        if not ('a' <= token[0] <= 'z'):
+            # Dropping what Grade 1 has no cell for, control characters and {|}~` included, as Grade 1 does.
+            folded = token.encode('ascii', errors=self.fold_errors).translate(None, self.unmapped).decode('ascii')
+            return b''.join(
+                self.symbol_patterns.get(char) or self.pattern_table[ord(char)].to_bytes(1, 'little')
+                for char in folded
+            )
+        patterns = bytearray()
+        start = 0
+        while start < len(token):
+            match = self.trie.longest_match(token, start)
+            if match:
+                start, cells = match
+                patterns += cells
+            else:
+                patterns += self.pattern_table[ord(token[start])].to_bytes(1, 'little')
+                start += 1
+        return bytes(patterns)
+
+    def cell_patterns(self, text):
+        """Returns the dot pattern (0-63) of every braille cell the text contracts to."""
+        tokens = self.word_pattern.findall(text.lower())
+        patterns = list(map(self._token_patterns, tokens))
+        for number, token in enumerate(tokens[1:], start=1):
+            if 'a' <= token[0] <= 'j' and '0' <= tokens[number - 1][0] <= '9':
+                patterns[number] = self.letter_sign + patterns[number]
+        return np.frombuffer(b''.join(patterns), dtype=np.uint8)
+
+
+grade2_encoder = ContractedBrailleEncoder(ascii_braille_map, grade2_contractions, ueb_symbol_map)
+braille_encoders = {1: braille_encoder, 2: grade2_encoder}
+
+
+def get_braille_encoder(grade):
+    """Returns the encoder for braille grade 1 (uncontracted) or 2 (contracted)."""
+    try:
+        return braille_encoders[int(grade)]
+    except (KeyError, TypeError, ValueError):
+        raise Exception(f"Unsupported braille grade: {grade}")
+
+
 class BrailleTranslator:
 
-    def __init__(self, img):
+    def __init__(self, img, grade=1):
         self.img_name = img.name
-        self.img_data = b''
-        self.img_path = self.file_loc_helper(img)
+        self.grade = int(grade)
+        self.encoder = get_braille_encoder(grade)
+        # Unique per upload, so two users sending photo.jpg at once cannot overwrite each other.
+        self.s3_key = f"{uuid.uuid4().hex}/{img.name}"
+        self.img_hash = None
+        self.img_file = self.file_loc_helper(img)
+        # The image sent to OCR: the upload itself until preprocessing replaces it.
+        self.ocr_file = self.img_file
+        # Held while the spools are read, as the S3 archive reads them from another thread.
+        self.file_lock = threading.Lock()
         self.conv_str = None
         self.output = None
+        self.ocr_backend = get_ocr_backend()
+        self.preprocess_stats = None
+        self.archive_future = None
+        self.timings = {}
 
     def file_loc_helper(self, image_data):
+        """Copies the upload chunk by chunk into a private spooled file, hashing it on the way.
+
+        The spool stays in memory up to IMAGE_SPOOL_MAX_MEMORY bytes and rolls over to an anonymous
+        temporary file after that, so a request never holds more than that much of the image.
+        """
         try:
-            img_path = f"{settings.MEDIA_ROOT}/{image_data.name}"
-            with open(img_path, 'wb+') as destination:
-                for chunk in image_data.chunks():
-                    destination.write(chunk)
-                    self.img_data += chunk
-            return img_path
+            spool = _new_spool()
+            digest = hashlib.sha256()
+            for chunk in image_data.chunks():
+                spool.write(chunk)
+                digest.update(chunk)
+            spool.seek(0)
+            self.img_hash = digest.hexdigest()
+            return spool
         except Exception as e:
             raise Exception(e)
 
-    def convert_img_to_str(self):
+    def img_reader(self):
+        """A file-like reader of the uploaded image's spool, for storage to save while the archive may be reading it."""
+        return _SpoolReader(self.img_file, self.file_lock)
+
+    @property
+    def img_data(self):
+        """The bytes of the image OCR will read, for the stages that need to decode its pixels."""
+        with self.file_lock:
+            self.ocr_file.seek(0)
+            data = self.ocr_file.read()
+            self.ocr_file.seek(0)
+        return data
+
+    def find_cached_translation(self):
+        """Looks up an earlier translation of the same image bytes."""
+        return get_cached_translation(self.img_hash)
+
+    def preprocess_img(self):
+        """Orients, deskews, grayscales and downscales the image ahead of upload and OCR."""
+        if not settings.IMAGE_PREPROCESSING_ENABLED or self.is_document:
+            return None
         try:
-            textract_complete = False
-            client = boto3.client(
-                'textract',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
+            # Decoding needs the whole encoded image; the smaller result goes back into a spool of its own.
+            processed, self.preprocess_stats = preprocess_image(
+                self.img_data,
+                max_dimension=settings.IMAGE_PREPROCESSING_MAX_DIMENSION,
+                mode=settings.IMAGE_PREPROCESSING_MODE,
+                max_skew=settings.IMAGE_PREPROCESSING_MAX_SKEW
             )
-            response = client.start_document_text_detection(
-                DocumentLocation={'S3Object': {'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Name': self.img_name}},
-                ClientRequestToken=str(random.randint(1, 1e10))
-            )
-            jobid = response['JobId']
-            while not textract_complete:
-                _curstat = client.get_document_text_detection(JobId=jobid)
-                if _curstat.get('JobStatus') == 'SUCCEEDED':
-                    textract_complete = True
-                elif _curstat.get('JobStatus') == 'FAILED' or _curstat.get('JobStatus') == 'PARTIAL_SUCCESS':
-                    raise Exception(_curstat.get("Warnings"))
-            response = client.get_document_text_detection(JobId=jobid)
-            found_words = [a.get("Text") for a in response.get("Blocks") if a.get("BlockType") == 'LINE' and a.get("Text")]
-            self.conv_str = " ".join(found_words)
+            if not self.preprocess_stats['skipped']:
+                self.ocr_file = _new_spool()
+                self.ocr_file.write(processed)
+                self.ocr_file.seek(0)
+        except Exception as e:
+            raise Exception(e)
+        logger.info(
+            "Preprocessed %s: %d -> %d bytes (%d saved) in %.1fms",
+            self.img_name, self.preprocess_stats['original_bytes'], self.preprocess_stats['processed_bytes'],
+            self.preprocess_stats['bytes_saved'], self.preprocess_stats['duration_ms']
+        )
+        return self.preprocess_stats
+
+    def convert_img_to_str(self, on_job_started=None):
+        try:
+            self.conv_str = self.ocr_backend.image_to_text(self, on_job_started=on_job_started)
             return self.conv_str
         except Exception as e:
             raise Exception(e)
 
     def convert_str_to_braille(self):
         try:
-            _lowered_str = self.conv_str.lower()
-            res_str = [ascii_braille_map[val] for val in _lowered_str if ascii_braille_map.get(val)]
-            self.output = ''.join(res_str)
+            self.output = self.encoder.to_unicode(self.conv_str)
             return self.output
-        except:
+        except Exception:
             raise Exception("Invalid characters detected in translated text.")
 
     def convert_to_binary(self):
         try:
-            _lowered_str = self.conv_str.lower()
-            res_str = [binary_braille_map[val] for val in _lowered_str if binary_braille_map.get(val)]
-            self.output = ''.join(res_str)
+            self.output = self.encoder.to_binary(self.conv_str)
             return self.output
         except Exception:
             raise Exception("Invalid characters detected in translated text.")
 
+    def convert_to_braille_formats(self):
+        """Converts the OCR text to unicode braille, binary and packed binary in the requested grade."""
+        try:
+            braille_format, self.output, braille_packed = self.encoder.encode_all(self.conv_str)
+            return braille_format, self.output, braille_packed
+        except Exception:
+            raise Exception("Invalid characters detected in translated text.")
+
     def upload_to_s3(self):
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-        )
+        s3 = get_client('s3')
         try:
-            with open(self.img_path, 'rb') as data:
-                s3.upload_fileobj(
-                    data,
-                    settings.AWS_STORAGE_BUCKET_NAME,
-                    self.img_name)
-            self._remove_tmp_file()
+            # upload_fileobj reads the spool in parts, switching to a multipart upload for large images.
+            spool = _SpoolReader(self.ocr_file, self.file_lock)
+            s3.upload_fileobj(spool, settings.AWS_STORAGE_BUCKET_NAME, self.s3_key)
         except Exception as e:
             raise Exception(e)
 
-    def _remove_tmp_file(self):
+    def prepare_ocr_source(self):
+        """Uploads the image to S3 if the OCR backend reads it from there.
+
+        When the backend can take the bytes directly, the S3 copy is only kept as an archive, so it
+        is uploaded in the background while OCR runs, streamed from the spool rather than copied.
+        """
+        if not self.ocr_backend.requires_upload:
+            return None
+        if self.ocr_backend.reads_bytes(self):
+            self.archive_future = archive_to_s3(_SpoolReader(self.ocr_file, self.file_lock), self.s3_key)
+        else:
+            self.upload_to_s3()
+        return self.archive_future
+
+    @property
+    def ocr_size(self):
+        """Size in bytes of the image OCR will read."""
+        with self.file_lock:
+            self.ocr_file.seek(0, os.SEEK_END)
+            size = self.ocr_file.tell()
+            self.ocr_file.seek(0)
+        return size
+
+    @property
+    def ocr_format(self):
+        """'jpeg', 'png', 'pdf' or 'tiff' from the image's signature, None for anything else."""
+        with self.file_lock:
+            self.ocr_file.seek(0)
+            head = self.ocr_file.read(8)
+            self.ocr_file.seek(0)
+        return detect_format(head)
+
+    @property
+    def is_document(self):
+        """Whether the upload is a PDF or TIFF, read page by page rather than as one image."""
+        return self.ocr_format in DOCUMENT_FORMATS
+
+    def convert_document_to_pages(self, on_job_started=None, on_page_count=None):
+        """Yields (page number, text) for each page of a PDF or TIFF as soon as it has been read."""
+        return self.ocr_backend.document_to_pages(self, on_job_started=on_job_started, on_page_count=on_page_count)
+
+    @contextmanager
+    def timed(self, stage):
+        """Records how long the enclosed block took, in milliseconds, under ``stage`` in self.timings."""
+        started = time.perf_counter()
         try:
-            os.remove(self.img_path)
-        except Exception as e:
-            raise Exception(e)
+            yield
+        finally:
+            self.timings[stage] = (time.perf_counter() - started) * 1000
+
+    def close(self):
+        """Releases the spooled copies of the image, once any archive of them still being uploaded is sent."""
+        def _close(_future=None):
+            self.img_file.close()
+            self.ocr_file.close()
+
+        if self.archive_future is not None:
+            self.archive_future.add_done_callback(_close)
+        else:
+            _close()
+
+
+class _SpoolReader:
+    """Reads a spool from a position of its own, for upload_fileobj.
+
+    Other reads of the spool can happen while it is uploaded, taking the same lock. close() leaves
+    the spool open, as s3transfer closes what upload_fileobj is given once it is sent.
+    """
+
+    def __init__(self, spool, lock):
+        self._spool = spool
+        self._lock = lock
+        self._position = 0
+
+    def read(self, size=-1):
+        with self._lock:
+            self._spool.seek(self._position)
+            data = self._spool.read(size)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_END:
+            with self._lock:
+                offset += self._spool.seek(0, os.SEEK_END)
+        elif whence == os.SEEK_CUR:
+            offset += self._position
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    @property
+    def closed(self):
+        return self._spool.closed
+
+    def close(self):
+        pass
+
+
+def archive_to_s3(fileobj, key):
+    """Uploads a copy of an image, read from ``fileobj``, to S3 on the archive thread pool, returning its future.
+
+    With S3_ARCHIVE_WORKERS set to 0 the upload happens before this returns. Failures are
+    logged rather than raised, as nothing waits on the archived copy.
+    """
+    pool = _get_archive_pool()
+    if pool is None:
+        _archive(fileobj, key)
+        return None
+    return pool.submit(_archive, fileobj, key)
+
+
+def _archive(fileobj, key):
+    try:
+        get_client('s3').upload_fileobj(fileobj, settings.AWS_STORAGE_BUCKET_NAME, key)
+    except Exception:
+        logger.exception("Archiving %s to S3 failed", key)
+
+
+def _get_archive_pool():
+    global _archive_pool
+    if not settings.S3_ARCHIVE_WORKERS:
+        return None
+    with _archive_pool_lock:
+        if _archive_pool is None:
+            _archive_pool = ThreadPoolExecutor(max_workers=settings.S3_ARCHIVE_WORKERS, thread_name_prefix='s3-archive')
+        return _archive_pool
 
 
+def _new_spool():
+    return tempfile.SpooledTemporaryFile(max_size=settings.IMAGE_SPOOL_MAX_MEMORY, dir=settings.FILE_UPLOAD_TEMP_DIR)
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+import functools
+import random
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _pin_cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def _pin_key(user_id):
+    return f"primary-pin:{user_id}"
+
+
+def _pin(user_id):
+    _pin_cache().set(_pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def pin_user_to_primary(user_id):
+    """Keeps the user's reads on the primary for REPLICA_PIN_SECONDS, while the replicas catch up with their write.
+
+    Inside a transaction the pin is renewed once it commits, as the replicas only start copying the write then.
+    """
+    if user_id is None or not settings.DATABASE_REPLICAS:
+        return
+    _pin(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _pin(user_id))
+
+
+def pin_saved_user(sender, **kwargs):
+    """Pins a User to the primary when they are saved or deleted, e.g. just registered."""
+    pin_user_to_primary(kwargs["instance"].pk)
+
+
+def pin_note_owner(sender, **kwargs):
+    """Pins the owner of a Note to the primary when it is saved or deleted."""
+    pin_user_to_primary(kwargs["instance"].user_id)
+
+
+def is_pinned_to_primary(user_id):
+    return _pin_cache().get(_pin_key(user_id)) is not None
+
+
+@contextmanager
+def replica_reads(user_id):
+    """Sends the reads made inside to a replica, unless the user wrote recently or there are no replicas."""
+    if not settings.DATABASE_REPLICAS or user_id is None or is_pinned_to_primary(user_id):
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """Runs a read-only view's queries on a replica, unless the requesting user wrote recently."""
+    @functools.wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        with replica_reads(request.user.id):
+            return view(request, *args, **kwargs)
+    return wrapped_view
+
+
+class ReplicaRouter:
+    """Sends reads made inside replica_reads() to a random replica in DATABASE_REPLICAS, and everything else,
+    including every write, to the primary (``default``).
+
+    Replicas get their schema by replication, so migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects read from any of them may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,35 @@
+import io
+from PIL import Image, ImageSequence
+
+
+PDF = 'pdf'
+TIFF = 'tiff'
+JPEG = 'jpeg'
+PNG = 'png'
+
+# Formats holding any number of pages, which become Notes with a NotePage each
+DOCUMENT_FORMATS = (PDF, TIFF)
+
+
+def detect_format(head):
+    """Names the format of a file from its first bytes: 'jpeg', 'png', 'pdf', 'tiff' or None."""
+    if head.startswith(b'\xff\xd8\xff'):
+        return JPEG
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return PNG
+    if head.startswith(b'%PDF-'):
+        return PDF
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return TIFF
+    return None
+
+
+def split_tiff_pages(data):
+    """Returns every page of a TIFF as its own grayscale PNG."""
+    pages = []
+    with Image.open(io.BytesIO(data)) as tiff:
+        for frame in ImageSequence.Iterator(tiff):
+            buffer = io.BytesIO()
+            frame.convert('L').save(buffer, format='PNG')
+            pages.append(buffer.getvalue())
+    return pages
@@ -0,0 +1,87 @@
+import time
+import cv2
+import numpy as np
+
+
+GRAYSCALE = 'grayscale'
+BINARIZE = 'binarize'
+
+
+def preprocess_image(img_data, max_dimension=2200, mode=GRAYSCALE, max_skew=10.0, jpeg_quality=85):
+    """Shrinks a photo down to what OCR needs.
+
+    The image is auto-oriented from its EXIF data, downscaled so its longest side fits in
+    ``max_dimension``, deskewed by up to ``max_skew`` degrees and converted to grayscale
+    (re-encoded as JPEG) or binarized (re-encoded as PNG). Images OpenCV cannot decode, and
+    images the re-encoding would not make smaller, are passed through untouched. Returns the
+    new bytes and a dict of stats about the run.
+    """
+    started = time.perf_counter()
+    stats = {
+        'original_bytes': len(img_data),
+        'processed_bytes': len(img_data),
+        'bytes_saved': 0,
+        'duration_ms': 0.0,
+        'scale': 1.0,
+        'skew_angle': 0.0,
+        'skipped': True,
+    }
+    # Decoding without IMREAD_IGNORE_ORIENTATION applies the EXIF orientation tag.
+    img = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        stats['duration_ms'] = (time.perf_counter() - started) * 1000
+        return img_data, stats
+
+    height, width = img.shape[:2]
+    scale = min(1.0, max_dimension / max(height, width))
+    if scale < 1.0:
+        img = cv2.resize(img, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+    angle = estimate_skew(img)
+    if 0.5 <= abs(angle) <= max_skew:
+        img = rotate_image(img, angle)
+    else:
+        angle = 0.0
+
+    if mode == BINARIZE:
+        _, img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        ok, encoded = cv2.imencode('.png', img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    else:
+        ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not ok:
+        stats['duration_ms'] = (time.perf_counter() - started) * 1000
+        return img_data, stats
+
+    processed = encoded.tobytes()
+    stats.update({'duration_ms': (time.perf_counter() - started) * 1000, 'scale': scale, 'skew_angle': angle})
+    if len(processed) >= len(img_data):
+        # Already small (e.g. a well compressed scan): re-encoding would only make the upload bigger.
+        return img_data, stats
+    stats.update({
+        'processed_bytes': len(processed),
+        'bytes_saved': len(img_data) - len(processed),
+        'skipped': False,
+    })
+    return processed, stats
+
+
+def estimate_skew(gray):
+    """Estimates the rotation, in degrees, that levels the text in a grayscale image."""
+    _, text_mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(text_mask)
+    if coords is None or len(coords) < 100:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    # OpenCV has reported the rectangle's angle in both (-90, 0] and [0, 90), so fold it into (-45, 45].
+    if angle > 45:
+        angle -= 90
+    elif angle <= -45:
+        angle += 90
+    return angle
+
+
+def rotate_image(gray, angle):
+    """Rotates an image about its center, filling the corners with the edge colour."""
+    height, width = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+import brotli
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compresses responses of at least RESPONSE_COMPRESSION_MIN_BYTES with brotli, or gzip for clients without it.
+
+    Streamed responses are sent as they are, so devices get each frame of a braille stream as soon as it is written.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if not re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(response.content, quality=settings.RESPONSE_BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+        # The body changed, so a strong ETag becomes weak; If-None-Match still matches it.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
@@ -1,34 +1,146 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from random import randint
+import re
+import uuid
+from .db_routers import pin_note_owner, pin_saved_user
+from .notes_cache import forget_cached_notes
+from .user_cache import forget_cached_user
 
 
 class Note(models.Model):
     """Model to create a notes object."""
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    # Goes up by one with every change to the Note or its content; the note endpoints' ETags are built from it.
+    version = models.PositiveIntegerField(default=1)
     title = models.CharField(max_length=100)
     img = models.ImageField(default='')
     img_name = models.CharField(max_length=100, default='')
+    # 1 for uncontracted (letter by letter) braille, 2 for contracted English braille.
+    braille_grade = models.PositiveSmallIntegerField(default=1)
+    # PDF and TIFF uploads fill in their NotePages one by one; the Note is complete once all are read.
+    page_count = models.PositiveIntegerField(default=1)
+    complete = models.BooleanField(default=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+
+    class Meta:
+        app_label = 'vibraille'
+        ordering = ['created']
+        indexes = [
+            # Serves each page of a user's notes list as a range scan in created order.
+            models.Index(fields=['user', 'created'], name='note_user_created_idx'),
+        ]
+
+    def save_changes(self, *fields):
+        """Saves the given fields of an existing Note as its next version."""
+        self.version = models.F('version') + 1
+        self.save(update_fields=[*fields, 'version', 'updated'])
+        self.refresh_from_db(fields=['version'])
+
+
+class NoteContent(models.Model):
+    """Model holding a Note's text and braille.
+
+    Kept out of the notes table so scanning and listing notes only reads their small columns;
+    it is loaded when ``note.content`` is first used, or up front with ``select_related('content')``.
+    """
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    ascii_text = models.TextField(default='')
+    braille_format = models.TextField(default='')
+    braille_binary = models.TextField(default='')
+    # Same cells as braille_binary, one byte each: dot 1 is bit 5 down to dot 6 in bit 0.
+    braille_packed = models.BinaryField(default=b'')
+
+    class Meta:
+        app_label = 'vibraille'
+
+
+class NotePage(models.Model):
+    """Model holding the braille of one page of a multi-page Note."""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='pages')
+    number = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
     ascii_text = models.TextField(default='')
     braille_format = models.TextField(default='')
     braille_binary = models.TextField(default='')
+    braille_packed = models.BinaryField(default=b'')
+
+    class Meta:
+        app_label = 'vibraille'
+        ordering = ['number']
+        constraints = [models.UniqueConstraint(fields=['note', 'number'], name='unique_note_page_number')]
+
+
+class TranslationJob(models.Model):
+    """Model to track the progress of an asynchronous image to braille translation."""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    stage = models.CharField(max_length=20, default='queued')
+    img_name = models.CharField(max_length=100, default='')
+    textract_job_id = models.CharField(max_length=64, default='')
+    error = models.TextField(default='')
+    note = models.ForeignKey(Note, on_delete=models.SET_NULL, null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    # Work queue bookkeeping for jobs run by `manage.py run_translation_workers`
+    grade = models.PositiveSmallIntegerField(default=1)
+    payload = models.BinaryField(default=b'')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, default='')
+    locked_at = models.DateTimeField(null=True)
 
     class Meta:
         app_label = 'vibraille'
         ordering = ['created']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
+def normalize_phone_number(phone_number):
+    """Reduces a phone number as entered to its digits, keeping a leading +: '+1(123)456-7890' is '+11234567890'.
+
+    Numbers without any digits normalize to None, so accounts without a phone number never clash.
+    """
+    digits = re.sub(r'[^0-9]', '', phone_number or '')
+    if not digits:
+        return None
+    return ('+' if phone_number.strip().startswith('+') else '') + digits
 
 
 class VibrailleUser(models.Model):
     """Override model to include phone field."""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone_number = models.CharField(max_length=17, default='')
+    # phone_number as normalize_phone_number gives it, which logins and verification look up by.
+    # Kept in step by save(), so bulk_create() and update() callers must fill it in themselves.
+    phone_normalized = models.CharField(max_length=17, unique=True, null=True, editable=False)
     verified_phone = models.BooleanField(default=False)
     verified_email = models.BooleanField(default=False)
     veri_str_phone = models.CharField(max_length=5, default='')
     veri_str_email = models.CharField(max_length=5, default='')
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone_number(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        super().save(*args, **kwargs)
+
 
 def create_profile(sender, **kwargs):
     user = kwargs["instance"]
@@ -38,3 +150,11 @@ def create_profile(sender, **kwargs):
 
 
 post_save.connect(create_profile, sender=User)
+post_save.connect(forget_cached_user, sender=User)
+post_delete.connect(forget_cached_user, sender=User)
+post_save.connect(forget_cached_notes, sender=Note)
+post_delete.connect(forget_cached_notes, sender=Note)
+post_save.connect(pin_saved_user, sender=User)
+post_delete.connect(pin_saved_user, sender=User)
+post_save.connect(pin_note_owner, sender=Note)
+post_delete.connect(pin_note_owner, sender=Note)
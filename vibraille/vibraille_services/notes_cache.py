@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+import uuid
+
+
+def _notes_cache():
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f"notes:{user_id}:generation"
+
+
+def _stats_key(name):
+    return f"notes:stats:{name}"
+
+
+def _generation(cache, user_id):
+    """The token a user's cached notes are keyed under; replacing it drops all of them at once.
+
+    A fresh random token is used each time, so one that was evicted can never bring old entries back.
+    """
+    generation = cache.get(_generation_key(user_id))
+    if generation is None:
+        cache.add(_generation_key(user_id), uuid.uuid4().hex, timeout=None)
+        generation = cache.get(_generation_key(user_id))
+    return generation
+
+
+def _count(name):
+    cache = _notes_cache()
+    try:
+        cache.incr(_stats_key(name))
+    except ValueError:
+        if not cache.add(_stats_key(name), 1, timeout=None):
+            cache.incr(_stats_key(name))
+
+
+def cached_notes_key(user_id, kind, name):
+    """Key of a cached list or detail of a user's notes.
+
+    Take the key before reading the notes: if they change meanwhile, what was read is stored under the
+    old generation, where it is never found.
+    """
+    return f"notes:{user_id}:{_generation(_notes_cache(), user_id)}:{kind}:{name}"
+
+
+def get_cached_notes(key):
+    """Returns the entry cached under ``key``, or None, counting a hit or a miss."""
+    entry = _notes_cache().get(key)
+    _count('hits' if entry is not None else 'misses')
+    return entry
+
+
+def cache_notes(key, entry):
+    _notes_cache().set(key, entry)
+
+
+def _new_generation(user_id):
+    _notes_cache().set(_generation_key(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_user_notes(user_id):
+    """Drops everything cached of a user's notes.
+
+    Inside a transaction this happens again once it commits, since reads made before then still see the
+    old rows and may have cached them.
+    """
+    if user_id is None:
+        return
+    _new_generation(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _new_generation(user_id))
+
+
+def forget_cached_notes(sender, **kwargs):
+    """Drops a user's cached notes when one of their Notes is saved or deleted."""
+    invalidate_user_notes(kwargs["instance"].user_id)
+
+
+def notes_cache_stats():
+    """Returns how many reads of the notes cache hit and missed, across every process sharing it."""
+    counts = _notes_cache().get_many([_stats_key('hits'), _stats_key('misses')])
+    return {
+        'hits': counts.get(_stats_key('hits'), 0),
+        'misses': counts.get(_stats_key('misses'), 0),
+    }
@@ -0,0 +1,208 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.utils.module_loading import import_string
+import random
+import threading
+import time
+import cv2
+import numpy as np
+import pytesseract
+from .aws_clients import get_client
+from .documents import TIFF, split_tiff_pages
+from .image_preprocessing import preprocess_image
+
+
+# Image formats the synchronous Textract API accepts as raw bytes
+TEXTRACT_SYNC_FORMATS = ('jpeg', 'png')
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+class OCRBackend:
+    """Base class for the engines that read text out of an uploaded image."""
+
+    # Whether the engine reads the image from S3, so it has to be uploaded first.
+    requires_upload = False
+
+    def reads_bytes(self, b_process):
+        """Whether an engine that reads from S3 can take this image's bytes directly instead."""
+        return False
+
+    def image_to_text(self, b_process, on_job_started=None):
+        """Returns the text found in the BrailleTranslator's image, one space between lines."""
+        raise NotImplementedError
+
+    def page_to_text(self, page_data):
+        """Returns the text found in a single page image."""
+        raise NotImplementedError
+
+    def document_to_pages(self, b_process, on_job_started=None, on_page_count=None):
+        """Yields (page number, text) for each page of a PDF or TIFF upload as each one is read.
+
+        By default the pages of a TIFF are split apart and read at the same time on a pool of
+        DOCUMENT_PAGE_WORKERS threads, so pages come back in the order they finish.
+        """
+        if b_process.ocr_format != TIFF:
+            raise Exception(f"{type(self).__name__} cannot read {b_process.ocr_format} documents.")
+        pages = split_tiff_pages(b_process.img_data)
+        if on_page_count:
+            on_page_count(len(pages))
+        with ThreadPoolExecutor(max_workers=settings.DOCUMENT_PAGE_WORKERS, thread_name_prefix='ocr-page') as pool:
+            futures = {pool.submit(self._read_page, page): number for number, page in enumerate(pages, start=1)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _read_page(self, page_data):
+        if settings.IMAGE_PREPROCESSING_ENABLED:
+            page_data, _stats = preprocess_image(
+                page_data,
+                max_dimension=settings.IMAGE_PREPROCESSING_MAX_DIMENSION,
+                mode=settings.IMAGE_PREPROCESSING_MODE,
+                max_skew=settings.IMAGE_PREPROCESSING_MAX_SKEW
+            )
+        return self.page_to_text(page_data)
+
+
+class TextractBackend(OCRBackend):
+    """Reads text with AWS Textract.
+
+    JPEG and PNG images within the synchronous API's size limit are sent to detect_document_text
+    directly, as are the pages of a TIFF once split apart. Anything else, PDFs included, is
+    uploaded to S3 and read by an asynchronous text detection job.
+    """
+
+    requires_upload = True
+
+    def reads_bytes(self, b_process):
+        if not settings.TEXTRACT_SYNC_ENABLED:
+            return False
+        if b_process.ocr_format == TIFF:
+            return True
+        return b_process.ocr_format in TEXTRACT_SYNC_FORMATS and b_process.ocr_size <= settings.TEXTRACT_SYNC_MAX_BYTES
+
+    def image_to_text(self, b_process, on_job_started=None):
+        if self.reads_bytes(b_process):
+            return self.page_to_text(b_process.img_data)
+        pages = self._detect_with_job(b_process, on_job_started=on_job_started)
+        return " ".join(text for _number, text in pages if text)
+
+    def page_to_text(self, page_data):
+        response = get_client('textract').detect_document_text(Document={'Bytes': page_data})
+        return _join_lines(response.get("Blocks"))
+
+    def document_to_pages(self, b_process, on_job_started=None, on_page_count=None):
+        if self.reads_bytes(b_process):
+            return super().document_to_pages(b_process, on_job_started=on_job_started, on_page_count=on_page_count)
+        return self._detect_with_job(b_process, on_job_started=on_job_started, on_page_count=on_page_count)
+
+    def _detect_with_job(self, b_process, on_job_started=None, on_page_count=None):
+        client = get_client('textract')
+        response = client.start_document_text_detection(
+            DocumentLocation={'S3Object': {'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Name': b_process.s3_key}},
+            ClientRequestToken=str(random.randint(1, 1e10))
+        )
+        jobid = response['JobId']
+        if on_job_started:
+            on_job_started(jobid)
+        first_response = wait_for_text_detection(client, jobid)
+        if on_page_count:
+            on_page_count(first_response.get('DocumentMetadata', {}).get('Pages', 1))
+        return iter_text_detection_pages(client, jobid, first_response)
+
+
+class TesseractBackend(OCRBackend):
+    """Reads text locally with Tesseract, on a process pool sized to the machine's cores.
+
+    PDFs are not supported, as their pages would first need rendering to images.
+    """
+
+    def image_to_text(self, b_process, on_job_started=None):
+        return self.page_to_text(b_process.img_data)
+
+    def page_to_text(self, page_data):
+        args = (page_data, settings.TESSERACT_LANG, settings.TESSERACT_CONFIG)
+        pool = _get_process_pool()
+        if pool is None:
+            return read_text_with_tesseract(*args)
+        return pool.submit(read_text_with_tesseract, *args).result()
+
+
+def read_text_with_tesseract(img_data, lang, config):
+    """Decodes the image with OpenCV and runs Tesseract over it."""
+    img = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise Exception("Image could not be decoded.")
+    try:
+        found_text = pytesseract.image_to_string(img, lang=lang, config=config)
+    except Exception as e:
+        # pytesseract's own errors do not survive the trip back from a pool process.
+        raise Exception(str(e))
+    return " ".join(line.strip() for line in found_text.splitlines() if line.strip())
+
+
+def _join_lines(blocks):
+    found_words = [a.get("Text") for a in blocks if a.get("BlockType") == 'LINE' and a.get("Text")]
+    return " ".join(found_words)
+
+
+def iter_text_detection_pages(client, jobid, response):
+    """Yields (page number, text) for each page of a finished Textract job, fetching results as it goes.
+
+    ``response`` is the job's first page of results. Blocks arrive in page order, so a page is
+    complete, and yielded, as soon as a block from a later page shows up; later result pages are
+    only requested (by NextToken) once the earlier ones have been used.
+    """
+    page_total = response.get('DocumentMetadata', {}).get('Pages', 1)
+    page, lines = 1, []
+    while True:
+        for block in response.get('Blocks', []):
+            block_page = block.get('Page', 1)
+            while block_page > page:
+                yield page, " ".join(lines)
+                page, lines = page + 1, []
+            if block.get('BlockType') == 'LINE' and block.get('Text'):
+                lines.append(block['Text'])
+        next_token = response.get('NextToken')
+        if not next_token:
+            break
+        response = client.get_document_text_detection(JobId=jobid, NextToken=next_token)
+    yield page, " ".join(lines)
+    for empty_page in range(page + 1, page_total + 1):
+        yield empty_page, ""
+
+
+def wait_for_text_detection(client, jobid):
+    """Polls a Textract job with exponential backoff until it finishes or the deadline passes.
+
+    Returns the response to the last poll, which holds the first page of the job's results.
+    """
+    delay = settings.TEXTRACT_POLL_INITIAL_DELAY
+    deadline = time.monotonic() + settings.TEXTRACT_POLL_TIMEOUT
+    while True:
+        _curstat = client.get_document_text_detection(JobId=jobid)
+        if _curstat.get('JobStatus') == 'SUCCEEDED':
+            return _curstat
+        elif _curstat.get('JobStatus') == 'FAILED' or _curstat.get('JobStatus') == 'PARTIAL_SUCCESS':
+            raise Exception(_curstat.get("Warnings"))
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise Exception(f"Text detection job {jobid} did not finish within {settings.TEXTRACT_POLL_TIMEOUT}s.")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, settings.TEXTRACT_POLL_MAX_DELAY)
+
+
+def _get_process_pool():
+    """Lazily starts the OCR process pool; a pool size of 0 runs OCR in the calling process."""
+    global _process_pool
+    if not settings.OCR_PROCESS_POOL_SIZE:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=settings.OCR_PROCESS_POOL_SIZE)
+        return _process_pool
+
+
+def get_ocr_backend():
+    """Returns an instance of the OCR backend configured in settings.OCR_BACKEND."""
+    return import_string(settings.OCR_BACKEND)()
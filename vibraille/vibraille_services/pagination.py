@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NoteCursorPagination(CursorPagination):
+    """Pages through a user's notes oldest first.
+
+    Cursors point at a position in ``created`` order rather than a page number, so a page is found with an
+    indexed range scan however deep it is, and notes added between requests never shift later pages.
+    """
+    ordering = 'created'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
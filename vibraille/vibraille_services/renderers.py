@@ -0,0 +1,71 @@
+import cbor2
+import json
+import msgpack
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class OctetStreamRenderer(renderers.BaseRenderer):
+    """Renders raw bytes as application/octet-stream, and any error details as JSON bytes."""
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return bytes(data)
+        return json.dumps(data).encode('utf-8')
+
+
+class NDJSONRenderer(OctetStreamRenderer):
+    """Lets views stream newline delimited JSON; error details are rendered as a single JSON line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+    render_style = 'text'
+
+
+class EventStreamRenderer(OctetStreamRenderer):
+    """Lets views stream server-sent events; error details are rendered as a single JSON line."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+    render_style = 'text'
+
+
+def _json_compatible(value):
+    """Converts what JSON responses render as strings or numbers (lazy text, decimals, UUIDs...) the same way."""
+    return JSONEncoder().default(value)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renders data as MessagePack, a smaller binary equivalent of JSON. Datetimes are sent as JSON sends them."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_json_compatible)
+
+
+class CBORRenderer(renderers.BaseRenderer):
+    """Renders data as CBOR (RFC 8949), a smaller binary equivalent of JSON. Datetimes use CBOR's own date tags."""
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return cbor2.dumps(data, default=lambda encoder, value: encoder.encode(_json_compatible(value)))
+
+
+# Renderers that send notes as structured data, rather than the JSON text of the notes endpoints' JSON responses
+STRUCTURED_RENDERERS = (MessagePackRenderer, CBORRenderer)
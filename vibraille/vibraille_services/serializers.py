@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Note, VibrailleUser
+from django.core.files import File
+from .models import Note, NotePage, VibrailleUser, TranslationJob, normalize_phone_number
 from .braille_utils import BrailleTranslator
+from .documents import PDF, detect_format
+from .translation_jobs import translate_image_to_note, translate_images_to_notes, submit_translation_job
 from rest_framework import serializers, status
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
@@ -22,6 +26,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'password', 'email', 'phone_number')
 
+    def validate_phone_number(self, value):
+        """Rejects phone numbers another account already uses, however they were written."""
+        normalized = normalize_phone_number(value)
+        if normalized and VibrailleUser.objects.filter(phone_normalized=normalized).exists():
+            raise serializers.ValidationError("A user with that phone number already exists.")
+        return value
+
     def to_representation(self, instance):
         """Override to include verification strings."""
         representation = super(RegisterSerializer, self).to_representation(instance['user'])
@@ -68,16 +79,7 @@ class VBTokenObtainPairSerializer(TokenObtainPairSerializer):
             'username': '',
             'password': attrs.get("password")
         }
-        user_obj = None
-        if attrs.get("phone_number"):
-            _target_users = [
-                users for users in User.objects.all() if users.vibrailleuser.phone_number == attrs.get("phone_number")
-            ]
-            if _target_users:
-                user_obj = _target_users[0]
-        else:
-            user_obj = User.objects.filter(email=attrs.get("email")).first() or \
-                       User.objects.filter(username=attrs.get("username")).first()
+        user_obj = self.find_user(attrs)
         if user_obj:
             if attrs.get("email") and not user_obj.vibrailleuser.verified_email:
                 raise AuthenticationFailed(detail="Email is not verified yet!", code=401)
@@ -87,15 +89,25 @@ class VBTokenObtainPairSerializer(TokenObtainPairSerializer):
         refresh = self.get_token(self.user)
         data['refresh'] = str(refresh)
         data['access'] = str(refresh.access_token)
-        _vb = VibrailleUser.objects.get(user=user_obj)
         data['user'] = {
             "id": user_obj.id,
             "email": user_obj.email,
-            "phone_number": _vb.phone_number,
+            "phone_number": user_obj.vibrailleuser.phone_number,
             "username": user_obj.username
         }
         return data
 
+    @staticmethod
+    def find_user(attrs):
+        """Finds the User logging in by phone number, email or username, with their VibrailleUser, in one indexed query."""
+        users = User.objects.select_related('vibrailleuser')
+        if attrs.get("phone_number"):
+            normalized = normalize_phone_number(attrs.get("phone_number"))
+            return users.filter(vibrailleuser__phone_normalized=normalized).first() if normalized else None
+        if attrs.get("email"):
+            return users.filter(email=attrs.get("email")).first()
+        return users.filter(username=attrs.get("username")).first()
+
     @classmethod
     def get_token(cls, user):
         """Retrieves token."""
@@ -104,33 +116,135 @@ class VBTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
 
 
+class ImageOrPDFField(serializers.ImageField):
+    """Image field that also accepts PDF documents, which Pillow cannot open."""
+
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        head = file_object.read(8)
+        file_object.seek(0)
+        if detect_format(head) == PDF:
+            return file_object
+        return super().to_internal_value(data)
+
+
 class TranslationSerializer(serializers.ModelSerializer):
     """Serializer for handling image to braille translation."""
     title = serializers.CharField(max_length=100, required=False, allow_blank=True)
-    img = serializers.ImageField(required=False)
+    img = ImageOrPDFField(required=False)
     img_name = serializers.CharField(max_length=100, required=False, allow_blank=True)
-    ascii_text = serializers.CharField(required=False, allow_blank=True)
-    braille_format = serializers.CharField(required=False, allow_blank=True)
+    ascii_text = serializers.CharField(source='content.ascii_text', read_only=True)
+    braille_format = serializers.CharField(source='content.braille_format', read_only=True)
+    braille_binary = serializers.CharField(source='content.braille_binary', read_only=True)
+    grade = serializers.ChoiceField(choices=(1, 2), source='braille_grade', required=False)
 
     class Meta:
         model = Note
-        fields = ['id', 'user', 'created', 'title', 'img', 'img_name', 'ascii_text', 'braille_format', 'braille_binary']
+        fields = [
+            'id', 'user', 'created', 'updated', 'version', 'title', 'img', 'img_name', 'ascii_text', 'braille_format',
+            'braille_binary', 'grade', 'page_count', 'complete'
+        ]
+        read_only_fields = ['updated', 'version', 'page_count', 'complete']
 
     def create(self, data):
         """Creates a new Note object to contain braille translation."""
         user_acct = self.context['request'].user
-        new_note = Note()
         try:
-            b_process = BrailleTranslator(data.get("img"))
-            new_note.title = data.get("img").name
-            new_note.img = data.get("img")
-            b_process.upload_to_s3()
-            new_note.img_name = data.get("img").name
-            new_note.ascii_text = b_process.convert_img_to_str()
-            new_note.braille_format = b_process.convert_str_to_braille()
-            new_note.braille_binary = b_process.convert_to_binary()
-            new_note.user = user_acct
-            new_note.save()
-            return new_note
+            b_process = BrailleTranslator(data.get("img"), grade=data.get("braille_grade", 1))
+            # Kept for the view to report how long each stage took.
+            self.stage_timings = b_process.timings
+            return translate_image_to_note(b_process, data.get("img"), user_acct)
         except Exception as e:
             return Response(data=e, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def enqueue(self):
+        """Queues the translation to run in the background and returns its TranslationJob."""
+        img = self.validated_data.get("img")
+        if not img:
+            raise serializers.ValidationError({"img": "An image is required."})
+        b_process = BrailleTranslator(img, grade=self.validated_data.get("braille_grade", 1))
+        job = TranslationJob.objects.create(user=self.context['request'].user, img_name=img.name)
+        # The upload is closed once the request finishes, so the job saves the Note's image from its own spooled copy,
+        # read under the same lock as the S3 archive that may be streaming it at the same time.
+        submit_translation_job(job, b_process, File(b_process.img_reader(), name=img.name))
+        return job
+
+
+class NoteListSerializer(serializers.ModelSerializer):
+    """Serializer for listing notes, limited to the fields asked for with ``?fields=``."""
+    ascii_text = serializers.CharField(source='content.ascii_text')
+    braille_format = serializers.CharField(source='content.braille_format')
+    braille_binary = serializers.CharField(source='content.braille_binary')
+    grade = serializers.IntegerField(source='braille_grade')
+    DEFAULT_FIELDS = ('id', 'title', 'created')
+
+    class Meta:
+        model = Note
+        fields = [
+            'id', 'created', 'updated', 'version', 'title', 'img', 'img_name', 'ascii_text', 'braille_format',
+            'braille_binary', 'grade', 'page_count', 'complete'
+        ]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, fields_param):
+        """Parses a comma separated ``?fields=`` value, falling back to DEFAULT_FIELDS."""
+        if not fields_param:
+            return cls.DEFAULT_FIELDS
+        fields = tuple(dict.fromkeys(name.strip() for name in fields_param.split(',') if name.strip()))
+        unknown = set(fields) - set(cls.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError({"fields": f"Unknown fields: {', '.join(sorted(unknown))}."})
+        return fields or cls.DEFAULT_FIELDS
+
+    @property
+    def columns(self):
+        """The columns the selected fields are read from, as ``only()`` lookups from Note."""
+        return [field.source.replace('.', '__') for field in self.fields.values()]
+
+
+class NotePageSerializer(serializers.ModelSerializer):
+    """Serializer for the braille of one page of a multi-page Note."""
+
+    class Meta:
+        model = NotePage
+        fields = ['number', 'ascii_text', 'braille_format', 'braille_binary']
+
+
+class BatchTranslationSerializer(serializers.Serializer):
+    """Serializer for translating many images, e.g. the pages of a chapter, in one request."""
+    img = serializers.ListField(child=serializers.FileField(), allow_empty=False)
+    grade = serializers.ChoiceField(choices=(1, 2), required=False, default=1)
+
+    def validate_img(self, value):
+        if len(value) > settings.TRANSLATION_BATCH_MAX_IMAGES:
+            raise serializers.ValidationError(f"At most {settings.TRANSLATION_BATCH_MAX_IMAGES} images per batch.")
+        return value
+
+    def create(self, data):
+        """Translates every image, returning a result per image in upload order."""
+        results = translate_images_to_notes(data['img'], self.context['request'].user, grade=data['grade'])
+        return [
+            {
+                'index': index,
+                'img_name': img.name,
+                'status': 'created' if note else 'failed',
+                'note': TranslationSerializer(note, context=self.context).data if note else None,
+                'error': error
+            }
+            for index, (img, (note, error)) in enumerate(zip(data['img'], results))
+        ]
+
+
+class TranslationJobSerializer(serializers.ModelSerializer):
+    """Serializer for reporting the progress of a translation job."""
+    note = TranslationSerializer(read_only=True)
+
+    class Meta:
+        model = TranslationJob
+        fields = ['id', 'status', 'stage', 'img_name', 'error', 'attempts', 'created', 'updated', 'note']
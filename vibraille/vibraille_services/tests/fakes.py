@@ -0,0 +1,86 @@
+"""Local stand-ins for the AWS clients used by the translation pipeline."""
+import uuid
+from vibraille.vibraille_services.aws_clients import override_clients
+
+# Text that Textract reads from image_test.jpg
+IMAGE_TEST_TEXT = 'V 11 March 3s gd law how about people bei cartoonized? see page 31'
+
+
+class FakeTextract:
+    """Fake Textract client whose jobs finish after a fixed number of status polls.
+
+    Job results hold ``pages`` (a list of lines per page, default one page of ``lines``) and are
+    handed out ``max_results`` blocks at a time, with a NextToken while there are more.
+    """
+
+    def __init__(self, lines=(IMAGE_TEST_TEXT,), polls_until_done=2, final_status='SUCCEEDED', pages=None,
+                 max_results=1000):
+        self.lines = list(lines)
+        self.pages = [list(page) for page in pages] if pages is not None else [self.lines]
+        self.polls_until_done = polls_until_done
+        self.final_status = final_status
+        self.max_results = max_results
+        self.jobs = {}
+        self.calls = []
+
+    def start_document_text_detection(self, DocumentLocation, ClientRequestToken=None, **kwargs):
+        self.calls.append('start_document_text_detection')
+        jobid = uuid.uuid4().hex
+        self.jobs[jobid] = {'polls': 0, 'location': DocumentLocation}
+        return {'JobId': jobid}
+
+    def detect_document_text(self, Document, **kwargs):
+        self.calls.append('detect_document_text')
+        blocks = [{'BlockType': 'PAGE'}] + [{'BlockType': 'LINE', 'Text': line} for line in self.lines]
+        return {'Blocks': blocks}
+
+    def get_document_text_detection(self, JobId, MaxResults=None, NextToken=None):
+        self.calls.append('get_document_text_detection')
+        job = self.jobs[JobId]
+        job['polls'] += 1
+        if job['polls'] < self.polls_until_done:
+            return {'JobStatus': 'IN_PROGRESS'}
+        blocks = []
+        for number, lines in enumerate(self.pages, start=1):
+            blocks.append({'BlockType': 'PAGE', 'Page': number})
+            blocks += [{'BlockType': 'LINE', 'Text': line, 'Page': number} for line in lines]
+        start = int(NextToken or 0)
+        end = start + min(MaxResults or self.max_results, self.max_results)
+        response = {
+            'JobStatus': self.final_status,
+            'DocumentMetadata': {'Pages': len(self.pages)},
+            'Blocks': blocks[start:end],
+            'Warnings': []
+        }
+        if end < len(blocks):
+            response['NextToken'] = str(end)
+        return response
+
+
+class FakeS3:
+    """Fake S3 client keeping uploaded objects in memory.
+
+    Like the real client, upload_fileobj closes the file it is given once it has been sent.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.objects[(Bucket, Key)] = Fileobj.read()
+        Fileobj.close()
+
+
+class FakeAWS:
+    """Drop-in replacement for ``boto3.client`` handing out the fake clients."""
+
+    def __init__(self, textract=None, s3=None):
+        self.textract = textract or FakeTextract()
+        self.s3 = s3 or FakeS3()
+
+    def client(self, service_name, *args, **kwargs):
+        return {'textract': self.textract, 's3': self.s3}[service_name]
+
+    def install(self):
+        """Context manager handing the fake clients out in place of the shared AWS clients."""
+        return override_clients(textract=self.textract, s3=self.s3)
@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+import asyncio
+import json
+import threading
+import time
+
+from vibraille import urls
+from vibraille.vibraille_services.asgi_handler import ASGIHandler
+from vibraille.vibraille_services.async_views import async_urlpatterns, translation_threads
+from vibraille.vibraille_services.models import Note, NoteContent
+from vibraille.vibraille_services.tests.fakes import FakeAWS, FakeTextract
+
+# The project's URLs as served with ASYNC_VIEWS on
+urlpatterns = async_urlpatterns(urls.urlpatterns)
+
+
+class BarrierTextract(FakeTextract):
+    """Fake Textract that only answers once ``parties`` requests are waiting on it at the same time.
+
+    The answers are then spread out, as SQLite test databases cannot take the notes being saved all at once.
+    """
+
+    def __init__(self, parties, **kwargs):
+        super().__init__(**kwargs)
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def detect_document_text(self, Document, **kwargs):
+        time.sleep(self.barrier.wait() * 0.3)
+        return super().detect_document_text(Document, **kwargs)
+
+
+async def asgi_get(path, token):
+    """GETs ``path`` through the project's ASGI handler, returning the status and the whole body sent."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'frame=16', 'root_path': '',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Future()
+
+    async def send(message):
+        sent.append(message)
+
+    await ASGIHandler()(scope, receive, send)
+    return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTestCase(TransactionTestCase):
+    """Translations run on the translation pool's threads, so the database is committed to rather than rolled back."""
+
+    def setUp(self):
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.translation_url = reverse('translate_img')
+        self.view_all_notes_url = reverse('view_all_notes')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'), {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.access_token = response.data['access']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+
+    def test_views_are_async(self):
+        """Test the translation URLs are served by async views, and the note views and the rest are left alone"""
+        for url in (self.translation_url, reverse('translate_batch')):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+        for url in (self.view_all_notes_url, '/notes/1/', '/notes/1/edit', '/notes/1/delete', reverse('login')):
+            self.assertFalse(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    def test_translation_threads_fit_connection_budget(self):
+        """Test the translation pool never has more threads than the database connections a process may hold allow"""
+        with self.settings(ASYNC_TRANSLATION_THREADS=256, DB_CONNECTION_BUDGET=40):
+            self.assertEqual(translation_threads(), 39)
+        with self.settings(ASYNC_TRANSLATION_THREADS=8, DB_CONNECTION_BUDGET=40):
+            self.assertEqual(translation_threads(), 8)
+        with self.settings(ASYNC_TRANSLATION_THREADS=8, DB_CONNECTION_BUDGET=1):
+            self.assertEqual(translation_threads(), 1)
+
+    def test_translate_and_manage_notes(self):
+        """Test a note can be translated, read, edited and deleted through the async views"""
+        with FakeAWS().install():
+            response = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        note_id = response.data['id']
+        response = self.client.get(self.view_all_notes_url)
+        self.assertEqual([note['id'] for note in response.data['results']], [note_id])
+        response = self.client.put(f'/notes/{note_id}/edit', {'title': 'new_title'})
+        self.assertEqual(json.loads(response.data)[0]['fields']['title'], 'new_title')
+        self.assertEqual(self.client.get(f'/notes/{note_id}/braille.bin').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(f'/notes/{note_id}/delete').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(f'/notes/{note_id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(APIClient().get(self.view_all_notes_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_translations_in_flight_together(self):
+        """Test several translations are in flight at once, each waiting on Textract"""
+        aws = FakeAWS(textract=BarrierTextract(parties=3))
+
+        def translate(number):
+            with open(self.tst_img, "rb") as img:
+                # Different bytes each time, so none is answered from the translation cache.
+                data = img.read() + bytes([number])
+            # Django 4.0's AsyncClient cannot send file uploads, so each request comes from its own thread.
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+            upload = SimpleUploadedFile(f'page_{number}.jpg', data, content_type='image/jpeg')
+            return client.post(self.translation_url, {"img": upload}).status_code
+
+        with aws.install(), ThreadPoolExecutor(max_workers=3) as requests:
+            statuses = list(requests.map(translate, range(3)))
+        self.assertEqual(statuses, [status.HTTP_201_CREATED] * 3)
+        self.assertEqual(len(self.client.get(self.view_all_notes_url).data['results']), 3)
+
+    def test_stream_braille_through_asgi(self):
+        """Test a note's braille streams through the ASGI handler, with the async views on and off"""
+        note = Note.objects.create(user=User.objects.get(username=self.reg_info['username']), title='streamed')
+        NoteContent.objects.create(note=note, ascii_text='hello world ' * 20)
+        for urlconf in (__name__, 'vibraille.urls'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                status_code, body = asyncio.run(asgi_get(f'/notes/{note.id}/braille/stream', self.access_token))
+                self.assertEqual(status_code, status.HTTP_200_OK)
+                frames = [json.loads(line) for line in body.decode().splitlines()]
+                self.assertEqual(frames[-1], {'done': True, 'frames': 15, 'cells': 240})
+                self.assertEqual(''.join(frame['cells'] for frame in frames[:-1]), '⠓⠑⠇⠇⠕⠀⠺⠕⠗⠇⠙⠀' * 20)
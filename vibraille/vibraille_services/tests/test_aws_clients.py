@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+import boto3
+
+from vibraille.vibraille_services import aws_clients
+from vibraille.vibraille_services.tests.fakes import FakeAWS
+
+
+@mock.patch('vibraille.vibraille_services.aws_clients.boto3.client', side_effect=boto3.session.Session().client)
+class AWSClientRegistryTestCase(SimpleTestCase):
+
+    def setUp(self):
+        aws_clients.reset_clients()
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+
+    def test_client_shared_across_threads(self, create_client):
+        """Test every thread gets the same client, created once."""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            clients = list(pool.map(lambda _: aws_clients.get_client('s3'), range(32)))
+        self.assertTrue(all(client is clients[0] for client in clients))
+        self.assertEqual(create_client.call_count, 1)
+
+    @override_settings(AWS_MAX_POOL_CONNECTIONS=7, AWS_MAX_ATTEMPTS=3, AWS_S3_REGION_NAME='us-east-1')
+    def test_client_config(self, _create_client):
+        """Test clients are built with the pool size and retry settings."""
+        config = aws_clients.get_client('textract').meta.config
+        self.assertEqual(config.max_pool_connections, 7)
+        self.assertEqual(config.retries['total_max_attempts'], 3)
+        self.assertTrue(config.tcp_keepalive)
+
+    @override_settings(AWS_ENDPOINT_URLS={'s3': 'http://127.0.0.1:9000'}, AWS_S3_REGION_NAME='us-east-1')
+    def test_endpoint_override(self, _create_client):
+        """Test a service can be pointed at a local endpoint."""
+        self.assertEqual(aws_clients.get_client('s3').meta.endpoint_url, 'http://127.0.0.1:9000')
+
+    def test_new_process_gets_new_client(self, create_client):
+        """Test a forked process does not reuse its parent's client."""
+        first = aws_clients.get_client('s3')
+        with mock.patch('vibraille.vibraille_services.aws_clients.os.getpid', return_value=-1):
+            self.assertIsNot(aws_clients.get_client('s3'), first)
+        self.assertEqual(create_client.call_count, 2)
+
+    def test_override_clients(self, create_client):
+        """Test injected clients are handed out in place of real ones until the block ends."""
+        aws = FakeAWS()
+        with aws.install():
+            self.assertIs(aws_clients.get_client('s3'), aws.s3)
+            self.assertIs(aws_clients.get_client('textract'), aws.textract)
+        create_client.assert_not_called()
+        self.assertIsNot(aws_clients.get_client('s3'), aws.s3)
@@ -0,0 +1,51 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+import json
+import os
+import tempfile
+
+
+class RunBenchmarksTestCase(SimpleTestCase):
+    """Runs only the braille cases, which need no database."""
+
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output_dir.cleanup)
+        self.output = os.path.join(self.output_dir.name, 'bench.json')
+
+    def _run(self, **options):
+        call_command(
+            'run_benchmarks', filter=['chars=1000]'], repeat=2, output=self.output,
+            stdout=StringIO(), stderr=StringIO(), **options
+        )
+        with open(self.output) as output_file:
+            return json.load(output_file)
+
+    def test_writes_timings_as_json(self):
+        """Test each selected case is timed, with its parameters, and the run described"""
+        report = self._run()
+        self.assertEqual(len(report['results']), 4)
+        result = report['results']['braille.convert_to_binary[grade=2,chars=1000]']
+        self.assertEqual(result['params'], {'grade': 2, 'characters': 1000})
+        self.assertEqual(result['seconds']['repeat'], 2)
+        self.assertLessEqual(result['seconds']['best'], result['seconds']['median'])
+        self.assertEqual(report['meta']['repeat'], 2)
+
+    def test_compare_with_baseline(self):
+        """Test a run compared with a much faster baseline fails past the slowdown allowed"""
+        report = self._run()
+        for result in report['results'].values():
+            result['seconds']['best'] /= 1000
+        baseline = os.path.join(self.output_dir.name, 'baseline.json')
+        with open(baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file)
+        self._run(compare=baseline)
+        with self.assertRaisesMessage(CommandError, "4 benchmark(s) slowed by more than 20%"):
+            self._run(compare=baseline, max_slowdown=0.2)
+
+    def test_unknown_filter(self):
+        """Test a filter no case matches is an error rather than an empty run"""
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', filter=['no_such_case'], stdout=StringIO(), stderr=StringIO())
@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase
+
+from vibraille.vibraille_services.braille_utils import (
+    get_braille_encoder,
+    grade2_encoder
+)
+
+
+class ContractedBrailleTestCase(SimpleTestCase):
+
+    def test_strong_contractions(self):
+        """Test and, for, of, the and with contract anywhere in a word."""
+        self.assertEqual(grade2_encoder.to_unicode('the'), '⠮')
+        self.assertEqual(grade2_encoder.to_unicode('and'), '⠯')
+        self.assertEqual(grade2_encoder.to_unicode('Brand'), '⠃⠗⠯')
+        self.assertEqual(grade2_encoder.to_unicode('without'), '⠾⠳⠞')
+
+    def test_wordsigns_only_as_whole_words(self):
+        """Test wordsigns are used for whole words but not inside longer ones."""
+        self.assertEqual(grade2_encoder.to_unicode('people like you'), '⠏⠀⠇⠀⠽')
+        self.assertEqual(grade2_encoder.to_unicode('peoples'), '⠏⠑⠕⠏⠇⠑⠎')
+        self.assertEqual(grade2_encoder.to_unicode('about'), '⠁⠃')
+
+    def test_positional_groupsigns(self):
+        """Test groupsigns restricted to the middle or end of a word are not used at its start."""
+        self.assertEqual(grade2_encoder.to_unicode('reading'), '⠗⠂⠙⠬')
+        self.assertEqual(grade2_encoder.to_unicode('eat'), '⠑⠁⠞')
+        self.assertEqual(grade2_encoder.to_unicode('station'), '⠌⠁⠰⠝')
+        self.assertEqual(grade2_encoder.to_unicode('being'), '⠆⠬')
+
+    def test_longest_match(self):
+        """Test the longest contraction wins over its prefixes."""
+        self.assertEqual(grade2_encoder.to_unicode('there'), '⠐⠮')
+        self.assertEqual(grade2_encoder.to_unicode('themselves'), '⠮⠍⠧⠎')
+
+    def test_numbers_carry_number_sign(self):
+        """Test digit runs start with the UEB number sign and use the letters a-j, unlike the 'in' and 'en' signs."""
+        self.assertEqual(grade2_encoder.to_unicode('in 1999 the'), '⠔⠀⠼⠁⠊⠊⠊⠀⠮')
+        self.assertEqual(grade2_encoder.to_unicode('5 en'), '⠼⠑⠀⠢')
+        self.assertEqual(grade2_encoder.to_unicode('3.14, 2b'), '⠼⠉⠲⠁⠙⠂⠀⠼⠃⠰⠃')
+
+    def test_ueb_punctuation(self):
+        """Test punctuation uses UEB cells rather than computer braille cells that mean contractions."""
+        self.assertEqual(grade2_encoder.to_unicode('what?'), '⠱⠁⠞⠦')
+        self.assertNotEqual(grade2_encoder.to_unicode('?'), grade2_encoder.to_unicode('th'))
+        self.assertEqual(grade2_encoder.to_unicode('3 (the)'), '⠼⠉⠀⠐⠣⠮⠐⠜')
+        self.assertEqual(grade2_encoder.to_unicode('Élan!'), '⠇⠁⠝⠖')
+
+    def test_unmapped_characters_dropped(self):
+        """Test characters Grade 1 has no cell for, control characters included, are dropped as Grade 1 drops them."""
+        self.assertEqual(grade2_encoder.to_unicode('a\nb'), '⠁⠃')
+        self.assertEqual(grade2_encoder.to_unicode('a\tb'), '⠁⠃')
+        self.assertEqual(grade2_encoder.to_unicode('{|}~`x'), '⠭')
+        self.assertEqual(grade2_encoder.to_binary('a {|} c'), grade2_encoder.to_binary('a  c'))
+
+    def test_distinct_cells_have_distinct_binary(self):
+        """Test every cell's binary form is its own dots, so 'with' and 'of' are not the same vibration."""
+        self.assertEqual(grade2_encoder.to_binary('with'), '011111')
+        self.assertEqual(grade2_encoder.to_binary('of'), '111011')
+        self.assertNotEqual(grade2_encoder.to_packed('with'), grade2_encoder.to_packed('of'))
+        self.assertEqual(len({tuple(row) for row in grade2_encoder.binary_rows}), 64)
+
+    def test_formats_agree(self):
+        """Test binary and packed output describe the same cells as the unicode output."""
+        braille_format, braille_binary, braille_packed = grade2_encoder.encode_all('The child shall read with us.')
+        self.assertEqual(len(braille_binary), 6 * len(braille_format))
+        self.assertEqual(len(braille_packed), len(braille_format))
+        self.assertEqual(braille_binary[:6], '011101')
+        self.assertEqual(grade2_encoder.encode_batch(['the', 'and']), [('⠮', '011101'), ('⠯', '111101')])
+
+    def test_unknown_grade(self):
+        """Test only grades 1 and 2 are supported."""
+        self.assertIs(get_braille_encoder('2'), grade2_encoder)
+        with self.assertRaises(Exception):
+            get_braille_encoder(3)
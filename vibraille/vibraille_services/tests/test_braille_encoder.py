@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase
+
+from vibraille.vibraille_services.braille_utils import (
+    ascii_braille_map,
+    binary_braille_map,
+    braille_encoder
+)
+
+
+def _per_character(text, char_map):
+    """The original encoder: lower the text and look each character up."""
+    return ''.join([char_map[val] for val in text.lower() if char_map.get(val)])
+
+
+class BrailleEncoderTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.sample = 'V 11 March 3s: "Gd law" (how) about PEOPLE—bei café İstanbul K? ß ⠁ \t\n 100%_done!'
+
+    def test_matches_per_character_encoding(self):
+        """Test the compiled encoder gives the same output as mapping each lowered character."""
+        braille_format, braille_binary = braille_encoder.encode(self.sample)
+        self.assertEqual(braille_format, _per_character(self.sample, ascii_braille_map))
+        self.assertEqual(braille_binary, _per_character(self.sample, binary_braille_map))
+        self.assertEqual(braille_encoder.to_unicode(self.sample), braille_format)
+        self.assertEqual(braille_encoder.to_binary(self.sample), braille_binary)
+
+    def test_unmapped_characters_dropped(self):
+        """Test characters without a braille cell are dropped, after lowering."""
+        self.assertEqual(braille_encoder.encode('é—\t\n⠁'), ('', ''))
+        # 'İ' lowers to 'i' plus a combining dot, and the Kelvin sign lowers to 'k'.
+        self.assertEqual(braille_encoder.to_unicode('İK'), '⠊⠅')
+        self.assertEqual(braille_encoder.encode(''), ('', ''))
+
+    def test_binary_follows_cell_dots(self):
+        """Test binary output is the unicode cell's dots, so '(' and ')' no longer share one binary form."""
+        self.assertEqual(braille_encoder.encode(')'), ('⠾', '011111'))
+        self.assertEqual(braille_encoder.encode('('), ('⠷', '111011'))
+
+    def test_batch(self):
+        """Test batches encode each text as if it were on its own."""
+        texts = ['Hello', '', self.sample, 'é', 'abc' * 100]
+        self.assertEqual(braille_encoder.encode_batch(texts), [braille_encoder.encode(text) for text in texts])
+        self.assertEqual(braille_encoder.encode_batch([]), [])
@@ -0,0 +1,131 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+import os
+import shutil
+import tempfile
+
+from vibraille.vibraille_services.db_routers import replica_reads
+from vibraille.vibraille_services.models import User, VibrailleUser, Note, NoteContent
+from vibraille.vibraille_services.tests.fakes import FakeAWS
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """Runs against a second SQLite database standing in for a replica, copied from the primary by _replicate().
+
+    The replica is added once the test databases are set up, so the test runner leaves it alone.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['replica'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3')},
+        })['replica']
+        with connections['replica'].schema_editor() as schema_editor:
+            for model in apps.get_models():
+                if model._meta.managed and not model._meta.proxy:
+                    schema_editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        caches[settings.USER_CACHE_ALIAS].clear()
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+        aws = FakeAWS().install()
+        aws.__enter__()
+        self.addCleanup(aws.__exit__, None, None, None)
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.view_all_notes_url = reverse('view_all_notes')
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'), {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.test_user = User.objects.get(username=self.reg_info['username'])
+        self.note = Note.objects.create(user=self.test_user, title='primary')
+        NoteContent.objects.create(note=self.note, ascii_text='ab')
+
+    def _replicate(self):
+        """Copies the primary's users and notes to the replica, and lets the pins on the primary expire."""
+        for model in (User, VibrailleUser, Note, NoteContent):
+            model.objects.using('replica').all().delete()
+            model.objects.using('replica').bulk_create(model.objects.using('default').all())
+        caches[settings.USER_CACHE_ALIAS].clear()
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+
+    def test_note_reads_from_replica(self):
+        """Test note and user lookups are read from the replica once the user has not written for a while"""
+        self._replicate()
+        Note.objects.using('replica').filter(id=self.note.id).update(title='replica')
+        with CaptureQueriesContext(connections['default']) as primary_queries:
+            response = self.client.get(self.view_all_notes_url)
+            self.assertEqual(self.client.get(f'/notes/{self.note.id}/braille.bin').status_code, status.HTTP_200_OK)
+        self.assertEqual([note['title'] for note in response.data['results']], ['replica'])
+        self.assertEqual(len(primary_queries), 0)
+
+    def test_braille_stream_reads_from_replica(self):
+        """Test the braille stream's window reads, made after its view has returned, go to the replica too"""
+        self._replicate()
+        NoteContent.objects.using('replica').filter(note_id=self.note.id).update(ascii_text='cd')
+        with CaptureQueriesContext(connections['default']) as primary_queries:
+            response = self.client.get(f'/notes/{self.note.id}/braille/stream')
+            body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('"cells": "⠉⠙"', body)
+        self.assertEqual(len(primary_queries), 0)
+
+    def test_writer_reads_from_primary(self):
+        """Test a user's reads go to the primary right after they write, so a new translation is always listed"""
+        self._replicate()
+        response = self.client.post(
+            reverse('translate_img'), {"img": open("./vibraille/vibraille_services/tests/image_test.jpg", "rb")}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Note.objects.using('replica').filter(id=response.data['id']).exists())
+        response = self.client.get(self.view_all_notes_url)
+        self.assertEqual([note['title'] for note in response.data['results']], ['primary', 'image_test.jpg'])
+
+        self._replicate()
+        self.client.put(f'/notes/{self.note.id}/edit', {'title': 'edited'})
+        Note.objects.using('replica').filter(id=self.note.id).update(title='stale')
+        response = self.client.get(f'/notes/{self.note.id}/')
+        self.assertIn('edited', response.data)
+
+    def test_writes_go_to_primary(self):
+        """Test writes, and migrations, only ever go to the primary"""
+        self._replicate()
+        with replica_reads(self.test_user.id):
+            self.assertEqual(router.db_for_read(Note), 'replica')
+            self.assertEqual(router.db_for_write(Note), 'default')
+            note = Note.objects.get(id=self.note.id)
+        self.assertEqual(router.db_for_read(Note), 'default')
+        self.assertTrue(router.allow_migrate('default', 'vibraille'))
+        self.assertFalse(router.allow_migrate('replica', 'vibraille'))
+        with replica_reads(self.test_user.id):
+            # Saving the note just read pins its owner to the primary.
+            note.save()
+            self.assertEqual(router.db_for_read(Note), 'replica')
+        with replica_reads(self.test_user.id):
+            self.assertEqual(router.db_for_read(Note), 'default')
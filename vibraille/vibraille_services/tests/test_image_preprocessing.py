@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+import cv2
+import numpy as np
+
+from vibraille.vibraille_services.image_preprocessing import (
+    BINARIZE,
+    estimate_skew,
+    preprocess_image,
+    rotate_image
+)
+
+
+class ImagePreprocessingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        with open("./vibraille/vibraille_services/tests/image_test.jpg", "rb") as tst_img:
+            self.img_data = tst_img.read()
+
+    def _text_page(self):
+        page = np.full((800, 1000), 255, dtype=np.uint8)
+        for line in range(10):
+            cv2.putText(page, 'The quick brown fox jumps over', (50, 80 + line * 65), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 0, 3)
+        return page
+
+    def test_downscale_to_grayscale(self):
+        """Test large images are shrunk to the max dimension and re-encoded in grayscale."""
+        processed, stats = preprocess_image(self.img_data, max_dimension=600)
+        img = cv2.imdecode(np.frombuffer(processed, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        self.assertEqual(max(img.shape), 600)
+        self.assertEqual(img.ndim, 2)
+        self.assertFalse(stats['skipped'])
+        self.assertEqual(stats['processed_bytes'], len(processed))
+        self.assertEqual(stats['bytes_saved'], len(self.img_data) - len(processed))
+        self.assertGreater(stats['bytes_saved'], 0)
+        self.assertGreater(stats['duration_ms'], 0)
+
+    def test_binarize(self):
+        """Test binarized images only contain black and white pixels."""
+        processed, stats = preprocess_image(self.img_data, mode=BINARIZE)
+        img = cv2.imdecode(np.frombuffer(processed, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        self.assertEqual(set(np.unique(img)) - {0, 255}, set())
+        self.assertTrue(processed.startswith(b'\x89PNG'))
+
+    def test_deskew(self):
+        """Test skewed text is rotated back to level."""
+        page = self._text_page()
+        matrix = cv2.getRotationMatrix2D((500, 400), 5, 1.0)
+        skewed = cv2.warpAffine(page, matrix, (1000, 800), borderValue=255)
+        angle = estimate_skew(skewed)
+        self.assertAlmostEqual(abs(angle), 5, delta=0.5)
+        self.assertAlmostEqual(estimate_skew(rotate_image(skewed, angle)), 0, delta=0.5)
+
+        _, stats = preprocess_image(cv2.imencode('.png', skewed)[1].tobytes())
+        self.assertAlmostEqual(stats['skew_angle'], angle, delta=0.1)
+
+    def test_undecodable_image_passes_through(self):
+        """Test bytes OpenCV cannot read are returned untouched."""
+        processed, stats = preprocess_image(b'not an image')
+        self.assertEqual(processed, b'not an image')
+        self.assertTrue(stats['skipped'])
+        self.assertEqual(stats['bytes_saved'], 0)
+
+    def test_small_image_passes_through(self):
+        """Test an image re-encoding would not shrink is returned untouched."""
+        small = cv2.imencode('.jpg', self._text_page()[:200, :300], [cv2.IMWRITE_JPEG_QUALITY, 20])[1].tobytes()
+        processed, stats = preprocess_image(small)
+        self.assertEqual(processed, small)
+        self.assertTrue(stats['skipped'])
+        self.assertEqual(stats['processed_bytes'], len(small))
+        self.assertEqual(stats['bytes_saved'], 0)
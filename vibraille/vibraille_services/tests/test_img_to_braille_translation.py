@@ -1,11 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from unittest import mock
+import hashlib
+import io
+import tempfile
+import threading
+from PIL import Image
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
-from vibraille.vibraille_services.models import User
+from vibraille.vibraille_services.braille_utils import BrailleTranslator, braille_encoder
+from vibraille.vibraille_services.models import Note, NoteContent, User
+from vibraille.vibraille_services.tests.fakes import IMAGE_TEST_TEXT, FakeAWS, FakeS3, FakeTextract
 
 
 
+# Saved images would otherwise pile up in MEDIA_ROOT and later uploads of image_test.jpg get renamed.
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ImageTranslationTestCase(APITestCase):
 
     def setUp(self):
@@ -84,3 +101,366 @@ class ImageTranslationTestCase(APITestCase):
             'Method "DELETE" not allowed.',
         )
 
+
+@override_settings(
+    OCR_BACKEND='vibraille.vibraille_services.ocr_backends.TesseractBackend',
+    OCR_PROCESS_POOL_SIZE=0
+)
+class LocalOCRTranslationTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.translation_url = reverse('translate_img')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    @mock.patch('pytesseract.image_to_string', return_value='V 11 March\n\n  3s gd law  \n')
+    def test_local_translation(self, image_to_string):
+        """Test translation with the local OCR engine skips S3 and Textract."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.translation_url, {
+                "img": open(self.tst_img, "rb")
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['ascii_text'], 'V 11 March 3s gd law')
+        self.assertEqual(response.data['braille_format'], '⠧⠀⠂⠂⠀⠍⠁⠗⠉⠓⠀⠒⠎⠀⠛⠙⠀⠇⠁⠺')
+        self.assertEqual(image_to_string.call_count, 1)
+        self.assertEqual(aws.s3.objects, {})
+        self.assertEqual(aws.textract.calls, [])
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+class TranslationCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.translation_url = reverse('translate_img')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def test_repeat_upload_hits_cache(self, _sleep):
+        """Test uploading the same image again reuses the first translation without calling AWS."""
+        aws = FakeAWS()
+        with aws.install():
+            first = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        repeat_aws = FakeAWS(textract=FakeTextract(lines=['something else']))
+        with repeat_aws.install():
+            second = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(first.data['id'], second.data['id'])
+        for field in ('ascii_text', 'braille_format', 'braille_binary'):
+            self.assertEqual(first.data[field], second.data[field])
+        self.assertEqual(repeat_aws.textract.calls, [])
+        self.assertEqual(repeat_aws.s3.objects, {})
+
+    def test_grade_2_reuses_cached_text(self, _sleep):
+        """Test a grade 2 upload of a cached image contracts the cached text without calling AWS."""
+        with FakeAWS().install():
+            first = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+
+        repeat_aws = FakeAWS()
+        with repeat_aws.install():
+            second = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb"), "grade": 2})
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['grade'], 1)
+        self.assertEqual(second.data['grade'], 2)
+        self.assertEqual(second.data['ascii_text'], first.data['ascii_text'])
+        self.assertEqual(
+            second.data['braille_format'],
+            '⠧⠀⠼⠁⠁⠀⠍⠜⠡⠀⠼⠉⠎⠀⠛⠙⠀⠇⠁⠺⠀⠓⠪⠀⠁⠃⠀⠏⠀⠆⠊⠀⠉⠜⠞⠕⠕⠝⠊⠵⠫⠦⠀⠎⠑⠑⠀⠏⠁⠛⠑⠀⠼⠉⠁'
+        )
+        self.assertEqual(repeat_aws.textract.calls, [])
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+@override_settings(S3_ARCHIVE_WORKERS=0)
+class TextractPathTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.translation_url = reverse('translate_img')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def test_single_image_uses_synchronous_api(self, _sleep):
+        """Test a single JPEG is read by detect_document_text and archived to S3 without a job."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['ascii_text'], IMAGE_TEST_TEXT)
+        self.assertEqual(aws.textract.calls, ['detect_document_text'])
+        [(_bucket, key)] = aws.s3.objects
+        self.assertTrue(key.endswith('/image_test.jpg'))
+        stages = [timing.split(';')[0] for timing in response['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['cache_lookup', 'preprocessing', 'uploading', 'detecting_text', 'encoding', 'saving'])
+
+    @override_settings(S3_ARCHIVE_WORKERS=2, IMAGE_PREPROCESSING_ENABLED=False)
+    def test_archive_streams_from_spool(self, _sleep):
+        """Test the background archive reads the spool itself, which stays open until the archive is sent."""
+        translated, archived = threading.Event(), threading.Event()
+
+        class SlowS3(FakeS3):
+            def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+                self.fileobj = Fileobj
+                translated.wait(10)
+                super().upload_fileobj(Fileobj, Bucket, Key, **kwargs)
+                archived.set()
+
+        aws = FakeAWS(s3=SlowS3())
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+            translated.set()
+            self.assertTrue(archived.wait(10))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIsInstance(aws.s3.fileobj, io.BytesIO)
+        with open(self.tst_img, "rb") as tst_img:
+            self.assertEqual(list(aws.s3.objects.values()), [tst_img.read()])
+
+    @override_settings(TEXTRACT_SYNC_MAX_BYTES=1024)
+    def test_large_image_uses_text_detection_job(self, _sleep):
+        """Test images over the synchronous limit are uploaded first and read by an asynchronous job."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(response.data['ascii_text'], IMAGE_TEST_TEXT)
+        self.assertEqual(aws.textract.calls[0], 'start_document_text_detection')
+        self.assertNotIn('detect_document_text', aws.textract.calls)
+        [(_bucket, key)] = aws.s3.objects
+        [job] = aws.textract.jobs.values()
+        self.assertEqual(job['location']['S3Object']['Name'], key)
+
+    @override_settings(TEXTRACT_SYNC_ENABLED=False)
+    def test_job_results_followed_across_pages(self, _sleep):
+        """Test every page of a job's results is read, not only the first."""
+        lines = [f'line {number}' for number in range(7)]
+        aws = FakeAWS(textract=FakeTextract(lines=lines, max_results=3))
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(response.data['ascii_text'], ' '.join(lines))
+        # Two polls, the second of which returns the first results, then two more result pages.
+        self.assertEqual(aws.textract.calls.count('get_document_text_detection'), 4)
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+@override_settings(S3_ARCHIVE_WORKERS=0)
+class DocumentTranslationTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.translation_url = reverse('translate_img')
+        with Image.open("./vibraille/vibraille_services/tests/image_test.jpg") as tst_img:
+            self.page = tst_img.convert('L').resize((400, 300))
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def _document(self, name, pages):
+        buffer = io.BytesIO()
+        self.page.save(buffer, format=name.rsplit('.', 1)[1], save_all=True, append_images=[self.page] * (pages - 1))
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_tiff_pages_read_separately(self, _sleep):
+        """Test each page of a TIFF is read on its own and saved as a page of the Note."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": self._document('chapter.tiff', 3)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['page_count'], 3)
+        self.assertTrue(response.data['complete'])
+        self.assertEqual(response.data['ascii_text'], ' '.join([IMAGE_TEST_TEXT] * 3))
+        self.assertEqual(aws.textract.calls, ['detect_document_text'] * 3)
+        self.assertEqual(len(aws.s3.objects), 1)
+
+        pages = self.client.get(reverse('view_note_pages', args=[response.data['id']]) + '?after=1')
+        self.assertEqual(pages.data['complete'], True)
+        self.assertEqual([page['number'] for page in pages.data['pages']], [2, 3])
+        self.assertEqual(pages.data['pages'][0]['ascii_text'], IMAGE_TEST_TEXT)
+
+    def test_pdf_read_by_text_detection_job(self, _sleep):
+        """Test PDFs are uploaded and read by a job whose results are split into pages."""
+        textract = FakeTextract(pages=[['Page one'], [], ['Page three', 'continued']], max_results=2)
+        aws = FakeAWS(textract=textract)
+        with aws.install():
+            response = self.client.post(self.translation_url, {"img": self._document('chapter.pdf', 3)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['ascii_text'], 'Page one Page three continued')
+        self.assertNotIn('detect_document_text', textract.calls)
+        [(_bucket, key)] = aws.s3.objects
+        self.assertTrue(key.endswith('/chapter.pdf'))
+
+        note = Note.objects.get(id=response.data['id'])
+        self.assertEqual(note.page_count, 3)
+        self.assertEqual(
+            list(note.pages.values_list('number', 'ascii_text')),
+            [(1, 'Page one'), (2, ''), (3, 'Page three continued')]
+        )
+        self.assertEqual(note.pages.get(number=3).braille_format, braille_encoder.to_unicode('Page three continued'))
+
+    def test_pages_belong_to_user(self, _sleep):
+        """Test other users' notes are not found when reading pages."""
+        other_note = Note.objects.create(user=User.objects.create(username='other_user'), title='other')
+        response = self.client.get(reverse('view_note_pages', args=[other_note.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(S3_ARCHIVE_WORKERS=0)
+class BatchTranslationTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        self.test_user = User.objects.get(username=self.reg_info['username'])
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.batch_url = reverse('translate_batch')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def _page(self, number):
+        with open(self.tst_img, "rb") as tst_img:
+            return SimpleUploadedFile(f'page_{number}.jpg', tst_img.read(), content_type='image/jpeg')
+
+    def test_batch_results_in_page_order(self):
+        """Test every page gets its own result, in upload order, with failures reported per page."""
+        pages = [self._page(1), SimpleUploadedFile('notes.txt', b'not an image'), self._page(3)]
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.batch_url, {'img': pages}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2])
+        self.assertEqual([result['img_name'] for result in results], ['page_1.jpg', 'notes.txt', 'page_3.jpg'])
+        self.assertEqual([result['status'] for result in results], ['created', 'failed', 'created'])
+        self.assertIsNone(results[1]['note'])
+        self.assertTrue(results[1]['error'])
+        self.assertEqual(results[0]['note']['ascii_text'], IMAGE_TEST_TEXT)
+        self.assertEqual(
+            sorted(Note.objects.filter(user=self.test_user).values_list('id', flat=True)),
+            sorted([results[0]['note']['id'], results[2]['note']['id']])
+        )
+
+    def test_batch_all_created(self):
+        """Test a batch where every page translates responds 201 in the requested grade."""
+        with FakeAWS().install():
+            response = self.client.post(self.batch_url, {'img': [self._page(1), self._page(2)], 'grade': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['note']['grade'] for result in response.data['results']], [2, 2])
+
+    def test_batch_saved_without_bulk_insert_ids(self):
+        """Test each page keeps its own content where bulk inserts do not return ids, as on MySQL."""
+        with FakeAWS().install(), mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post(self.batch_url, {'img': [self._page(1), self._page(2)]})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for result in response.data['results']:
+            self.assertEqual(NoteContent.objects.get(note_id=result['note']['id']).ascii_text, IMAGE_TEST_TEXT)
+
+    @override_settings(TRANSLATION_BATCH_MAX_IMAGES=1)
+    def test_batch_size_limit(self):
+        """Test batches over the page limit are rejected before any work is done."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.batch_url, {'img': [self._page(1), self._page(2)]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(aws.textract.calls, [])
+
+
+class UploadSpoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        with open("./vibraille/vibraille_services/tests/image_test.jpg", "rb") as tst_img:
+            self.img_bytes = tst_img.read()
+
+    @override_settings(IMAGE_SPOOL_MAX_MEMORY=1024)
+    def test_large_upload_spills_to_disk(self):
+        """Test uploads bigger than the spool limit are kept on disk rather than in memory."""
+        b_process = BrailleTranslator(SimpleUploadedFile('image_test.jpg', self.img_bytes))
+        self.assertTrue(b_process.img_file._rolled)
+        self.assertEqual(b_process.img_data, self.img_bytes)
+        self.assertEqual(b_process.img_hash, hashlib.sha256(self.img_bytes).hexdigest())
+        b_process.close()
+
+    def test_same_name_uploads_do_not_collide(self):
+        """Test two uploads with the same file name get their own copies and S3 keys."""
+        first = BrailleTranslator(SimpleUploadedFile('photo.jpg', self.img_bytes))
+        second = BrailleTranslator(SimpleUploadedFile('photo.jpg', b'other bytes'))
+        self.assertNotEqual(first.s3_key, second.s3_key)
+        self.assertEqual(first.img_data, self.img_bytes)
+        self.assertEqual(second.img_data, b'other bytes')
+
+    def test_img_reader_shares_the_spool_lock(self):
+        """Test the reader storage saves from keeps its own position and waits on the lock the archive reads under."""
+        b_process = BrailleTranslator(SimpleUploadedFile('image_test.jpg', self.img_bytes))
+        img = File(b_process.img_reader(), name='image_test.jpg')
+        self.assertEqual(img.size, len(self.img_bytes))
+        self.assertEqual(b''.join(img.chunks(chunk_size=1000)), self.img_bytes)
+        img.seek(0)
+        self.assertEqual(img.read(10), self.img_bytes[:10])
+        self.assertEqual(b_process.img_data, self.img_bytes)
+        self.assertEqual(img.read(10), self.img_bytes[10:20])
+        img.seek(0)
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            with b_process.file_lock:
+                read = reader.submit(img.read, 10)
+                self.assertRaises(FutureTimeout, read.result, timeout=0.1)
+            self.assertEqual(read.result(), self.img_bytes[:10])
+        b_process.close()
+        self.assertTrue(img.closed)
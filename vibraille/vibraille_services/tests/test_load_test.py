@@ -0,0 +1,97 @@
+from botocore.config import Config
+from django.conf import settings
+from django.core.cache import caches
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+import boto3
+import botocore.exceptions
+import io
+
+from vibraille.vibraille_services.aws_clients import reset_clients
+from vibraille.vibraille_services.benchmarks.fake_aws_services import FakeS3Service, FakeTextractService
+from vibraille.vibraille_services.benchmarks.load_test import run_load, summarize
+
+
+def _client(service_name, service, attempts=1):
+    return boto3.session.Session().client(
+        service_name, endpoint_url=service.url, region_name='us-east-1', aws_access_key_id='test',
+        aws_secret_access_key='test', config=Config(retries={'total_max_attempts': attempts, 'mode': 'standard'})
+    )
+
+
+class FakeAWSServicesTestCase(SimpleTestCase):
+    """Talks to the fake services with real boto3 clients."""
+
+    def test_s3_uploads(self):
+        """Test small and multipart uploads are kept whole"""
+        with FakeS3Service() as s3_service:
+            s3 = _client('s3', s3_service)
+            s3.upload_fileobj(io.BytesIO(b'small'), 'vibraille-test', 'small.jpg')
+            s3.upload_fileobj(io.BytesIO(b'x' * 9 * 1024 * 1024), 'vibraille-test', 'large.jpg')
+        self.assertEqual(s3_service.objects[('vibraille-test', 'small.jpg')], b'small')
+        self.assertEqual(len(s3_service.objects[('vibraille-test', 'large.jpg')]), 9 * 1024 * 1024)
+
+    def test_textract_jobs_run_for_job_seconds(self):
+        """Test text is read from bytes straight away, and from S3 once the job has run"""
+        with FakeTextractService(lines=['hello world'], job_seconds=60) as textract_service:
+            textract = _client('textract', textract_service)
+            response = textract.detect_document_text(Document={'Bytes': b'image'})
+            self.assertEqual([block.get('Text') for block in response['Blocks']], [None, 'hello world'])
+            job_id = textract.start_document_text_detection(
+                DocumentLocation={'S3Object': {'Bucket': 'vibraille-test', 'Name': 'page.jpg'}}
+            )['JobId']
+            self.assertEqual(textract.get_document_text_detection(JobId=job_id)['JobStatus'], 'IN_PROGRESS')
+            textract_service.jobs[job_id] = 0
+            response = textract.get_document_text_detection(JobId=job_id)
+        self.assertEqual(response['JobStatus'], 'SUCCEEDED')
+        self.assertEqual(response['Blocks'][1], {'BlockType': 'LINE', 'Text': 'hello world', 'Page': 1})
+
+    def test_failures_are_throttling(self):
+        """Test failed requests are the throttling errors boto3 retries"""
+        with FakeTextractService(failure_rate=1) as textract_service:
+            with self.assertRaises(botocore.exceptions.ClientError) as raised:
+                _client('textract', textract_service, attempts=3).detect_document_text(Document={'Bytes': b'image'})
+        self.assertEqual(raised.exception.response['Error']['Code'], 'ProvisionedThroughputExceededException')
+        self.assertEqual((textract_service.requests, textract_service.failures), (3, 3))
+
+    def test_summarize(self):
+        """Test latencies are reported per endpoint as nearest-rank percentiles"""
+        samples = [('notes_list', 200, number / 1000) for number in range(1, 101)] + [('login', None, 0.5)]
+        results = summarize(samples, seconds=10)
+        self.assertEqual(results['requests'], 101)
+        self.assertEqual(results['errors'], 1)
+        notes_list = results['endpoints']['notes_list']
+        self.assertEqual((notes_list['p50_ms'], notes_list['p95_ms'], notes_list['p99_ms']), (50, 95, 99))
+        self.assertEqual(notes_list['per_second'], 10)
+        self.assertEqual(results['endpoints']['login']['errors'], 1)
+
+
+class LoadTestTestCase(LiveServerTestCase):
+    """Runs a short load test against the live server, with AWS replaced by the fake services."""
+
+    def setUp(self):
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+        self.s3_service = FakeS3Service().start()
+        self.textract_service = FakeTextractService(job_seconds=0.2).start()
+        self.addCleanup(self.s3_service.stop)
+        self.addCleanup(self.textract_service.stop)
+        aws_settings = override_settings(
+            AWS_ENDPOINT_URLS={'s3': self.s3_service.url, 'textract': self.textract_service.url},
+            AWS_STORAGE_BUCKET_NAME='vibraille-load-test', TEXTRACT_SYNC_ENABLED=False,
+            TEXTRACT_POLL_INITIAL_DELAY=0.1
+        )
+        aws_settings.enable()
+        self.addCleanup(aws_settings.disable)
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    def test_users_register_translate_and_read(self):
+        """Test a virtual user's session goes through registration, login, translation and note reads"""
+        # One virtual user, as the live server shares the in-memory test database between its threads.
+        results = run_load(self.live_server_url, users=1, duration=3, mix='translations', session_actions=5)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual({'register', 'login', 'translate'} - set(results['endpoints']), set())
+        translate = results['endpoints']['translate']
+        self.assertGreaterEqual(translate['p50_ms'], 200)
+        self.assertLessEqual(translate['p50_ms'], translate['p95_ms'])
+        self.assertEqual(len(self.s3_service.objects), translate['requests'])
@@ -1,8 +1,12 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
-from vibraille.vibraille_services.models import User
+from vibraille.vibraille_services.models import User, VibrailleUser, normalize_phone_number
 
 
 class LoginTestCase(APITestCase):
@@ -104,4 +108,140 @@ class LoginTestCase(APITestCase):
         self.assertEqual(response.data['user']['email'], self.test_user.email)
         self.assertEqual(response.data['user']['username'], self.test_user.username)
         self.assertEqual(response.data['user']['id'], self.test_user.id)
-        self.assertEqual(response.data['user']['phone_number'], self.test_user.vibrailleuser.phone_number)
\ No newline at end of file
+        self.assertEqual(response.data['user']['phone_number'], self.test_user.vibrailleuser.phone_number)
+
+    def test_phone_lookups_ignore_formatting(self):
+        """Tests phone verification and login find the user however the number is written, in one query."""
+        verification_data = {'phone_number': '+1 123 456 7890', 'verify_str': self.verification_phone_str}
+        response = self.client.put(self.verify_phone_url, verification_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.test_user.vibrailleuser.phone_number, self.reg_info['phone_number'])
+
+        login_data = {'phone_number': '+1-123-456-7890', 'password': self.reg_info['password']}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.login_url, login_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['id'], self.test_user.id)
+        self.assertEqual(response.data['user']['phone_number'], self.reg_info['phone_number'])
+        profile_queries = [query['sql'] for query in queries if 'vibraille_vibrailleuser' in query['sql']]
+        self.assertEqual(len(profile_queries), 1)
+        self.assertIn('phone_normalized', profile_queries[0])
+
+    def test_register_duplicate_phone(self):
+        """Tests a phone number already in use cannot be registered again in another format."""
+        response = self.client.post(self.signup_url, {
+            'username': 'second_user',
+            'password': 'test_Pass',
+            'phone_number': '+1 (123) 456 7890',
+            'email': 'second_user@test.com'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('phone_number', response.data)
+        self.assertFalse(User.objects.filter(username='second_user').exists())
+
+    def test_users_without_phone_numbers(self):
+        """Tests accounts without phone numbers do not clash, and cannot be found by an empty number."""
+        User.objects.create(username='no_phone_1')
+        User.objects.create(username='no_phone_2')
+        self.assertEqual(VibrailleUser.objects.filter(phone_normalized__isnull=True).count(), 2)
+        response = self.client.post(self.login_url, {'phone_number': '()', 'password': self.reg_info['password']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+
+class CachedAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        self.test_user = User.objects.get(username=self.reg_info['username'])
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.notes_url = reverse('view_all_notes')
+
+    def test_user_read_once(self):
+        """Tests the user named by a token is read from the database once, then from the cache."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.notes_url).status_code, status.HTTP_200_OK)
+        self.assertTrue(any('auth_user' in query['sql'] for query in queries))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.notes_url).status_code, status.HTTP_200_OK)
+        self.assertFalse(any('auth_user' in query['sql'] for query in queries))
+
+    def test_deactivated_user_rejected(self):
+        """Tests a cached user that is deactivated is turned away straight away."""
+        self.client.get(self.notes_url)
+        self.test_user.is_active = False
+        self.test_user.save()
+        self.assertEqual(self.client.get(self.notes_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_renamed_user_token_rejected(self):
+        """Tests tokens issued before a rename no longer authenticate."""
+        self.client.get(self.notes_url)
+        self.test_user.username = 'renamed_user'
+        self.test_user.save()
+        self.assertEqual(self.client.get(self.notes_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PhoneNormalizationTestCase(SimpleTestCase):
+
+    def test_normalize_phone_number(self):
+        """Tests phone numbers reduce to their digits, keeping a leading +."""
+        self.assertEqual(normalize_phone_number('+1(123)456-7890'), '+11234567890')
+        self.assertEqual(normalize_phone_number(' +1 123.456.7890 '), '+11234567890')
+        self.assertEqual(normalize_phone_number('(123) 456-7890'), '1234567890')
+        self.assertIsNone(normalize_phone_number(''))
+        self.assertIsNone(normalize_phone_number('+-()'))
+        self.assertIsNone(normalize_phone_number(None))
+
+
+class PhoneNormalizationMigrationTestCase(TransactionTestCase):
+    before = [('vibraille', '0008_note_content')]
+    after = [('vibraille', '0009_indexed_user_lookups')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_numbers_normalized(self):
+        """Tests existing numbers are normalized, with a shared number kept by its first user."""
+        old_apps = self._migrate(self.before)
+        OldUser = old_apps.get_model('auth', 'User')
+        OldVibrailleUser = old_apps.get_model('vibraille', 'VibrailleUser')
+        first, second, no_phone = (OldUser.objects.create(username=name) for name in ('first', 'second', 'no_phone'))
+        OldVibrailleUser.objects.create(user=first, phone_number='+1(123)456-7890')
+        OldVibrailleUser.objects.create(user=second, phone_number='+1 123 456 7890')
+        OldVibrailleUser.objects.create(user=no_phone)
+
+        new_apps = self._migrate(self.after)
+        normalized = dict(new_apps.get_model('vibraille', 'VibrailleUser').objects.values_list(
+            'user__username', 'phone_normalized'
+        ))
+        self.assertEqual(normalized, {'first': '+11234567890', 'second': None, 'no_phone': None})
+
+    def test_user_email_index(self):
+        """Tests the index this app owns on auth_user is added, and dropped again when the migration is unapplied."""
+        def user_indexes():
+            with connection.cursor() as cursor:
+                return connection.introspection.get_constraints(cursor, 'auth_user')
+
+        self._migrate(self.before)
+        self.assertNotIn('auth_user_email_idx', user_indexes())
+        self._migrate(self.after)
+        self.assertEqual(user_indexes()['auth_user_email_idx']['columns'], ['email'])
+        self._migrate(self.before)
+        self.assertNotIn('auth_user_email_idx', user_indexes())
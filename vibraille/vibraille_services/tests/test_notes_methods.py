@@ -1,15 +1,32 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+import brotli
+import cbor2
+import gzip
 import json
+import msgpack
 
-from vibraille.vibraille_services.models import User, Note
+from vibraille.vibraille_services.braille_utils import grade2_encoder
+from vibraille.vibraille_services.models import User, Note, NoteContent
+from vibraille.vibraille_services.tests.fakes import FakeAWS
 
 
 
 class ImageTranslationTestCase(APITestCase):
 
     def setUp(self):
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+        aws = FakeAWS().install()
+        aws.__enter__()
+        self.addCleanup(aws.__exit__, None, None, None)
         self.reg_info = {
             'username': 'test_user',
             'password': 'test_Pass',
@@ -45,12 +62,45 @@ class ImageTranslationTestCase(APITestCase):
         """Test retrieve all notes"""
         response = self.client.get(self.view_all_notes_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        _processed_data = json.loads(response.data)
-        self.assertTrue(response.data)
-        self.assertEqual(
-            ['created', 'title', 'img', 'img_name', 'ascii_text', 'braille_format', 'braille_binary', 'user']
-            , list(_processed_data[0]['fields'].keys()))
-        self.assertEqual(len(_processed_data), 1)
+        self.assertEqual(['next', 'previous', 'results'], list(response.data.keys()))
+        self.assertEqual(['id', 'created', 'title'], list(response.data['results'][0].keys()))
+        self.assertEqual(response.data['results'][0]['id'], self.note_data['id'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_get_all_notes_fields(self):
+        """Test only the requested fields are listed, and only their columns read"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.view_all_notes_url + '?fields=id,ascii_text,grade')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(['id', 'ascii_text', 'grade'], list(response.data['results'][0].keys()))
+        self.assertEqual(response.data['results'][0]['ascii_text'], self.note_data['ascii_text'])
+        [content_query] = [query['sql'] for query in queries if 'vibraille_notecontent' in query['sql']]
+        self.assertIn('ascii_text', content_query)
+        self.assertNotIn('braille_binary', content_query)
+        self.assertNotIn('braille_packed', content_query)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.view_all_notes_url)
+        self.assertFalse(any('vibraille_notecontent' in query['sql'] for query in queries))
+
+        response = self.client.get(self.view_all_notes_url + '?fields=id,braille_packed')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_all_notes_cursor(self):
+        """Test cursors walk every note once, oldest first, even as notes are added"""
+        other_user = User.objects.create(username='other_user')
+        Note.objects.create(user=other_user, title='other')
+        for number in range(11):
+            Note.objects.create(user=self.test_user, title=f'note {number}')
+        response = self.client.get(self.view_all_notes_url + '?page_size=5')
+        self.assertIsNone(response.data['previous'])
+        titles = [note['title'] for note in response.data['results']]
+        Note.objects.create(user=self.test_user, title='added')
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [note['title'] for note in response.data['results']]
+        self.assertEqual(titles, [self.note_data['title']] + [f'note {number}' for number in range(11)] + ['added'])
 
     def test_get_specific_note(self):
         """Test retrieve specific notes"""
@@ -63,6 +113,203 @@ class ImageTranslationTestCase(APITestCase):
             ['created', 'title', 'img', 'img_name', 'ascii_text', 'braille_format', 'braille_binary', 'user']
             , list(processed_data[0]['fields'].keys()))
         self.assertEqual(len(processed_data), 1)
+        self.assertEqual(processed_data[0]['fields']['ascii_text'], self.note_data['ascii_text'])
+        self.assertEqual(processed_data[0]['fields']['braille_binary'], self.note_data['braille_binary'])
+
+    def test_get_note_braille_bin(self):
+        """Test retrieve a note's braille packed one byte per cell"""
+        note_id = self.note_data['id']
+        response = self.client.get(f'/notes/{note_id}/braille.bin')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        binary = self.note_data['braille_binary']
+        self.assertEqual(response.content, bytes(int(binary[i:i + 6], 2) for i in range(0, len(binary), 6)))
+        self.assertEqual(len(response.content), len(self.note_data['braille_format']))
+
+    def test_get_note_braille_bin_other_user(self):
+        """Test other users' notes are not found when reading packed braille"""
+        other_note = Note.objects.create(title='other', user=User.objects.create(username='other_user'))
+        response = self.client.get(f'/notes/{other_note.id}/braille.bin')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/notes/9999/braille.bin', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_hot_endpoints_single_query(self):
+        """Test reading notes takes one query once the user is cached, and none once the notes are too"""
+        note_id = self.note_data['id']
+        self.client.get(f'/notes/{note_id}/braille.bin')
+        for url in (self.view_all_notes_url, f'/notes/{note_id}/', f'/notes/{note_id}/braille.bin'):
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for url in (self.view_all_notes_url, f'/notes/{note_id}/'):
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_notes_cache_invalidated(self):
+        """Test cached notes are dropped when a note is added, edited or deleted"""
+        note_id = self.note_data['id']
+        self.client.get(self.view_all_notes_url)
+        self.client.get(f'/notes/{note_id}/')
+        self.client.put(f'/notes/{note_id}/edit', {'title': 'new_title'})
+        self.assertEqual(json.loads(self.client.get(f'/notes/{note_id}/').data)[0]['fields']['title'], 'new_title')
+        self.assertEqual(self.client.get(self.view_all_notes_url).data['results'][0]['title'], 'new_title')
+
+        self.client.post(self.translation_url, {"img": open(self.tst_img, "rb")})
+        self.assertEqual(len(self.client.get(self.view_all_notes_url).data['results']), 2)
+        self.client.delete(f'/notes/{note_id}/delete')
+        self.assertEqual(len(self.client.get(self.view_all_notes_url).data['results']), 1)
+        self.assertEqual(self.client.get(f'/notes/{note_id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_notes_cache_stats(self):
+        """Test cache hits and misses are counted, and only shown to admins"""
+        self.assertEqual(self.client.get(reverse('notes_cache_stats')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.get(self.view_all_notes_url)
+        self.client.get(self.view_all_notes_url)
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        response = self.client.get(reverse('notes_cache_stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['hits'], response.data['misses'], response.data['hit_ratio']), (1, 1, 0.5))
+
+    def test_note_conditional_get(self):
+        """Test a client holding a note's current version gets 304 without its text being read"""
+        note_url = f'/notes/{self.note_data["id"]}/'
+        response = self.client.get(note_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(note_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 0)
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(note_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('vibraille_notecontent', queries[0]['sql'])
+        response = self.client.get(note_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(f'{note_url}braille.bin', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.put(f'{note_url}edit', {'title': 'new_title'})
+        response = self.client.get(note_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(Note.objects.get(id=self.note_data['id']).version, 2)
+
+    def test_notes_list_conditional_get(self):
+        """Test a client holding the current page of notes gets 304, and a new one once the page changes"""
+        list_url = self.view_all_notes_url + '?fields=id,ascii_text'
+        etag = self.client.get(list_url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(any('vibraille_notecontent' in query['sql'] for query in queries))
+
+        other_etag = self.client.get(self.view_all_notes_url)['ETag']
+        self.assertNotEqual(other_etag, etag)
+        Note.objects.create(user=self.test_user, title='added')
+        response = self.client.get(self.view_all_notes_url, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.delete(f'/notes/{self.note_data["id"]}/delete')
+        response = self.client.get(self.view_all_notes_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([note['title'] for note in response.data['results']], ['added'])
+
+    def test_other_users_notes_not_found(self):
+        """Test other users' notes cannot be read, edited or deleted"""
+        other_note = Note.objects.create(title='other', user=User.objects.create(username='other_user'))
+        self.assertEqual(self.client.get(f'/notes/{other_note.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.put(f'/notes/{other_note.id}/edit', {'title': 'mine now'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(f'/notes/{other_note.id}/delete')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Note.objects.get(id=other_note.id).title, 'other')
+
+    def test_stream_note_braille(self):
+        """Test stream a note's braille in fixed-size frames"""
+        note_id = self.note_data['id']
+        response = self.client.get(f'/notes/{note_id}/braille/stream?frame=16')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        frames = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(frames[-1], {'done': True, 'frames': len(frames) - 1, 'cells': len(self.note_data['braille_format'])})
+        cell_frames = frames[:-1]
+        self.assertEqual([frame['seq'] for frame in cell_frames], list(range(len(cell_frames))))
+        self.assertTrue(all(len(frame['cells']) == 16 for frame in cell_frames[:-1]))
+        self.assertEqual(''.join(frame['cells'] for frame in cell_frames), self.note_data['braille_format'])
+        self.assertEqual(''.join(frame['binary'] for frame in cell_frames), self.note_data['braille_binary'])
+
+    def test_stream_note_braille_events(self):
+        """Test stream a note's braille as server-sent events"""
+        note_id = self.note_data['id']
+        response = self.client.get(f'/notes/{note_id}/braille/stream', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = b''.join(response.streaming_content).decode('utf-8').strip().split('\n\n')
+        self.assertTrue(events[0].startswith('event: cells\ndata: '))
+        self.assertTrue(events[-1].startswith('event: done\ndata: '))
+
+    def test_stream_grade_2_note(self):
+        """Test words split across stream windows are still contracted whole"""
+        note = Note.objects.create(user=self.test_user, title='contracted', braille_grade=2)
+        NoteContent.objects.create(note=note, ascii_text='the people reading ' * 40)
+        response = self.client.get(f'/notes/{note.id}/braille/stream?frame=5')
+        frames = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(''.join(frame['cells'] for frame in frames[:-1]), '⠮⠀⠏⠀⠗⠂⠙⠬⠀' * 40)
+
+    def test_stream_grade_2_numbers(self):
+        """Test numbers, and letters straight after them, split across stream windows match the stored braille"""
+        text = 'abc 1999 x in 12 bed, 3.14 and 2b or 1,000. ' * 8
+        note = Note.objects.create(user=self.test_user, title='numbers', braille_grade=2)
+        NoteContent.objects.create(note=note, ascii_text=text)
+        braille_format, braille_binary = grade2_encoder.encode(text)
+        for frame_size in (4, 5, 6, 7):
+            response = self.client.get(f'/notes/{note.id}/braille/stream?frame={frame_size}')
+            frames = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+            self.assertEqual(''.join(frame['cells'] for frame in frames[:-1]), braille_format, frame_size)
+            self.assertEqual(''.join(frame['binary'] for frame in frames[:-1]), braille_binary, frame_size)
+
+    def test_compact_formats(self):
+        """Test notes can be fetched as MessagePack or CBOR, holding the same data as the JSON responses"""
+        note_url = f'/notes/{self.note_data["id"]}/'
+        list_url = self.view_all_notes_url + '?fields=id,title,ascii_text,braille_format'
+        json_list = json.loads(self.client.get(list_url).content)
+        json_note = self.client.get(note_url)
+        for media_type, decode in (('application/msgpack', msgpack.unpackb), ('application/cbor', cbor2.loads)):
+            response = self.client.get(list_url, HTTP_ACCEPT=media_type)
+            self.assertEqual(response['Content-Type'], media_type)
+            self.assertEqual(decode(response.content), json_list)
+            response = self.client.get(note_url, HTTP_ACCEPT=media_type)
+            self.assertEqual(decode(response.content)[0]['fields']['title'], self.note_data['title'])
+            self.assertNotEqual(response['ETag'], json_note['ETag'])
+            response = self.client.get(note_url, HTTP_ACCEPT=media_type, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(note_url, HTTP_IF_NONE_MATCH=json_note['ETag'], HTTP_ACCEPT='application/cbor')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=300)
+    def test_compressed_responses(self):
+        """Test large responses are compressed with brotli where accepted and gzip otherwise, and streams never are"""
+        list_url = self.view_all_notes_url + '?fields=id,ascii_text,braille_format,braille_binary'
+        plain = self.client.get(list_url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = self.client.get(list_url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(list_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(self.view_all_notes_url, HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(f'/notes/{self.note_data["id"]}/braille/stream', HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
 
     def test_get_edit_note(self):
         """Test retrieve specific notes"""
@@ -79,8 +326,8 @@ class ImageTranslationTestCase(APITestCase):
         note_id = self.note_data['id']
         response = self.client.delete(f'/notes/{note_id}/delete')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        follow_response = json.loads(self.client.get(self.view_all_notes_url).data)
-        self.assertEqual(len(follow_response), 0)
+        follow_response = self.client.get(self.view_all_notes_url).data
+        self.assertEqual(len(follow_response['results']), 0)
 
     def test_invalid_method_get_all(self):
         """Test invalid HTTP method calls."""
@@ -168,3 +415,77 @@ class ImageTranslationTestCase(APITestCase):
             str(response.data['detail']),
             'Method "POST" not allowed.',
         )
+
+
+class NoteContentMigrationTestCase(TransactionTestCase):
+    before = [('vibraille', '0007_note_user_created_index')]
+    after = [('vibraille', '0008_note_content')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_content_moved_out_of_notes(self):
+        """Test existing notes keep their text and braille when it moves to NoteContent, and get it back on rollback"""
+        old_apps = self._migrate(self.before)
+        old_note = old_apps.get_model('vibraille', 'Note').objects.create(
+            title='old', ascii_text='ab', braille_format='⠁⠃', braille_binary='100000110000', braille_packed=b'\x20\x30'
+        )
+        empty_note = old_apps.get_model('vibraille', 'Note').objects.create(title='empty')
+
+        new_apps = self._migrate(self.after)
+        contents = new_apps.get_model('vibraille', 'NoteContent').objects
+        self.assertEqual(
+            contents.filter(note_id=old_note.id).values_list('ascii_text', 'braille_format', 'braille_binary').get(),
+            ('ab', '⠁⠃', '100000110000')
+        )
+        self.assertEqual(bytes(contents.get(note_id=old_note.id).braille_packed), b'\x20\x30')
+        self.assertEqual(contents.get(note_id=empty_note.id).ascii_text, '')
+
+        old_apps = self._migrate(self.before)
+        self.assertEqual(old_apps.get_model('vibraille', 'Note').objects.get(id=old_note.id).braille_binary, '100000110000')
+
+
+class ReencodeWithCellsMigrationTestCase(TransactionTestCase):
+    before = [('vibraille', '0010_note_versions')]
+    after = [('vibraille', '0011_reencode_with_cells')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_with_cells_reencoded(self):
+        """Test notes and pages holding the ')' cell get its own bits and a new version, and others are left alone"""
+        old_apps = self._migrate(self.before)
+        Note = old_apps.get_model('vibraille', 'Note')
+        with_note, plain_note = Note.objects.create(title='with'), Note.objects.create(title='plain')
+        # ⠾⠁ as written before: ')' with the bits of '('
+        old_apps.get_model('vibraille', 'NoteContent').objects.create(
+            note=with_note, braille_format='⠾⠁', braille_binary='111011100000', braille_packed=b'\x3b\x20'
+        )
+        old_apps.get_model('vibraille', 'NotePage').objects.create(
+            note=with_note, number=1, braille_format='⠾', braille_binary='111011', braille_packed=b'\x3b'
+        )
+        old_apps.get_model('vibraille', 'NoteContent').objects.create(
+            note=plain_note, braille_format='⠷', braille_binary='111011', braille_packed=b'\x3b'
+        )
+
+        new_apps = self._migrate(self.after)
+        content = new_apps.get_model('vibraille', 'NoteContent').objects.get(note_id=with_note.id)
+        self.assertEqual((content.braille_binary, bytes(content.braille_packed)), ('011111100000', b'\x1f\x20'))
+        page = new_apps.get_model('vibraille', 'NotePage').objects.get(note_id=with_note.id)
+        self.assertEqual((page.braille_binary, bytes(page.braille_packed)), ('011111', b'\x1f'))
+        plain = new_apps.get_model('vibraille', 'NoteContent').objects.get(note_id=plain_note.id)
+        self.assertEqual((plain.braille_binary, bytes(plain.braille_packed)), ('111011', b'\x3b'))
+        versions = dict(new_apps.get_model('vibraille', 'Note').objects.values_list('id', 'version'))
+        self.assertEqual((versions[with_note.id], versions[plain_note.id]), (2, 1))
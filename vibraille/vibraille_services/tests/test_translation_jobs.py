@@ -0,0 +1,228 @@
+from datetime import timedelta
+from io import StringIO
+import io
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from PIL import Image
+
+from vibraille.vibraille_services.ocr_backends import iter_text_detection_pages, wait_for_text_detection
+from vibraille.vibraille_services.models import Note, User, TranslationJob
+from vibraille.vibraille_services.translation_jobs import claim_translation_job, run_translation_job
+from vibraille.vibraille_services.tests.fakes import IMAGE_TEST_TEXT, FakeAWS, FakeTextract
+
+
+def _run_inline(job, b_process, img):
+    run_translation_job(job.id, b_process, img)
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+@mock.patch('vibraille.vibraille_services.serializers.submit_translation_job', side_effect=_run_inline)
+@override_settings(S3_ARCHIVE_WORKERS=0)
+class TranslationJobTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.signup_url = reverse('register')
+        self.login_url = reverse('login')
+        self.translation_url = reverse('translate_img')
+
+        # Create user for tests
+        self.client.post(self.signup_url, self.reg_info)
+        self.test_user = User.objects.get(username=self.reg_info['username'])
+        response = self.client.post(
+            self.login_url,
+            {'username': self.test_user.username, 'password': self.reg_info['password']}
+        )
+        self.access_token = response.data['access']
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.access_token)
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def test_async_translation(self, _submit, _sleep):
+        """Test async translation is accepted right away and reports its Note once done."""
+        aws = FakeAWS()
+        with aws.install():
+            response = self.client.post(self.translation_url + '?async=true', {
+                "img": open(self.tst_img, "rb")
+            })
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['status_url'].endswith(f"/notes/jobs/{response.data['job_id']}/"))
+
+        job_response = self.client.get(response.data['status_url'])
+        self.assertEqual(job_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(job_response.data['status'], TranslationJob.SUCCEEDED)
+        self.assertEqual(job_response.data['stage'], 'done')
+        self.assertEqual(job_response.data['note']['user'], self.test_user.id)
+        self.assertEqual(job_response.data['note']['img_name'], 'image_test.jpg')
+        self.assertEqual(
+            job_response.data['note']['braille_format'],
+            '⠧⠀⠂⠂⠀⠍⠁⠗⠉⠓⠀⠒⠎⠀⠛⠙⠀⠇⠁⠺⠀⠓⠕⠺⠀⠁⠃⠕⠥⠞⠀⠏⠑⠕⠏⠇⠑⠀⠃⠑⠊⠀⠉⠁⠗⠞⠕⠕⠝⠊⠵⠑⠙⠹⠀⠎⠑⠑⠀⠏⠁⠛⠑⠀⠒⠂'
+        )
+        [(_bucket, key)] = aws.s3.objects
+        self.assertTrue(key.endswith('/image_test.jpg'))
+
+    def test_failed_translation_job(self, _submit, _sleep):
+        """Test a failed Textract job is reported on the job rather than raised."""
+        aws = FakeAWS(textract=FakeTextract(final_status='FAILED'))
+        with aws.install(), override_settings(TEXTRACT_SYNC_ENABLED=False):
+            response = self.client.post(self.translation_url, {
+                "img": open(self.tst_img, "rb")
+            }, HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job_response = self.client.get(response.data['status_url'])
+        self.assertEqual(job_response.data['status'], TranslationJob.FAILED)
+        self.assertIsNone(job_response.data['note'])
+
+    def test_failed_document_removes_note(self, _submit, _sleep):
+        """Test a document job that fails part way leaves no incomplete Note behind."""
+        with Image.open(self.tst_img) as tst_img:
+            buffer = io.BytesIO()
+            tst_img.convert('L').save(buffer, format='PDF')
+        aws = FakeAWS(textract=FakeTextract(final_status='FAILED'))
+        with aws.install():
+            response = self.client.post(self.translation_url + '?async=true', {
+                "img": SimpleUploadedFile('chapter.pdf', buffer.getvalue())
+            })
+        job_response = self.client.get(response.data['status_url'])
+        self.assertEqual(job_response.data['status'], TranslationJob.FAILED)
+        self.assertIsNone(job_response.data['note'])
+        self.assertFalse(Note.objects.exists())
+
+    def test_job_belongs_to_user(self, _submit, _sleep):
+        """Test jobs cannot be read by other users."""
+        other_user = User.objects.create(username='other_user')
+        job = TranslationJob.objects.create(user=other_user, img_name='image_test.jpg')
+        response = self.client.get(reverse('view_translation_job', args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+@override_settings(TRANSLATION_JOB_QUEUE='database', S3_ARCHIVE_WORKERS=0)
+class DatabaseQueueTestCase(APITestCase):
+
+    def setUp(self):
+        self.reg_info = {
+            'username': 'test_user',
+            'password': 'test_Pass',
+            'phone_number': '+1(123)456-7890',
+            'email': 'test_user@test.com'
+        }
+        self.client = APIClient()
+        self.client.post(reverse('register'), self.reg_info)
+        self.test_user = User.objects.get(username=self.reg_info['username'])
+        response = self.client.post(
+            reverse('login'),
+            {'username': self.reg_info['username'], 'password': self.reg_info['password']}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.translation_url = reverse('translate_img')
+        self.tst_img = "./vibraille/vibraille_services/tests/image_test.jpg"
+        caches[settings.TRANSLATION_CACHE_ALIAS].clear()
+
+    def _queue_job(self, **data):
+        response = self.client.post(self.translation_url + '?async=true', {"img": open(self.tst_img, "rb"), **data})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return TranslationJob.objects.get(id=response.data['job_id'])
+
+    def _run_workers(self):
+        call_command('run_translation_workers', workers=0, burst=True, stdout=StringIO(), stderr=StringIO())
+
+    def test_worker_processes_queued_job(self, _sleep):
+        """Test queued jobs wait in the database until a worker writes their Note."""
+        job = self._queue_job(grade=2)
+        self.assertEqual(job.status, TranslationJob.PENDING)
+        with open(self.tst_img, "rb") as tst_img:
+            self.assertEqual(bytes(job.payload), tst_img.read())
+
+        with FakeAWS().install():
+            self._run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranslationJob.SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(bytes(job.payload), b'')
+        self.assertEqual(job.note.user, self.test_user)
+        self.assertEqual(job.note.braille_grade, 2)
+        self.assertEqual(job.note.content.ascii_text, IMAGE_TEST_TEXT)
+
+    @override_settings(TRANSLATION_JOB_MAX_ATTEMPTS=2, TEXTRACT_SYNC_ENABLED=False)
+    def test_failed_job_retried_with_backoff(self, _sleep):
+        """Test failed jobs are retried later, then marked failed once out of attempts."""
+        job = self._queue_job()
+        aws = FakeAWS(textract=FakeTextract(final_status='FAILED'))
+        with aws.install():
+            self._run_workers()
+            job.refresh_from_db()
+            self.assertEqual(job.status, TranslationJob.PENDING)
+            self.assertEqual(job.stage, 'retrying')
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(job.next_attempt_at, timezone.now())
+
+            # Not due yet, so the worker leaves it alone.
+            self._run_workers()
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, 1)
+
+            TranslationJob.objects.filter(id=job.id).update(next_attempt_at=timezone.now())
+            self._run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranslationJob.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(bytes(job.payload), b'')
+
+    def test_job_claimed_once(self, _sleep):
+        """Test a job goes to one worker, and to another only once the first one's lock goes stale."""
+        job = self._queue_job()
+        self.assertEqual(claim_translation_job('worker-a').id, job.id)
+        self.assertIsNone(claim_translation_job('worker-b'))
+
+        stale = timezone.now() - timedelta(seconds=settings.TRANSLATION_JOB_LOCK_TIMEOUT + 1)
+        TranslationJob.objects.filter(id=job.id).update(locked_at=stale)
+        reclaimed = claim_translation_job('worker-b')
+        self.assertEqual(reclaimed.locked_by, 'worker-b')
+        self.assertEqual(reclaimed.attempts, 2)
+
+
+@mock.patch('vibraille.vibraille_services.ocr_backends.time.sleep')
+class TextractPollingTestCase(APITestCase):
+
+    @override_settings(TEXTRACT_POLL_INITIAL_DELAY=0.5, TEXTRACT_POLL_MAX_DELAY=4.0, TEXTRACT_POLL_TIMEOUT=60.0)
+    def test_polling_backs_off(self, sleep):
+        """Test status polls back off exponentially up to the max delay."""
+        textract = FakeTextract(polls_until_done=6)
+        jobid = textract.start_document_text_detection(DocumentLocation={})['JobId']
+        wait_for_text_detection(textract, jobid)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0, 2.0, 4.0, 4.0])
+
+    def test_result_pages_fetched_as_needed(self, sleep):
+        """Test a page is handed over before the next page of results is requested."""
+        textract = FakeTextract(pages=[['a'], ['b'], ['c']], polls_until_done=1, max_results=3)
+        jobid = textract.start_document_text_detection(DocumentLocation={})['JobId']
+        pages = iter_text_detection_pages(textract, jobid, wait_for_text_detection(textract, jobid))
+        self.assertEqual(next(pages), (1, 'a'))
+        self.assertEqual(textract.calls.count('get_document_text_detection'), 1)
+        self.assertEqual(list(pages), [(2, 'b'), (3, 'c')])
+        self.assertEqual(textract.calls.count('get_document_text_detection'), 2)
+
+    @override_settings(TEXTRACT_POLL_TIMEOUT=0.0)
+    def test_polling_deadline(self, sleep):
+        """Test polling gives up once the deadline passes."""
+        textract = FakeTextract(polls_until_done=1000)
+        jobid = textract.start_document_text_detection(DocumentLocation={})['JobId']
+        with self.assertRaises(Exception):
+            wait_for_text_detection(textract, jobid)
+        sleep.assert_not_called()
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _translation_cache():
+    return caches[settings.TRANSLATION_CACHE_ALIAS]
+
+
+def _cache_key(img_hash):
+    # Different OCR engines read the same image differently, so each keeps its own entries.
+    return f"translation:{settings.OCR_BACKEND.rsplit('.', 1)[-1]}:{img_hash}"
+
+
+def get_cached_translation(img_hash):
+    """Returns the cached OCR text and braille for an image's SHA-256, or None."""
+    if not img_hash:
+        return None
+    return _translation_cache().get(_cache_key(img_hash))
+
+
+def cache_translation(img_hash, ascii_text, braille_format, braille_binary):
+    """Caches the OCR text and braille read from an image under its SHA-256."""
+    if not img_hash:
+        return
+    _translation_cache().set(_cache_key(img_hash), {
+        'ascii_text': ascii_text,
+        'braille_format': braille_format,
+        'braille_binary': braille_binary,
+    })
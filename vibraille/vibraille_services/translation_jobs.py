@@ -0,0 +1,364 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+import threading
+import time
+from rest_framework import serializers
+from .braille_utils import BrailleTranslator, braille_encoder, pack_binary
+from .db_routers import pin_user_to_primary
+from .models import Note, NoteContent, NotePage, TranslationJob
+from .notes_cache import invalidate_user_notes
+from .translation_cache import cache_translation
+
+
+logger = logging.getLogger(__name__)
+
+# TRANSLATION_JOB_QUEUE value that leaves jobs in the database for the worker processes
+DATABASE_QUEUE = 'database'
+
+_executor = None
+_batch_executor = None
+_executor_lock = threading.Lock()
+
+
+def build_note(b_process, img, user, report_stage=None):
+    """Runs the image to braille pipeline and returns the resulting Note, unsaved, with its unsaved content."""
+    def _stage(stage, **fields):
+        if report_stage:
+            report_stage(stage, **fields)
+
+    if b_process.is_document:
+        raise Exception("PDF and TIFF documents are translated page by page, one per request.")
+    new_note = Note()
+    new_note.title = img.name
+    new_note.img = img
+    new_note.img_name = img.name
+    new_note.content = content = NoteContent()
+    with b_process.timed('cache_lookup'):
+        cached = b_process.find_cached_translation()
+    new_note.braille_grade = b_process.grade
+    if cached and b_process.grade == 1:
+        content.ascii_text = cached['ascii_text']
+        content.braille_format = cached['braille_format']
+        content.braille_binary = cached['braille_binary']
+        content.braille_packed = pack_binary(cached['braille_binary'])
+    elif cached:
+        # The cache holds the OCR text with its grade 1 braille, so other grades are encoded again.
+        b_process.conv_str = content.ascii_text = cached['ascii_text']
+        with b_process.timed('encoding'):
+            content.braille_format, content.braille_binary, content.braille_packed = \
+                b_process.convert_to_braille_formats()
+    else:
+        _stage('preprocessing')
+        with b_process.timed('preprocessing'):
+            b_process.preprocess_img()
+        _stage('uploading')
+        with b_process.timed('uploading'):
+            b_process.prepare_ocr_source()
+        _stage('detecting_text')
+        with b_process.timed('detecting_text'):
+            content.ascii_text = b_process.convert_img_to_str(
+                on_job_started=lambda jobid: _stage('detecting_text', textract_job_id=jobid)
+            )
+        _stage('encoding')
+        with b_process.timed('encoding'):
+            content.braille_format, content.braille_binary, content.braille_packed = \
+                b_process.convert_to_braille_formats()
+        if b_process.grade == 1:
+            cache_translation(b_process.img_hash, content.ascii_text, content.braille_format, content.braille_binary)
+        else:
+            cache_translation(b_process.img_hash, content.ascii_text, *braille_encoder.encode(content.ascii_text))
+    new_note.user = user
+    return new_note
+
+
+def translate_image_to_note(b_process, img, user, report_stage=None):
+    """Runs the full image to braille pipeline and saves the resulting Note."""
+    if b_process.is_document:
+        return translate_document_to_note(b_process, img, user, report_stage=report_stage)
+    try:
+        new_note = build_note(b_process, img, user, report_stage=report_stage)
+        with b_process.timed('saving'):
+            save_notes([new_note])
+    finally:
+        b_process.close()
+    _log_timings(img, b_process)
+    return new_note
+
+
+def translate_document_to_note(b_process, img, user, report_stage=None):
+    """Translates a PDF or TIFF, saving each page's braille as a NotePage as soon as the page is read.
+
+    The Note is saved before any page is read, and reported to ``report_stage`` with the first stage,
+    so clients can follow its pages while later ones are still being read. Once every page is in,
+    the Note gets the whole document's text and braille and is marked complete. If reading fails
+    part way, the incomplete Note is removed again.
+    """
+    def _stage(stage, **fields):
+        if report_stage:
+            report_stage(stage, **fields)
+
+    def _page_count(count):
+        Note.objects.filter(id=new_note.id).update(
+            page_count=count, version=F('version') + 1, updated=timezone.now()
+        )
+        invalidate_user_notes(new_note.user_id)
+        pin_user_to_primary(new_note.user_id)
+
+    new_note = Note(
+        title=img.name, img=img, img_name=img.name, user=user, braille_grade=b_process.grade,
+        page_count=0, complete=False
+    )
+    new_note.content = content = NoteContent()
+    try:
+        save_notes([new_note])
+        _stage('uploading', note=new_note)
+        with b_process.timed('uploading'):
+            b_process.prepare_ocr_source()
+        _stage('detecting_text')
+        page_texts = {}
+        with b_process.timed('detecting_text'):
+            for number, text in b_process.convert_document_to_pages(
+                on_job_started=lambda jobid: _stage('detecting_text', textract_job_id=jobid),
+                on_page_count=_page_count
+            ):
+                braille_format, braille_binary, braille_packed = b_process.encoder.encode_all(text)
+                NotePage.objects.create(
+                    note=new_note, number=number, ascii_text=text, braille_format=braille_format,
+                    braille_binary=braille_binary, braille_packed=braille_packed
+                )
+                page_texts[number] = text
+        _stage('encoding')
+        with b_process.timed('encoding'):
+            b_process.conv_str = content.ascii_text = " ".join(
+                page_texts[number] for number in sorted(page_texts) if page_texts[number]
+            )
+            content.braille_format, content.braille_binary, content.braille_packed = \
+                b_process.convert_to_braille_formats()
+        new_note.page_count = len(page_texts)
+        new_note.complete = True
+        with b_process.timed('saving'), transaction.atomic():
+            content.save()
+            new_note.save_changes('page_count', 'complete')
+    except Exception:
+        if new_note.pk:
+            new_note.delete()
+        raise
+    finally:
+        b_process.close()
+    _log_timings(img, b_process)
+    return new_note
+
+
+def translate_images_to_notes(images, user, grade=1):
+    """Translates a batch of images concurrently and saves their Notes together.
+
+    Returns a (note, error) pair per image, in the order the images were given: the saved Note
+    and None, or None and the reason that image could not be translated.
+    """
+    futures = [_get_batch_executor().submit(_build_batch_note, img, user, grade) for img in images]
+    results = [future.result() for future in futures]
+    saved = iter(save_notes([note for note, _error in results if note is not None]))
+    return [(next(saved) if note is not None else None, error) for note, error in results]
+
+
+def save_notes(notes):
+    """Saves Notes made by build_note together with their content, all or nothing.
+
+    Where the database hands back the ids of bulk inserted rows, the Notes and then their content
+    go in one bulk insert each; otherwise (MySQL) each Note is saved on its own to learn its id.
+    """
+    with transaction.atomic():
+        if connections[router.db_for_write(Note)].features.can_return_rows_from_bulk_insert:
+            Note.objects.bulk_create(notes)
+        else:
+            for note in notes:
+                note.save()
+        contents = []
+        for note in notes:
+            # Reassigned so the content picks up the id its Note was just given.
+            note.content.note = note
+            contents.append(note.content)
+        NoteContent.objects.bulk_create(contents)
+        # Bulk inserts send no post_save signals, so the cached notes lists are dropped, and the owners pinned, here.
+        for user_id in {note.user_id for note in notes}:
+            invalidate_user_notes(user_id)
+            pin_user_to_primary(user_id)
+    return notes
+
+
+def _build_batch_note(img, user, grade):
+    b_process = None
+    try:
+        serializers.ImageField().run_validation(img)
+        b_process = BrailleTranslator(img, grade=grade)
+        note = build_note(b_process, img, user)
+    except serializers.ValidationError as e:
+        return None, " ".join(str(detail) for detail in e.detail)
+    except Exception as e:
+        return None, str(e)
+    finally:
+        if b_process:
+            b_process.close()
+        # The translation cache may be database-backed, and pool threads outlive the request.
+        connections.close_all()
+    _log_timings(img, b_process)
+    return note, None
+
+
+def _log_timings(img, b_process):
+    logger.info(
+        "Translated %s: %s", img.name,
+        ", ".join(f"{stage} {duration:.1f}ms" for stage, duration in b_process.timings.items())
+    )
+
+
+def run_translation_job(job_id, b_process, img):
+    """Processes a queued translation job, recording its progress as it goes."""
+    job = TranslationJob.objects.get(id=job_id)
+
+    def _report_stage(stage, **fields):
+        TranslationJob.objects.filter(id=job_id).update(stage=stage, **fields)
+
+    TranslationJob.objects.filter(id=job_id).update(status=TranslationJob.RUNNING)
+    try:
+        note = translate_image_to_note(b_process, img, job.user, report_stage=_report_stage)
+    except Exception as e:
+        TranslationJob.objects.filter(id=job_id).update(status=TranslationJob.FAILED, stage='failed', error=str(e))
+        return None
+    TranslationJob.objects.filter(id=job_id).update(status=TranslationJob.SUCCEEDED, stage='done', note=note)
+    return note
+
+
+def _run_in_worker(job_id, b_process, img):
+    try:
+        run_translation_job(job_id, b_process, img)
+    finally:
+        # Worker threads outlive the request, so they must not keep their DB connections open.
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TRANSLATION_JOB_WORKERS,
+                thread_name_prefix='translation-job'
+            )
+        return _executor
+
+
+def _get_batch_executor():
+    global _batch_executor
+    with _executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=settings.TRANSLATION_BATCH_WORKERS,
+                thread_name_prefix='translation-batch'
+            )
+        return _batch_executor
+
+
+def submit_translation_job(job, b_process, img):
+    """Hands a translation job to the background workers.
+
+    With TRANSLATION_JOB_QUEUE set to 'database' the image is stored on the job for
+    `manage.py run_translation_workers` to pick up; otherwise it runs on this process's thread pool.
+    """
+    if settings.TRANSLATION_JOB_QUEUE != DATABASE_QUEUE:
+        _get_executor().submit(_run_in_worker, job.id, b_process, img)
+        return
+    try:
+        img.seek(0)
+        job.payload = img.read()
+    finally:
+        b_process.close()
+    job.grade = b_process.grade
+    job.next_attempt_at = timezone.now()
+    job.save(update_fields=['payload', 'grade', 'next_attempt_at', 'updated'])
+
+
+def claim_translation_job(worker_id):
+    """Locks the next job that is due for ``worker_id``, or returns None if there is none.
+
+    Jobs are picked with SELECT ... FOR UPDATE SKIP LOCKED, so workers on any number of nodes never
+    wait on each other, and claimed by a conditional update, so databases without row locks still
+    hand each job to one worker only. Jobs whose worker stopped reporting are claimed again once
+    their lock is TRANSLATION_JOB_LOCK_TIMEOUT seconds old.
+    """
+    now = timezone.now()
+    due = Q(status=TranslationJob.PENDING, next_attempt_at__lte=now) | Q(
+        status=TranslationJob.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TRANSLATION_JOB_LOCK_TIMEOUT)
+    )
+    with transaction.atomic():
+        job = TranslationJob.objects.select_for_update(skip_locked=True).filter(due).exclude(
+            payload=b''
+        ).order_by('next_attempt_at').only('id', 'status', 'locked_at', 'attempts').first()
+        if job is None:
+            return None
+        claimed = TranslationJob.objects.filter(id=job.id, status=job.status, locked_at=job.locked_at).update(
+            status=TranslationJob.RUNNING, stage='claimed', locked_by=worker_id, locked_at=now,
+            attempts=F('attempts') + 1, updated=now
+        )
+    if not claimed:
+        return None
+    return TranslationJob.objects.select_related('user').get(id=job.id)
+
+
+def process_translation_job(job):
+    """Runs a claimed job, retrying it with exponential backoff until it runs out of attempts."""
+    def _report_stage(stage, **fields):
+        TranslationJob.objects.filter(id=job.id).update(stage=stage, updated=timezone.now(), **fields)
+
+    img = ContentFile(bytes(job.payload), name=job.img_name)
+    try:
+        b_process = BrailleTranslator(img, grade=job.grade)
+        note = translate_image_to_note(b_process, img, job.user, report_stage=_report_stage)
+    except Exception as e:
+        if job.attempts < settings.TRANSLATION_JOB_MAX_ATTEMPTS:
+            delay = min(
+                settings.TRANSLATION_JOB_RETRY_DELAY * 2 ** (job.attempts - 1), settings.TRANSLATION_JOB_RETRY_MAX_DELAY
+            )
+            TranslationJob.objects.filter(id=job.id).update(
+                status=TranslationJob.PENDING, stage='retrying', error=str(e), locked_by='', locked_at=None,
+                next_attempt_at=timezone.now() + timedelta(seconds=delay), updated=timezone.now()
+            )
+        else:
+            TranslationJob.objects.filter(id=job.id).update(
+                status=TranslationJob.FAILED, stage='failed', error=str(e), payload=b'', locked_by='',
+                locked_at=None, updated=timezone.now()
+            )
+        return None
+    TranslationJob.objects.filter(id=job.id).update(
+        status=TranslationJob.SUCCEEDED, stage='done', note=note, error='', payload=b'', locked_by='', locked_at=None,
+        updated=timezone.now()
+    )
+    return note
+
+
+def run_translation_worker(worker_id, poll_interval=1.0, burst=False, should_stop=None):
+    """Claims and processes jobs until ``should_stop()`` is true, or the queue is empty with ``burst``."""
+    processed = 0
+    while not (should_stop and should_stop()):
+        close_old_connections()
+        try:
+            job = claim_translation_job(worker_id)
+        except DatabaseError:
+            # e.g. lock contention or a dropped connection; the job stays queued for the next claim.
+            logger.warning("Worker %s could not claim a job", worker_id, exc_info=True)
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        process_translation_job(job)
+        processed += 1
+    return processed
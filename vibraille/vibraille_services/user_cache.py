@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _user_cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def _cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id):
+    """Returns the cached User with this id, or None."""
+    return _user_cache().get(_cache_key(user_id))
+
+
+def cache_user(user):
+    """Caches a User for USER_CACHE_TTL seconds, so requests authenticated as them skip the database."""
+    _user_cache().set(_cache_key(user.pk), user, timeout=settings.USER_CACHE_TTL)
+
+
+def forget_cached_user(sender, **kwargs):
+    """Drops a User from the cache when they are saved or deleted, e.g. deactivated or renamed."""
+    _user_cache().delete(_cache_key(kwargs["instance"].pk))
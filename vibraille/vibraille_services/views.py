@@ -1,22 +1,120 @@
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from django.core import serializers as dj_serializer
-from django.http import Http404, HttpResponseForbidden, HttpResponseBadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from random import randint
+import hashlib
+import json
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import Note, VibrailleUser
+from .models import Note, NoteContent, VibrailleUser, TranslationJob, normalize_phone_number
+from .braille_stream import DEFAULT_FRAME_CELLS, MAX_FRAME_CELLS, stream_braille_frames
+from .db_routers import read_from_replica
+from .notes_cache import cache_notes, cached_notes_key, get_cached_notes, notes_cache_stats
+from .pagination import NoteCursorPagination
+from .renderers import STRUCTURED_RENDERERS, EventStreamRenderer, NDJSONRenderer, OctetStreamRenderer
 from .serializers import (
     VBTokenObtainPairSerializer,
     RegisterSerializer,
-    TranslationSerializer
+    TranslationSerializer,
+    TranslationJobSerializer,
+    BatchTranslationSerializer,
+    NoteListSerializer,
+    NotePageSerializer
 )
 
 
+# Note fields included in the JSON of the notes endpoints; braille_packed is served on its own by braille.bin
+NOTE_JSON_FIELDS = ('created', 'title', 'img', 'img_name', 'ascii_text', 'braille_format', 'braille_binary', 'user')
+NOTE_CONTENT_JSON_FIELDS = ('ascii_text', 'braille_format', 'braille_binary')
+
+
+def _serialize_notes(notes):
+    """Serializes Notes as Django's JSON serializer would, with their content's fields among the Note's own."""
+    serialized = dj_serializer.serialize('python', notes, fields=NOTE_JSON_FIELDS)
+    for note, data in zip(notes, serialized):
+        fields = {field: getattr(note.content, field) for field in NOTE_CONTENT_JSON_FIELDS}
+        fields.update(data['fields'])
+        data['fields'] = {field: fields[field] for field in NOTE_JSON_FIELDS}
+    return json.dumps(serialized, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _notes_data(request, notes_json):
+    """The notes' JSON text for JSON responses; MessagePack and CBOR responses carry the notes themselves."""
+    if isinstance(request.accepted_renderer, STRUCTURED_RENDERERS):
+        return json.loads(notes_json)
+    return notes_json
+
+
+def _get_user_note(request, note_id, queryset=Note.objects):
+    """Fetches one of the requesting user's notes in a single query; other users' notes are not found."""
+    return get_object_or_404(queryset, id=note_id, user_id=request.user.id)
+
+
+def _note_etag(note):
+    return quote_etag(f"{note.id}.{note.version}")
+
+
+def _page_etag(request, page, paginator):
+    """ETag of a page of notes: which notes are on it at which versions, and the links either side of it."""
+    versions = "|".join(f"{note.id}.{note.version}" for note in page)
+    page_state = f"{request.get_full_path()}|{paginator.get_next_link()}|{paginator.get_previous_link()}|{versions}"
+    return quote_etag(hashlib.sha1(page_state.encode('utf-8')).hexdigest())
+
+
+def _is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def _representation_etag(request, etag):
+    """Tells apart the ETags of the JSON, MessagePack and CBOR renderings of the same notes, as their bodies differ."""
+    if isinstance(request.accepted_renderer, STRUCTURED_RENDERERS):
+        return f'{etag[:-1]}-{request.accepted_renderer.format}"'
+    return etag
+
+
+def _with_validators(request, response, etag, last_modified=None):
+    """Sets the ETag (and Last-Modified) clients send back in If-None-Match (If-Modified-Since) next time."""
+    response['ETag'] = _representation_etag(request, etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Only the requesting user's client may keep a copy, and it has to check it is current before each use.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(request, etag, last_modified=None):
+    """Returns 304 Not Modified if the client's copy matches these validators, or None if it needs a new one."""
+    response = get_conditional_response(
+        request, etag=_representation_etag(request, etag),
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+    return _with_validators(request, response, etag, last_modified) if response else None
+
+
+def _conditional_note(request, note_id, queryset):
+    """Fetches one of the user's notes from ``queryset``, or returns 304 if the client already has its current version.
+
+    Conditional requests are answered from the note's version alone, before its text and braille are read.
+    """
+    if _is_conditional(request):
+        _note_version = _get_user_note(request, note_id, Note.objects.only('version', 'updated'))
+        not_modified = _not_modified(request, _note_etag(_note_version), _note_version.updated)
+        if not_modified:
+            return None, not_modified
+    return _get_user_note(request, note_id, queryset), None
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def api_root(request, format=None):
@@ -32,70 +130,209 @@ def api_root(request, format=None):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_all_notes(request):
-    """Get all notes associated with user."""
-    try:
-        active_user = User.objects.filter(username=request.user.username).first()
-        all_notes = dj_serializer.serialize('json', Note.objects.filter(user=active_user).all())
-        return Response(data=all_notes, status=status.HTTP_200_OK)
-    except Exception:
-        raise Http404("No notes found for this user.")
+    """Lists the user's notes oldest first, a page at a time, with only the fields named in ``?fields=``.
+
+    Pages carry an ETag, so clients holding the current page get 304 Not Modified before any text is read,
+    and are cached per user until one of their notes changes.
+    """
+    fields = NoteListSerializer.requested_fields(request.query_params.get('fields'))
+    cache_key = cached_notes_key(
+        request.user.id, 'list', hashlib.sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    )
+    cached = get_cached_notes(cache_key)
+    if cached:
+        return _not_modified(request, cached['etag']) or _with_validators(
+            request, Response(data=cached['data']), cached['etag']
+        )
+    columns = NoteListSerializer(fields=fields).columns
+    content_columns = [column[len('content__'):] for column in columns if column.startswith('content__')]
+    # created is always loaded, since the page's cursors are read from it, and version for the page's ETag.
+    user_notes = Note.objects.filter(user_id=request.user.id).only(
+        'created', 'version', *(column for column in columns if not column.startswith('content__'))
+    )
+    paginator = NoteCursorPagination()
+    page = paginator.paginate_queryset(user_notes, request)
+    # No Last-Modified: deleting a note changes the list without making anything on it newer.
+    etag = _page_etag(request, page, paginator)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    if content_columns:
+        prefetch_related_objects(page, Prefetch('content', queryset=NoteContent.objects.only('note', *content_columns)))
+    notes = NoteListSerializer(page, many=True, fields=fields, context={'request': request}).data
+    response = paginator.get_paginated_response(notes)
+    cache_notes(cache_key, {'data': response.data, 'etag': etag})
+    return _with_validators(request, response, etag)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def get_note_details(request, note_id):
-    """Gets details of a given note."""
-    active_user = User.objects.filter(username=request.user.username).first()
-    _target_note = get_object_or_404(Note, id=note_id)
-    if active_user == _target_note.user:
-        note_details = dj_serializer.serialize('json', [_target_note])
-        return Response(data=note_details, status=status.HTTP_200_OK)
+    """Gets details of a given note, cached per user until one of their notes changes."""
+    cache_key = cached_notes_key(request.user.id, 'detail', note_id)
+    cached = get_cached_notes(cache_key)
+    if cached is None:
+        _target_note, not_modified = _conditional_note(request, note_id, Note.objects.select_related('content'))
+        if not_modified:
+            return not_modified
+        cached = {
+            'data': _serialize_notes([_target_note]),
+            'etag': _note_etag(_target_note),
+            'updated': _target_note.updated
+        }
+        cache_notes(cache_key, cached)
     else:
-        raise HttpResponseForbidden("Note does not belong to user.")
+        not_modified = _not_modified(request, cached['etag'], cached['updated'])
+        if not_modified:
+            return not_modified
+    return _with_validators(
+        request, Response(data=_notes_data(request, cached['data']), status=status.HTTP_200_OK),
+        cached['etag'], cached['updated']
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([OctetStreamRenderer, JSONRenderer])
+@read_from_replica
+def get_note_braille_bin(request, note_id):
+    """Gets a note's braille as packed binary, one byte per cell."""
+    _target_note, not_modified = _conditional_note(
+        request, note_id, Note.objects.select_related('content').only('version', 'updated', 'content__braille_packed')
+    )
+    if not_modified:
+        return not_modified
+    return _with_validators(
+        request, HttpResponse(bytes(_target_note.content.braille_packed), content_type='application/octet-stream'),
+        _note_etag(_target_note), _target_note.updated
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def get_note_pages(request, note_id):
+    """Gets the pages of a PDF or TIFF note read so far, optionally only those after ``?after=<page>``."""
+    _target_note = _get_user_note(request, note_id, Note.objects.only('page_count', 'complete'))
+    try:
+        after = int(request.query_params.get('after', 0))
+    except ValueError:
+        return Response(data="after must be a page number.", status=status.HTTP_400_BAD_REQUEST)
+    # The note's state was read before its pages, so a note reported complete never misses its last pages.
+    pages = NotePageSerializer(_target_note.pages.filter(number__gt=after), many=True).data
+    return Response(data={
+        'complete': _target_note.complete,
+        'page_count': _target_note.page_count,
+        'pages': pages
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([NDJSONRenderer, EventStreamRenderer, JSONRenderer])
+@read_from_replica
+def stream_note_braille(request, note_id):
+    """Streams a note's braille cells in fixed-size frames, encoded as they are read."""
+    _get_user_note(request, note_id, Note.objects.only('id'))
+    try:
+        frame_size = int(request.query_params.get('frame', DEFAULT_FRAME_CELLS))
+    except ValueError:
+        return Response(data="Frame size must be a number of cells.", status=status.HTTP_400_BAD_REQUEST)
+    frame_size = min(max(frame_size, 1), MAX_FRAME_CELLS)
+    event_stream = request.accepted_renderer.media_type == EventStreamRenderer.media_type
+    # The frames are read once this view has returned, so they are sent to the database it reads from now.
+    using = router.db_for_read(NoteContent)
+    response = StreamingHttpResponse(
+        stream_braille_frames(note_id, frame_size, event_stream=event_stream, using=using),
+        content_type=EventStreamRenderer.media_type if event_stream else NDJSONRenderer.media_type
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies holding frames back until the whole note has been sent.
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def edit_note_details(request, note_id):
     """Edit details on a note (Title is the only updatable field."""
-    active_user = User.objects.filter(username=request.user.username).first()
-    _target_note = get_object_or_404(Note, id=note_id)
-    if active_user == _target_note.user:
-        if request.data.get('title'):
-            Note.objects.filter(id=note_id).update(title=request.data.get('title'))
-            note_details = dj_serializer.serialize('json', [Note.objects.get(id=note_id)])
-            return Response(data=note_details, status=status.HTTP_200_OK)
-        else:
-            return HttpResponseBadRequest
+    _target_note = _get_user_note(request, note_id, Note.objects.select_related('content'))
+    if request.data.get('title'):
+        _target_note.title = request.data.get('title')
+        _target_note.save_changes('title')
+        note_details = _serialize_notes([_target_note])
+        return Response(data=_notes_data(request, note_details), status=status.HTTP_200_OK)
     else:
-        raise HttpResponseForbidden("Note does not belong to user.")
+        return Response(data="No title passed.", status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_note(request, note_id):
     """Deletes a given note."""
-    active_user = User.objects.filter(username=request.user.username).first()
-    _target_note = get_object_or_404(Note, id=note_id)
-    if active_user == _target_note.user:
-        _target_note.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-    else:
-        raise HttpResponseForbidden("Note does not belong to user.")
+    # user is loaded for the post_delete signal, which drops the user's cached notes.
+    _target_note = _get_user_note(request, note_id, Note.objects.only('user'))
+    _target_note.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def translate_batch(request):
+    """Translates every uploaded image, reporting each one's Note or error in upload order."""
+    serializer = BatchTranslationSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    results = serializer.save()
+    all_created = all(result['status'] == 'created' for result in results)
+    return Response(
+        data={'results': results},
+        status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_notes_cache_stats(request):
+    """Reports how often note lists and details were served from the notes cache."""
+    stats = notes_cache_stats()
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+    return Response(data=stats, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_translation_job(request, job_id):
+    """Reports the progress of a translation job, including its Note once finished."""
+    _target_job = get_object_or_404(
+        TranslationJob.objects.select_related('note__content'), id=job_id, user_id=request.user.id
+    )
+    job_details = TranslationJobSerializer(_target_job, context={'request': request}).data
+    return Response(data=job_details, status=status.HTTP_200_OK)
+
+
+def _find_vibraille_user(email=None, phone_number=None):
+    """Looks up a VibrailleUser, with its User, by the user's email or phone number in one indexed query."""
+    vb_users = VibrailleUser.objects.select_related('user')
+    if phone_number:
+        normalized = normalize_phone_number(phone_number)
+        return vb_users.filter(phone_normalized=normalized).first() if normalized else None
+    return vb_users.filter(user__email=email).order_by('user_id').first()
 
 
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def verify_phone(request):
     """Verification of phone associated with user account."""
-    active_user = None
+    _vb = None
     if request.data.get('phone_number'):
-        active_user = VibrailleUser.objects.filter(phone_number=request.data.get('phone_number')).first().user
+        _vb = _find_vibraille_user(phone_number=request.data.get('phone_number'))
     if request.data.get('verify_str'):
         attempted_token = request.data.get('verify_str')
-        if active_user.vibrailleuser.veri_str_phone == attempted_token:
-            _vb = VibrailleUser.objects.get(user=active_user)
+        if _vb.veri_str_phone == attempted_token:
             _vb.verified_phone = True
             _vb.veri_str_phone = ''
             _vb.save()
@@ -110,13 +347,12 @@ def verify_phone(request):
 @permission_classes([AllowAny])
 def verify_email(request):
     """Verification of email associated with user account."""
-    active_user = None
+    _vb = None
     if request.data.get('email'):
-        active_user = User.objects.filter(email=request.data.get('email')).first()
+        _vb = _find_vibraille_user(email=request.data.get('email'))
     if request.data.get('verify_str'):
         attempted_token = request.data.get('verify_str')
-        if active_user.vibrailleuser.veri_str_email == attempted_token:
-            _vb = VibrailleUser.objects.get(user=active_user)
+        if _vb.veri_str_email == attempted_token:
             _vb.verified_email = True
             _vb.veri_str_email = ''
             _vb.save()
@@ -133,12 +369,11 @@ def verify_refresh(request):
     """Refreshes verification strings for endpoint."""
     _ret_data = {}
     if request.data.get('email'):
-        active_user = User.objects.filter(email=request.data.get('email')).first()
+        _vb = _find_vibraille_user(email=request.data.get('email'))
     elif request.data.get('phone_number'):
-        active_user = VibrailleUser.objects.filter(phone_number=request.data.get('phone_number')).first().user
+        _vb = _find_vibraille_user(phone_number=request.data.get('phone_number'))
     else:
         return Response(status=status.HTTP_400_BAD_REQUEST)
-    _vb = VibrailleUser.objects.get(user=active_user)
     if not _vb.verified_phone:
         _vb.veri_str_phone = "%05d" % randint(0, 99999)
         _ret_data["verification_phone"] = _vb.veri_str_phone
@@ -150,11 +385,43 @@ def verify_refresh(request):
 
 
 class TranslatorBrailleViews(generics.CreateAPIView):
-    """Generic API view for handling image to braille translation."""
+    """Generic API view for handling image to braille translation.
+
+    Passing ``?async=true`` (or ``Prefer: respond-async``) queues the translation instead and
+    responds 202 with a job id that can be polled at ``/notes/jobs/<id>/``.
+    """
     queryset = Note.objects.all()
     permission_classes = (IsAuthenticated,)
     serializer_class = TranslationSerializer
 
+    def create(self, request, *args, **kwargs):
+        if not self._wants_async(request):
+            self.stage_timings = {}
+            response = super().create(request, *args, **kwargs)
+            if self.stage_timings:
+                response['Server-Timing'] = ", ".join(
+                    f"{stage};dur={duration:.1f}" for stage, duration in self.stage_timings.items()
+                )
+            return response
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.enqueue()
+        return Response(data={
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('view_translation_job', args=[job.id], request=request)
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        self.stage_timings = getattr(serializer, 'stage_timings', {})
+
+    @staticmethod
+    def _wants_async(request):
+        if str(request.query_params.get('async', '')).lower() in ('1', 'true', 'yes'):
+            return True
+        return 'respond-async' in request.headers.get('Prefer', '')
+
 
 class RegisterView(generics.CreateAPIView):
     """Generic API view for registration."""